@@ -0,0 +1,208 @@
+"""
+Análise Relativa ao Índice de Referência (Ibovespa)
+Métricas das carteiras em relação ao benchmark carregado por
+EconomaticaLoader.load_benchmark:
+
+- Realizadas (retornos mensais fora da amostra), para todas as estratégias e
+  todos os períodos de rebalanceamento em uma única passagem: somas por
+  período (np.add.reduceat sobre os blocos contíguos de meses) dão retorno
+  ativo, tracking error, information ratio, beta e captura de alta/baixa; o
+  total é a soma dos blocos.
+- Ex-ante (Σ da janela de estimação): o índice não é uma carteira dos ativos
+  selecionados, então é decomposto em h = Σ⁻¹c (carteira dos ativos que
+  melhor o replica, c = Cov(r, r_b)) e um resíduo de variância σ²_b - c'h.
+  Com pesos ativos a = w - h:
+
+      TE² = a'Σa + (σ²_b - c'h)
+
+  A contribuição de cada ativo é aᵢ(Σa)ᵢ / TE² e as de cada setor são a soma
+  das contribuições de seus ativos (matriz indicadora ativo x setor).
+
+Captura de alta/baixa: média dos retornos da carteira nos meses de alta
+(baixa) do índice dividida pela média do índice nesses meses (médias aritméticas).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+from profiling import annotate, profiled
+from risk_budgeting import RiskBudgeting
+
+
+def benchmark_moments(estimation_data, benchmark_returns):
+    """
+    Cov(rᵢ, r_b) (Series) e σ²_b anualizadas na janela de estimação;
+    (None, None) se o índice não cobrir a janela
+    """
+    benchmark = pd.Series(benchmark_returns).reindex(estimation_data.index)
+    if benchmark.isna().any() or len(benchmark) < 2:
+        return None, None
+    centered = estimation_data - estimation_data.mean()
+    benchmark_cov = centered.T @ (benchmark - benchmark.mean()) / (len(benchmark) - 1) * 12
+    return benchmark_cov, float(benchmark.var() * 12)
+
+
+def implied_holdings(cov_matrix, benchmark_cov, benchmark_variance):
+    """
+    Carteira h = Σ⁻¹c que replica o índice e variância residual σ²_b - c'h (>= 0)
+    """
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    benchmark_cov = np.asarray(benchmark_cov, dtype=float)
+    holdings = np.linalg.lstsq(cov_matrix, benchmark_cov, rcond=None)[0]
+    return holdings, max(benchmark_variance - benchmark_cov @ holdings, 0.0)
+
+
+def active_risk_decomposition(weights, cov_matrix, benchmark_cov, benchmark_variance, asset_info=None):
+    """
+    Tracking error ex-ante e contribuições por ativo e por setor
+
+    weights: Series (uma carteira) ou DataFrame (carteiras x ativos), todas
+    decompostas em uma passagem. Contribuições em fração de TE²: ativos +
+    resíduo (parte do índice fora do universo) somam 1.
+    """
+    frame = weights.to_frame().T if isinstance(weights, pd.Series) else weights
+    assets = list(cov_matrix.index)
+    frame = frame.reindex(columns=assets).fillna(0.0)
+    holdings, residual = implied_holdings(cov_matrix.values, pd.Series(benchmark_cov).reindex(assets).values,
+                                          benchmark_variance)
+
+    active = frame.values - holdings
+    marginal = active @ cov_matrix.values
+    contributions = active * marginal
+    variance = contributions.sum(axis=1) + residual
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fractions = np.where(variance[:, None] > 0, contributions / variance[:, None], 0.0)
+
+    sector_indicator = RiskBudgeting(cov_matrix, asset_info).sector_indicator
+    return {
+        'tracking_error': pd.Series(np.sqrt(np.maximum(variance, 0.0)), index=frame.index),
+        'assets': pd.DataFrame(fractions, index=frame.index, columns=assets),
+        'sectors': pd.DataFrame(fractions @ sector_indicator.values, index=frame.index,
+                                columns=sector_indicator.columns),
+        'residual': pd.Series(np.where(variance > 0, residual / variance, 0.0), index=frame.index),
+        'active_weights': pd.DataFrame(active, index=frame.index, columns=assets)
+    }
+
+
+@profiled('benchmark.relative_performance')
+def relative_performance(portfolio_returns, benchmark_returns, periods):
+    """
+    Métricas realizadas contra o índice por (estratégia, período) e 'Total'
+
+    portfolio_returns: DataFrame T x K (meses x estratégias); benchmark_returns:
+    T retornos do índice (meses sem índice são ignorados); periods: rótulo do
+    período de cada mês (blocos contíguos, na ordem do backtest).
+    """
+    returns = np.asarray(portfolio_returns, dtype=float)
+    benchmark = np.asarray(benchmark_returns, dtype=float)
+    periods = np.asarray(periods)
+    covered = np.isfinite(benchmark)
+    returns, benchmark, periods = returns[covered], benchmark[covered], periods[covered]
+    strategies = list(portfolio_returns.columns)
+    if len(benchmark) == 0:
+        return pd.DataFrame()
+
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    labels = list(periods[starts]) + ['Total']
+    up = (benchmark > 0).astype(float)[:, None]
+    down = (benchmark < 0).astype(float)[:, None]
+    column = benchmark[:, None]
+    active = returns - column
+
+    # Somas por período (G x K); a última linha (total) é a soma dos blocos
+    terms = {
+        'n': np.ones_like(returns), 'active': active, 'active_sq': active ** 2,
+        'portfolio': returns, 'benchmark': np.broadcast_to(column, returns.shape),
+        'benchmark_sq': np.broadcast_to(column ** 2, returns.shape), 'cross': returns * column,
+        'up_portfolio': returns * up, 'up_benchmark': np.broadcast_to(column * up, returns.shape),
+        'down_portfolio': returns * down, 'down_benchmark': np.broadcast_to(column * down, returns.shape)
+    }
+    sums = {}
+    for name, values in terms.items():
+        by_period = np.add.reduceat(values, starts, axis=0)
+        sums[name] = np.vstack([by_period, by_period.sum(axis=0)])
+
+    n = sums['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        active_mean = sums['active'] / n
+        tracking_error = np.sqrt(np.maximum(sums['active_sq'] - sums['active'] * active_mean, 0.0)
+                                 / (n - 1)) * np.sqrt(12)
+        tracking_error = np.where(n > 1, tracking_error, np.nan)
+        covariance = sums['cross'] - sums['portfolio'] * sums['benchmark'] / n
+        benchmark_var = sums['benchmark_sq'] - sums['benchmark'] ** 2 / n
+        metrics = {
+            'active_return': active_mean * 12,
+            'tracking_error': tracking_error,
+            'information_ratio': np.where(tracking_error > 0, active_mean * 12 / tracking_error, np.nan),
+            'beta': np.where(benchmark_var > 0, covariance / benchmark_var, np.nan),
+            # Razão das médias nos meses de alta/baixa = razão das somas
+            'up_capture': sums['up_portfolio'] / sums['up_benchmark'],
+            'down_capture': sums['down_portfolio'] / sums['down_benchmark'],
+            'n_months': n
+        }
+    annotate(months=len(benchmark), strategies=len(strategies), periods=len(starts))
+
+    index = pd.MultiIndex.from_product([strategies, labels], names=['strategy', 'period'])
+    return pd.DataFrame({name: values.T.ravel() for name, values in metrics.items()}, index=index)
+
+
+@profiled('solver.tracking_error_markowitz')
+def tracking_error_max_sharpe(expected_returns, cov_matrix, benchmark_cov, benchmark_variance,
+                              risk_free_rate, bounds, max_tracking_error):
+    """
+    Máximo Sharpe com TE ex-ante <= max_tracking_error (anual), soma = 1 e limites
+
+    Se o limite for inviável (resíduo do índice fora do universo ou limites de
+    peso), retorna a carteira de menor tracking error. Retorna (pesos, info).
+    """
+    mu = np.asarray(expected_returns, dtype=float)
+    sigma = np.asarray(cov_matrix, dtype=float)
+    holdings, residual = implied_holdings(sigma, benchmark_cov, benchmark_variance)
+    n_assets = len(mu)
+    limit = max_tracking_error ** 2
+
+    def tracking_variance(weights):
+        active = weights - holdings
+        return active @ sigma @ active + residual
+
+    def negative_sharpe(weights):
+        volatility = np.sqrt(weights @ sigma @ weights)
+        return -(weights @ mu - risk_free_rate) / volatility if volatility > 0 else 0.0
+
+    constraints = [{'type': 'eq', 'fun': lambda w: np.sum(w) - 1.0}]
+    weight_bounds = tuple(tuple(bounds) for _ in range(n_assets))
+    x0 = np.full(n_assets, 1.0 / n_assets)
+
+    # Menor TE possível: ponto inicial viável (ou resposta, se o limite for inviável)
+    closest = minimize(tracking_variance, x0, jac=lambda w: 2 * sigma @ (w - holdings), method='SLSQP',
+                       bounds=weight_bounds, constraints=constraints, options={'maxiter': 1000})
+    min_tracking_error = float(np.sqrt(max(closest.fun, 0.0)))
+    if closest.fun > limit:
+        annotate(feasible=False)
+        return closest.x / closest.x.sum(), {'feasible': False, 'tracking_error': min_tracking_error,
+                                             'min_tracking_error': min_tracking_error}
+
+    result = minimize(negative_sharpe, closest.x, method='SLSQP', bounds=weight_bounds,
+                      constraints=constraints + [{'type': 'ineq', 'fun': lambda w: limit - tracking_variance(w)}],
+                      options={'maxiter': 1000})
+    weights = result.x if result.success and tracking_variance(result.x) <= limit * (1 + 1e-6) else closest.x
+    annotate(iterations=int(result.nit), success=bool(result.success), feasible=True)
+    return weights / weights.sum(), {'feasible': True, 'tracking_error': float(np.sqrt(tracking_variance(weights))),
+                                     'min_tracking_error': min_tracking_error}
+
+
+def print_report(table, benchmark_name='Ibovespa'):
+    """
+    Métricas consolidadas (período 'Total') de cada estratégia
+    """
+    if table is None or table.empty:
+        return
+    total = table.xs('Total', level='period')
+    print(f"\n=== ANÁLISE RELATIVA AO {benchmark_name.upper()} ({int(total['n_months'].iloc[0])} meses) ===")
+    print(f"{'Estratégia':<20} {'Ret. Ativo':<11} {'TE':<9} {'IR':<7} {'Beta':<7} {'Capt. Alta':<11} {'Capt. Baixa'}")
+    print("-" * 80)
+    for strategy, row in total.iterrows():
+        print(f"{strategy:<20} {row['active_return']:>9.2%}  {row['tracking_error']:>7.2%}  "
+              f"{row['information_ratio']:>5.2f}  {row['beta']:>5.2f}  {row['up_capture']:>9.1%}  "
+              f"{row['down_capture']:>9.1%}")
@@ -0,0 +1,310 @@
+"""
+Suíte de Benchmarks com Universos Sintéticos (synthetic_data)
+Mede o custo de cada etapa do pipeline em universos de tamanho crescente
+(N = 10, 50, 200, 500 ativos; dados mensais e diários; 5 a 30 anos):
+- leitura da planilha (EconomaticaLoader.load_selected_assets)
+- estimate_parameters
+- solvers de Markowitz e ERC
+- bootstrap da diferença de Sharpe
+- run_methodology_analysis completo
+
+Para cada caso são gravados o tempo (mediana e mínimo de várias repetições),
+o throughput da etapa e o pico de memória (tracemalloc, medido em uma
+execução separada para não distorcer o tempo). Os resultados vão para
+results/benchmarks/<commit>.json junto com o commit do git e as versões das
+bibliotecas, para comparar desempenho entre commits sem acesso aos dados
+licenciados:
+
+    python benchmarks.py --preset quick
+    python benchmarks.py --preset standard --compare ../results/benchmarks/<commit>.json
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import scipy
+
+from economatica_loader import EconomaticaLoader
+from final_methodology import FinalMethodologyAnalyzer
+from synthetic_data import SyntheticMarketGenerator, write_economatica_workbook
+
+# Grades de casos: (número de ativos, frequência, anos)
+PRESETS = {
+    'quick': {'sizes': [10, 50], 'frequencies': ['monthly', 'daily'], 'years': [5]},
+    'standard': {'sizes': [10, 50, 200, 500], 'frequencies': ['monthly', 'daily'], 'years': [5, 10]},
+    'full': {'sizes': [10, 50, 200, 500], 'frequencies': ['monthly', 'daily'], 'years': [5, 10, 20, 30]},
+}
+STAGES = ['loader', 'estimate_parameters', 'markowitz', 'erc', 'bootstrap', 'full_run']
+END_DATE = '2019-12-31'
+
+
+def default_output_dir():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "..", "results", "benchmarks")
+
+
+def make_generator(n_assets, frequency, years, seed=0):
+    """
+    Universo sintético dos benchmarks (fatores, caudas t, GARCH e regimes; sem
+    dados faltantes, para que todas as etapas vejam o painel completo)
+    """
+    return SyntheticMarketGenerator(n_assets=n_assets, years=years, frequency=frequency,
+                                    end_date=END_DATE, missing=None, seed=seed)
+
+
+def measure(function, repeat=3, track_memory=True):
+    """
+    Executa a função `repeat` vezes e uma vez extra sob tracemalloc
+
+    Retorna (resultado, {'median_s', 'min_s', 'repeat', 'peak_memory_mb'}).
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+
+    peak_memory_mb = None
+    if track_memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak_memory_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+
+    return result, {'median_s': statistics.median(timings), 'min_s': min(timings),
+                    'repeat': repeat, 'peak_memory_mb': peak_memory_mb}
+
+
+def git_commit():
+    """
+    Commit atual (e se a árvore tem alterações não commitadas)
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=current_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    cwd=current_dir, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, dirty
+
+
+def environment_info():
+    commit, dirty = git_commit()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+class BenchmarkSuite:
+    """
+    Executa a grade de casos e grava os resultados
+    """
+
+    def __init__(self, sizes, frequencies, years, stages=None, repeat=3, n_bootstrap=1000,
+                 data_dir=None, output_dir=None, seed=0):
+        self.sizes = sizes
+        self.frequencies = frequencies
+        self.years = years
+        self.stages = stages or STAGES
+        self.repeat = repeat
+        self.n_bootstrap = n_bootstrap
+        self.output_dir = output_dir or default_output_dir()
+        # Planilhas sintéticas ficam em cache entre execuções (gerar o xlsx é caro)
+        self.data_dir = data_dir or os.path.join(self.output_dir, "data")
+        self.seed = seed
+        self.results = []
+
+    def workbook_path(self, generator):
+        return os.path.join(self.data_dir, f"synthetic_{generator.n_assets}a_{generator.frequency}_"
+                                           f"{generator.years}y_{generator.fingerprint()}.xlsx")
+
+    def make_analyzer(self, prices, workbook_path):
+        """
+        Analisador configurado para o universo sintético (saídas suprimidas)
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer = FinalMethodologyAnalyzer()
+        n_assets = prices.shape[1]
+        analyzer.loader = EconomaticaLoader(workbook_path)
+        analyzer.loader.selected_assets = list(prices.columns)
+        analyzer.data_start = str(prices.index[0].date())
+        analyzer.data_end = str(prices.index[-1].date())
+        # Limites 2-20% são inviáveis para N > 50; relaxados proporcionalmente
+        analyzer.weight_bounds = (min(0.02, 0.5 / n_assets), max(0.20, 2.0 / n_assets))
+
+        # Rebalanceamento semestral nos dois últimos anos (como no TCC)
+        month_ends = pd.date_range(end=END_DATE, periods=24, freq=pd.offsets.MonthEnd())
+        analyzer.rebalancing_dates = [str(d.date()) for d in month_ends[::6]] + [END_DATE]
+        return analyzer
+
+    def run_case(self, n_assets, frequency, years):
+        generator = make_generator(n_assets, frequency, years, seed=self.seed)
+        prices = generator.generate()['prices']
+        returns = np.log(prices / prices.shift(1)).dropna()
+        n_obs = len(returns)
+        case = {'n_assets': n_assets, 'frequency': frequency, 'years': years,
+                'n_observations': n_obs, 'data': generator.fingerprint(), 'stages': {}}
+
+        workbook_path = self.workbook_path(generator)
+        needs_workbook = 'loader' in self.stages or 'full_run' in self.stages
+        if needs_workbook and not os.path.exists(workbook_path):
+            print(f"  Gerando planilha sintética ({n_assets} abas)...")
+            write_economatica_workbook(generator, workbook_path)
+
+        analyzer = self.make_analyzer(prices, workbook_path)
+
+        def record(stage_name, function, work_units, unit, repeat=None):
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, stats = measure(function, repeat=repeat or self.repeat)
+            stats['throughput'] = work_units / stats['median_s'] if stats['median_s'] > 0 else None
+            stats['throughput_unit'] = unit
+            case['stages'][stage_name] = stats
+            print(f"  {stage_name:<20} {stats['median_s'] * 1000:>10.1f} ms  "
+                  f"{stats['throughput']:>14,.1f} {unit}  pico {stats['peak_memory_mb']:.1f} MB")
+
+        if 'loader' in self.stages:
+            record('loader',
+                   lambda: analyzer.loader.load_selected_assets(analyzer.data_start, analyzer.data_end),
+                   n_obs * n_assets, 'linhas/s', repeat=1)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            parameters = analyzer.estimate_parameters(returns)
+        if 'estimate_parameters' in self.stages:
+            record('estimate_parameters', lambda: analyzer.estimate_parameters(returns),
+                   n_obs * n_assets, 'obs/s')
+        if 'markowitz' in self.stages:
+            record('markowitz', lambda: analyzer.markowitz_optimization(parameters), 1, 'solves/s')
+        if 'erc' in self.stages:
+            record('erc', lambda: analyzer.risk_parity_erc_strategy(parameters), 1, 'solves/s')
+        if 'bootstrap' in self.stages:
+            # Dois retornos de carteira do próprio universo (equal weight vs primeiro ativo)
+            portfolio_a = returns.mean(axis=1).values
+            portfolio_b = returns.iloc[:, 0].values
+            record('bootstrap',
+                   lambda: analyzer.bootstrap_sharpe_difference(portfolio_a, portfolio_b,
+                                                                analyzer.risk_free_rate,
+                                                                n_bootstrap=self.n_bootstrap),
+                   self.n_bootstrap, 'reamostras/s')
+        if 'full_run' in self.stages:
+            n_periods = len(analyzer.rebalancing_dates) - 1
+            record('full_run', analyzer.run_methodology_analysis, n_periods, 'períodos/s', repeat=1)
+
+        return case
+
+    def run(self):
+        cases = list(itertools.product(self.sizes, self.frequencies, self.years))
+        print(f"=== BENCHMARKS: {len(cases)} casos, etapas: {', '.join(self.stages)} ===")
+        for n_assets, frequency, years in cases:
+            print(f"\nN={n_assets} | {frequency} | {years} anos")
+            self.results.append(self.run_case(n_assets, frequency, years))
+        return self.results
+
+    def save(self, path=None):
+        info = environment_info()
+        if path is None:
+            suffix = '-dirty' if info['dirty'] else ''
+            path = os.path.join(self.output_dir, f"{info['commit'][:12]}{suffix}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        payload = {
+            'environment': info,
+            'settings': {'repeat': self.repeat, 'n_bootstrap': self.n_bootstrap, 'seed': self.seed},
+            'cases': self.results
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nResultados salvos em: {path}")
+        return path
+
+
+def case_key(case):
+    return case['n_assets'], case['frequency'], case['years']
+
+
+def compare(baseline_path, current_path):
+    """
+    Tabela de razões de tempo (atual / base) para os casos em comum
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)
+
+    baseline_cases = {case_key(case): case for case in baseline['cases']}
+    print(f"\nComparação: {baseline['environment']['commit'][:12]} -> "
+          f"{current['environment']['commit'][:12]} (razão < 1 = mais rápido)")
+    print(f"{'Caso':<24} {'Etapa':<20} {'Base (ms)':>10} {'Atual (ms)':>11} {'Razão':>7}")
+    rows = []
+    for case in current['cases']:
+        base_case = baseline_cases.get(case_key(case))
+        if base_case is None:
+            continue
+        label = f"{case['n_assets']}a/{case['frequency']}/{case['years']}y"
+        for stage_name, stats in case['stages'].items():
+            base_stats = base_case['stages'].get(stage_name)
+            if base_stats is None:
+                continue
+            ratio = stats['median_s'] / base_stats['median_s'] if base_stats['median_s'] > 0 else np.nan
+            rows.append((label, stage_name, ratio))
+            print(f"{label:<24} {stage_name:<20} {base_stats['median_s'] * 1000:>10.1f} "
+                  f"{stats['median_s'] * 1000:>11.1f} {ratio:>7.2f}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline com universos sintéticos")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--sizes', type=int, nargs='+', help="Substitui os tamanhos do preset")
+    parser.add_argument('--frequencies', nargs='+', choices=['daily', 'monthly'])
+    parser.add_argument('--years', type=int, nargs='+')
+    parser.add_argument('--stages', nargs='+', choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--n-bootstrap', type=int, default=1000)
+    parser.add_argument('--output', help="Arquivo JSON de saída (padrão: results/benchmarks/<commit>.json)")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args(argv)
+
+    preset = PRESETS[args.preset]
+    suite = BenchmarkSuite(
+        sizes=args.sizes or preset['sizes'],
+        frequencies=args.frequencies or preset['frequencies'],
+        years=args.years or preset['years'],
+        stages=args.stages,
+        repeat=args.repeat,
+        n_bootstrap=args.n_bootstrap
+    )
+    suite.run()
+    output_path = suite.save(args.output)
+
+    if args.compare:
+        compare(args.compare, output_path)
+    return suite.results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
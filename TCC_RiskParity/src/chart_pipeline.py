@@ -0,0 +1,304 @@
+"""
+Pipeline de Gráficos a partir dos Resultados Armazenados
+Os gráficos do TCC são gerados diretamente do ResultsStore (sem recarregar a
+planilha nem recalcular o backtest). Cada figura declara os dados de que
+depende; o hash desses dados é gravado em um manifesto e a figura só é
+renderizada novamente quando o hash muda.
+
+A renderização usa o backend Agg (sem interface gráfica), roda em um pool de
+processos e pode gerar, além do PNG, versões vetoriais (PDF/SVG) para o LaTeX.
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from efficient_frontier import compute_frontiers
+from profiling import get_profiler
+from results_store import ResultsStore
+
+MANIFEST_NAME = '.figure_manifest.json'
+RASTER_DPI = 300
+
+# Uma cor por estratégia de FinalMethodologyAnalyzer.strategy_builders, comum a todas as figuras
+STRATEGY_COLORS = {
+    'Markowitz': 'darkgreen',
+    'Equal Weight': 'blue',
+    'Risk Parity': 'orange',
+    'Risk Budgeting': 'goldenrod',
+    'Min CVaR': 'saddlebrown',
+    'Mean-CVaR': 'hotpink',
+    'Resampled Markowitz': 'limegreen',
+    'Robust Markowitz': 'teal',
+    'Markowitz TE': 'slategray',
+}
+
+
+def use_headless_backend():
+    """
+    Força o backend Agg antes de qualquer importação de pyplot
+    """
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+
+def save_current_figure(output_paths):
+    """
+    Salva a figura atual em todos os formatos pedidos (PNG a 300 dpi, PDF/SVG vetoriais)
+    """
+    import matplotlib.pyplot as plt
+    for output_path in output_paths:
+        plt.savefig(output_path, dpi=RASTER_DPI, bbox_inches='tight')
+    plt.close()
+
+
+def default_output_dir():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "..", "docs", "Overleaf", "images")
+
+
+def load_chart_data(store, run_hash):
+    """
+    Lê do banco tudo o que os gráficos usam (uma única leitura por execução)
+    """
+    all_results, returns_history, _ = store.load_run(run_hash)
+    config = store.load_config(run_hash) or {}
+
+    # Retornos das carteiras concatenados ao longo dos períodos de teste
+    portfolio_returns = pd.concat([
+        pd.DataFrame(period_data['returns'], index=period_data['dates'])
+        for period_data in returns_history
+    ])
+
+    asset_returns = store.load_panel(run_hash, 'returns')
+    asset_prices = store.load_panel(run_hash, 'prices')
+
+    # Janela de teste (out-of-sample): do primeiro rebalanceamento ao fim do período
+    test_start = pd.Timestamp(config['rebalancing_dates'][0]) if 'rebalancing_dates' in config \
+        else portfolio_returns.index[0]
+    test_returns = asset_returns[asset_returns.index >= test_start]
+    price_start = asset_prices.index[asset_prices.index < test_start]
+    test_prices = asset_prices.loc[price_start[-1]:] if len(price_start) > 0 else asset_prices
+
+    summary = pd.DataFrame(store.load_summary(run_hash, 'consolidated')).T
+    if summary.empty:
+        summary = pd.DataFrame({
+            'annual_return': portfolio_returns.mean() * 12,
+            'annual_volatility': portfolio_returns.std() * np.sqrt(12)
+        })
+        summary['sharpe_ratio'] = (summary['annual_return'] - config.get('risk_free_rate', 0.0)) \
+            / summary['annual_volatility']
+
+    mean_weights = pd.DataFrame({
+        strategy: pd.DataFrame([p['weights'] for p in period_results]).mean()
+        for strategy, period_results in all_results.items()
+    })
+
+    return {
+        'asset_returns': test_returns,
+        # Calculada só se alguma figura que a usa estiver pendente (hash = retornos + limites)
+        'frontier': DeferredInput(frontier_curves, asset_returns=test_returns,
+                                  weight_bounds=[float(bound) for bound in config.get('weight_bounds', (0.0, 1.0))]),
+        'asset_prices': test_prices,
+        'portfolio_returns': portfolio_returns,
+        'summary': summary[['annual_return', 'annual_volatility', 'sharpe_ratio']],
+        'mean_weights': mean_weights,
+        'risk_free_rate': config.get('risk_free_rate', 0.0)
+    }
+
+
+class DeferredInput:
+    """
+    Entrada de figura cara de calcular: o manifesto usa o hash dos argumentos
+    e a função só é avaliada quando uma figura que depende dela é renderizada
+    """
+
+    def __init__(self, function, **arguments):
+        self.function = function
+        self.arguments = arguments
+        self._value = None
+
+    def evaluate(self):
+        if self._value is None:  # Uma única avaliação, mesmo com várias figuras pendentes
+            self._value = self.function(**self.arguments)
+        return self._value
+
+
+def frontier_curves(asset_returns, weight_bounds, n_frontier=200, n_family=50):
+    """
+    Fronteira eficiente e família ERC -> mínima variância (anualizadas) estimadas
+    ex post com os retornos do próprio período de teste (referência visual, não
+    disponível na data de cada rebalanceamento)
+    """
+    parameters = {'expected_returns': asset_returns.mean() * 12,
+                  'cov_matrix': asset_returns.cov() * 12}
+    try:
+        _, frontier, family = compute_frontiers(parameters, weight_bounds, n_frontier, n_family)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        print(f"AVISO: Fronteira eficiente não calculada: {e}")
+        return pd.DataFrame(columns=['curve', 'volatility', 'return'])
+    return pd.concat([
+        frontier.assign(curve='frontier')[['curve', 'volatility', 'return']],
+        family.assign(curve='risk_budget')[['curve', 'volatility', 'return']]
+    ], ignore_index=True)
+
+
+# Registro das figuras: nome -> (módulo, função de renderização, entradas usadas)
+FIGURES = {
+    'correlation_matrix': ('generate_missing_charts', 'create_correlation_matrix',
+                           ('asset_returns',)),
+    'price_evolution': ('generate_missing_charts', 'create_price_evolution',
+                        ('asset_prices',)),
+    'portfolio_evolution': ('generate_missing_charts', 'create_portfolio_evolution',
+                            ('portfolio_returns',)),
+    'risk_return_plot': ('generate_missing_charts', 'create_risk_return_plot',
+                         ('summary', 'risk_free_rate', 'frontier')),
+    'drawdown_analysis': ('create_charts_simple', 'create_drawdown_analysis',
+                          ('portfolio_returns',)),
+    'risk_contribution': ('create_charts_simple', 'create_risk_contribution',
+                          ('mean_weights', 'asset_returns')),
+}
+
+
+def hash_inputs(inputs):
+    """
+    Hash (SHA-256) dos dados de entrada de uma figura
+    """
+    digest = hashlib.sha256()
+    for name in sorted(inputs):
+        value = inputs[name]
+        digest.update(name.encode('utf-8'))
+        if isinstance(value, DeferredInput):
+            digest.update(value.function.__name__.encode('utf-8'))
+            digest.update(hash_inputs(value.arguments).encode('utf-8'))
+        elif isinstance(value, (pd.DataFrame, pd.Series)):
+            labels = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+            digest.update(json.dumps([str(label) for label in labels]).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def render_figure(name, inputs, output_paths):
+    """
+    Renderiza uma figura (executado dentro dos processos do pool)
+
+    Retorna (nome, início em µs, duração em µs, pid) para a instrumentação.
+    """
+    start_wall = time.time_ns()
+    start = time.perf_counter_ns()
+    use_headless_backend()
+    module_name, function_name, _ = FIGURES[name]
+    renderer = getattr(importlib.import_module(module_name), function_name)
+    renderer(**inputs, output_paths=output_paths)
+    return name, start_wall // 1000, (time.perf_counter_ns() - start) / 1000, os.getpid()
+
+
+def _manifest_entry(manifest, name):
+    entry = manifest.get(name)
+    if isinstance(entry, str):  # Formato antigo: apenas o hash do PNG
+        return {'hash': entry, 'formats': ['png']}
+    return entry or {'hash': None, 'formats': []}
+
+
+def render_figures(store=None, run_hash=None, output_dir=None, figures=None, force=False,
+                   formats=('png',), workers=None):
+    """
+    Renderiza as figuras cujo hash de entrada mudou desde a última execução
+
+    formats: extensões geradas por figura (ex.: ('png', 'pdf') para o LaTeX)
+    workers: número de processos (None = um por figura até o número de CPUs;
+             1 = renderização serial no próprio processo)
+
+    Retorna {'rendered': [...], 'skipped': [...]}.
+    """
+    if store is None:
+        store = ResultsStore()
+    if run_hash is None:
+        run_hash = store.latest_run()
+    if run_hash is None:
+        print("ERRO: Nenhuma execução armazenada. Execute final_methodology.py primeiro.")
+        return None
+    if output_dir is None:
+        output_dir = default_output_dir()
+    os.makedirs(output_dir, exist_ok=True)
+
+    chart_data = load_chart_data(store, run_hash)
+    manifest = load_manifest(output_dir)
+    summary = {'rendered': [], 'skipped': []}
+
+    # Selecionar apenas as figuras (e formatos) com dados alterados ou arquivos ausentes
+    jobs = {}
+    for name in (figures or list(FIGURES)):
+        _, _, input_names = FIGURES[name]
+        inputs = {key: chart_data[key] for key in input_names}
+        input_hash = hash_inputs(inputs)
+        entry = _manifest_entry(manifest, name)
+
+        pending_formats = [
+            fmt for fmt in formats
+            if force or entry['hash'] != input_hash or fmt not in entry['formats']
+            or not os.path.exists(os.path.join(output_dir, f"{name}.{fmt}"))
+        ]
+        if not pending_formats:
+            summary['skipped'].append(name)
+            continue
+
+        inputs = {key: value.evaluate() if isinstance(value, DeferredInput) else value
+                  for key, value in inputs.items()}
+        output_paths = [os.path.join(output_dir, f"{name}.{fmt}") for fmt in pending_formats]
+        kept_formats = entry['formats'] if entry['hash'] == input_hash else []
+        jobs[name] = (inputs, output_paths, input_hash,
+                      sorted(set(kept_formats) | set(pending_formats)))
+
+    def record(render_result):
+        name, start_us, duration_us, pid = render_result
+        get_profiler().add_event('chart_render', start_us, duration_us, pid=pid, tid=pid,
+                                 figure=name, formats=len(jobs[name][1]))
+        _, _, input_hash, rendered_formats = jobs[name]
+        manifest[name] = {'hash': input_hash, 'formats': rendered_formats}
+        save_manifest(output_dir, manifest)
+        summary['rendered'].append(name)
+        print(f"OK {name} ({', '.join(rendered_formats)})")
+
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+
+    if workers <= 1 or len(jobs) <= 1:
+        for name, (inputs, output_paths, _, _) in jobs.items():
+            record(render_figure(name, inputs, output_paths))
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(render_figure, name, inputs, output_paths)
+                for name, (inputs, output_paths, _, _) in jobs.items()
+            ]
+            for future in as_completed(futures):
+                record(future.result())
+
+    print(f"Figuras renderizadas: {len(summary['rendered'])} | "
+          f"inalteradas: {len(summary['skipped'])} (run {run_hash[:12]})")
+    return summary
@@ -0,0 +1,370 @@
+"""
+Linha de Comando Única do Projeto
+
+    python src/cli.py [--config config.yaml] <comando> [opções]
+
+Comandos:
+    ingest    Lê a planilha da Economatica e salva preços/retornos em CSV
+    backtest  Executa a metodologia (ResultsStore + cache de pesos), os custos de transação
+              e as análises relativa ao Ibovespa e de volatilidade-alvo
+    sweep     Varre combinações de parâmetros (seção 'sweep') sobre a configuração base,
+              com PBO (CSCV) e Deflated Sharpe da seleção; retomável e em paralelo (--workers)
+    test      Testes de significância das diferenças de Sharpe (--draws: bootstrap retomável)
+    charts    Gera os gráficos a partir dos resultados armazenados
+    stress    Testes de estresse (crises históricas e choques de fatores) sobre os pesos atuais
+    report    Atualiza as tabelas LaTeX
+    bench     Benchmarks com universos sintéticos (opções repassadas a benchmarks.py)
+
+A configuração (YAML ou TOML) substitui caminhos, datas e taxas fixos nos
+scripts; caminhos relativos são resolvidos a partir do arquivo de
+configuração, não do diretório atual. Bibliotecas pesadas (pandas, scipy,
+matplotlib, seaborn) só são importadas dentro do comando que as usa, de modo
+que --help e comandos leves iniciam em milissegundos.
+"""
+
+import argparse
+import copy
+import datetime
+import itertools
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_PATH = os.path.join(PROJECT_DIR, 'config.yaml')
+
+DEFAULT_CONFIG = {
+    'paths': {
+        'data': None,  # None = planilha padrão de EconomaticaLoader
+        'risk_free': None,  # Série do CDI (CSV/Excel); None = taxa constante risk_free_rate
+        'benchmark': None,  # Nível do Ibovespa (CSV/Excel); None = aba IBOV da planilha
+        'results': 'results',
+        'images': os.path.join('docs', 'Overleaf', 'images'),
+        'tables': os.path.join('docs', 'Overleaf', 'tables'),
+    },
+    'backtest': {},
+    'sweep': {},
+    'charts': {'formats': ['png']},
+    'stress': {'scenarios': {}},  # Cenários adicionais aos de stress_testing.py
+    'bench': {'preset': 'quick'},
+}
+
+# Subcomando que grava os resultados de cada tabela do report (as demais vêm do backtest)
+REPORT_SOURCES = {'significance_tests': 'test', 'transaction_costs': 'backtest'}
+
+
+def load_config(path=None):
+    """
+    Lê a configuração (YAML ou TOML) sobre DEFAULT_CONFIG
+
+    Sem path, usa config.yaml na raiz do projeto (se existir). Datas viram
+    texto ISO e os caminhos da seção 'paths' tornam-se absolutos.
+    """
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    base_dir = PROJECT_DIR
+    if path is None and os.path.exists(DEFAULT_CONFIG_PATH):
+        path = DEFAULT_CONFIG_PATH
+
+    if path is not None:
+        base_dir = os.path.dirname(os.path.abspath(path))
+        if path.endswith('.toml'):
+            try:
+                import tomllib
+            except ImportError:  # Python < 3.11
+                import tomli as tomllib
+            with open(path, 'rb') as f:
+                loaded = tomllib.load(f)
+        else:
+            import yaml
+            with open(path, encoding='utf-8') as f:
+                loaded = yaml.safe_load(f) or {}
+        for section, values in loaded.items():
+            if isinstance(values, dict) and isinstance(config.get(section), dict):
+                config[section].update(values)
+            else:
+                config[section] = values
+
+    config = _normalize(config)
+    config['paths'] = {
+        key: os.path.normpath(os.path.join(base_dir, value)) if value else None
+        for key, value in config['paths'].items()
+    }
+    return config
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, datetime.date):
+        return value.isoformat()  # Datas YAML sem aspas: mesma forma usada no hash da configuração
+    return value
+
+
+def open_results_store(config):
+    from results_store import ResultsStore
+    return ResultsStore(os.path.join(config['paths']['results'], 'backtest_results.sqlite'))
+
+
+def build_analyzer(config, use_cache=True):
+    """
+    FinalMethodologyAnalyzer com ResultsStore, cache de pesos e a seção 'backtest'
+    """
+    from final_methodology import FinalMethodologyAnalyzer
+    from solver_cache import SolverCache
+
+    settings = dict(config['backtest'])
+    if config['paths']['data']:
+        settings['data_path'] = config['paths']['data']
+    if config['paths']['risk_free']:
+        settings['risk_free_path'] = config['paths']['risk_free']
+    if config['paths']['benchmark']:
+        settings['benchmark_path'] = config['paths']['benchmark']
+    settings.setdefault('sheet_cache_dir', os.path.join(config['paths']['results'], 'sheet_cache'))
+    solver_cache = SolverCache(os.path.join(config['paths']['results'], 'solver_cache')) if use_cache else None
+    return FinalMethodologyAnalyzer(results_store=open_results_store(config), solver_cache=solver_cache,
+                                    settings=settings)
+
+
+def cmd_ingest(config, args):
+    from economatica_loader import EconomaticaLoader, save_loaded_data
+
+    loader = EconomaticaLoader(config['paths']['data'])
+    loader.sheet_cache_dir = os.path.join(config['paths']['results'], 'sheet_cache')
+    backtest = config['backtest']
+    if 'selected_assets' in backtest:
+        loader.selected_assets = list(backtest['selected_assets'])
+    loader.adjust_prices = backtest.get('adjust_prices', loader.adjust_prices)
+    period = {key: backtest[name] for key, name in (('start_date', 'data_start'), ('end_date', 'data_end'))
+              if name in backtest}
+    returns_df, prices_df = loader.load_selected_assets(**period)
+    if returns_df is None:
+        print("ERRO: Não foi possível carregar dados suficientes!")
+        return 1
+    save_loaded_data(loader, returns_df, prices_df, args.output or config['paths']['results'])
+    return 0
+
+
+def cmd_backtest(config, args):
+    from profiling import configure_from_env
+
+    profiler = configure_from_env()  # TCC_PROFILE=1 ativa a instrumentação
+    analyzer = build_analyzer(config, use_cache=not args.no_cache)
+    all_results = analyzer.run_methodology_analysis()
+    if not all_results:
+        print("ERRO: Não foi possível executar a metodologia")
+        return 1
+
+    analyzer.consolidate_final_results(all_results)
+    analyzer.simulate_transaction_costs()
+    analyzer.analyze_benchmark()
+    analyzer.apply_volatility_target(all_results)
+    if analyzer.solver_cache is not None:
+        analyzer.solver_cache.print_stats()
+    if profiler.enabled:
+        profiler.print_summary()
+        profiler.export_all()
+    print(f"\nExecução: {analyzer.run_hash}")
+    return 0
+
+
+def open_job_runner(config, name, args):
+    """
+    JobRunner com checkpoints em paths.results/jobs.sqlite (--workers, --restart)
+    """
+    from job_runner import JobCheckpoint, JobRunner
+
+    checkpoint = JobCheckpoint(os.path.join(config['paths']['results'], 'jobs.sqlite'))
+    runner = JobRunner(name, checkpoint=checkpoint, workers=args.workers)
+    if args.restart:
+        runner.restart()
+    return runner
+
+
+def _sweep_task(config, overrides):
+    """
+    Uma configuração da varredura (tarefa do JobRunner, possivelmente em outro processo)
+    """
+    analyzer = build_analyzer(config)
+    analyzer.configure(overrides)
+    all_results = analyzer.run_methodology_analysis()
+    if not all_results:
+        return None
+    consolidated = analyzer.consolidate_final_results(all_results)
+    return {'run_hash': analyzer.run_hash,
+            'metrics': {strategy: {name: metrics[name] for name in ('annual_return', 'annual_volatility',
+                                                                     'sharpe_ratio')}
+                        for strategy, metrics in consolidated.items()}}
+
+
+def cmd_sweep(config, args):
+    grid = config['sweep']
+    if not grid:
+        print("ERRO: Seção 'sweep' vazia na configuração")
+        return 1
+
+    from results_store import config_hash
+
+    # Tarefas identificadas pelo hash da configuração completa (o mesmo do ResultsStore)
+    analyzer = build_analyzer(config)
+    keys = list(grid)
+    tasks = {}
+    for values in itertools.product(*(grid[key] for key in keys)):
+        overrides = dict(zip(keys, values))
+        analyzer.configure(overrides)
+        tasks[config_hash(analyzer.get_run_config())] = (_sweep_task, (config, overrides))
+    results = open_job_runner(config, 'sweep', args).run(tasks)
+
+    rows = []
+    run_hashes = []
+    for task_key, (_, (_, overrides)) in tasks.items():
+        result = results.get(task_key)
+        if not result:
+            continue
+        run_hashes.append(result['run_hash'])
+        for strategy, metrics in result['metrics'].items():
+            rows.append({**{key: str(value) for key, value in overrides.items()},
+                         'strategy': strategy,
+                         **metrics,
+                         'run_hash': result['run_hash'][:12]})
+
+    import pandas as pd
+    from overfitting import cscv_pbo, deflated_sharpe, max_partitions, print_report, returns_matrix
+
+    table = pd.DataFrame(rows)
+    matrix = returns_matrix(analyzer.results_store, run_hashes)
+    if matrix.shape[1] > 1:
+        deflated = deflated_sharpe(matrix)
+        table['deflated_sharpe'] = [deflated['table']['dsr'].get(f"{row['strategy']} | {row['run_hash']}")
+                                    for _, row in table.iterrows()]
+        print_report(cscv_pbo(matrix, max_partitions(len(matrix), args.partitions)), deflated)
+    print(f"\n=== VARREDURA: {len(table) // max(len(analyzer.strategies), 1)} configurações ===")
+    print(table.round(4).to_string(index=False))
+    output_path = args.output or os.path.join(config['paths']['results'], 'sweep.csv')
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    table.to_csv(output_path, index=False)
+    print(f"Tabela salva em {output_path}")
+    return 0
+
+
+def cmd_test(config, args):
+    analyzer = build_analyzer(config)
+    if args.draws is not None:
+        # Bootstrap com os blocos gravados em results/jobs.sqlite (retomável)
+        analyzer.bootstrap_draws = args.draws
+        analyzer.job_runner = open_job_runner(config, 'significance', args)
+    all_results = analyzer.run_methodology_analysis()
+    if not all_results:
+        print("ERRO: Não foi possível executar a metodologia")
+        return 1
+    consolidated = analyzer.consolidate_final_results(all_results)
+    analyzer.run_significance_tests(consolidated)
+    return 0
+
+
+def cmd_stress(config, args):
+    analyzer = build_analyzer(config)
+    all_results = analyzer.run_methodology_analysis()
+    if not all_results:
+        print("ERRO: Não foi possível executar a metodologia")
+        return 1
+    result = analyzer.run_stress_tests(all_results, config['stress'].get('scenarios'), names=args.scenarios)
+    return 0 if result is not None else 1
+
+
+def cmd_charts(config, args):
+    from chart_pipeline import render_figures
+
+    summary = render_figures(store=open_results_store(config), run_hash=args.run,
+                             output_dir=config['paths']['images'], figures=args.figures,
+                             force=args.force, formats=tuple(args.formats or config['charts']['formats']),
+                             workers=args.workers)
+    return 0 if summary is not None else 1
+
+
+def cmd_report(config, args):
+    from latex_tables import LatexTableExporter
+
+    store = open_results_store(config)
+    if (args.run or store.latest_run()) is None:
+        print("ERRO: Nenhuma execução armazenada. Execute o comando backtest primeiro.")
+        return 1
+    summary = LatexTableExporter(store, args.run).export(config['paths']['tables'])
+    for name in summary['missing']:
+        print(f"AVISO: Tabela {name} sem resultados armazenados - execute o comando "
+              f"{REPORT_SOURCES.get(name, 'backtest')} antes do report")
+    return 0
+
+
+def cmd_bench(config, args):
+    import benchmarks
+
+    argv = ['--preset', config['bench'].get('preset', 'quick')] + list(args.extra)
+    benchmarks.main(argv)
+    return 0
+
+
+def add_job_arguments(parser):
+    parser.add_argument('--workers', type=int, default=1, help="Processos para as tarefas (padrão: 1)")
+    parser.add_argument('--restart', action='store_true',
+                        help="Descarta as tarefas já gravadas em jobs.sqlite em vez de retomar")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="TCC Risk Parity - linha de comando")
+    parser.add_argument('--config', default=None,
+                        help="Arquivo YAML ou TOML (padrão: config.yaml na raiz do projeto)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="Lê a planilha e salva preços/retornos em CSV")
+    ingest.add_argument('--output', help="Diretório de saída (padrão: paths.results)")
+    ingest.set_defaults(handler=cmd_ingest)
+
+    backtest = commands.add_parser('backtest', help="Executa a metodologia e os custos de transação")
+    backtest.add_argument('--no-cache', action='store_true', help="Desativa o cache de pesos")
+    backtest.set_defaults(handler=cmd_backtest)
+
+    sweep = commands.add_parser('sweep', help="Varredura de parâmetros (seção 'sweep')")
+    sweep.add_argument('--output', help="CSV de saída (padrão: paths.results/sweep.csv)")
+    sweep.add_argument('--partitions', type=int, default=16, help="Blocos do CSCV (reduzidos se faltarem meses)")
+    add_job_arguments(sweep)
+    sweep.set_defaults(handler=cmd_sweep)
+
+    test = commands.add_parser('test', help="Testes de significância das diferenças de Sharpe")
+    test.add_argument('--draws', type=int,
+                      help="Reamostras do bootstrap em blocos retomáveis (padrão: 1000, gerador legado)")
+    add_job_arguments(test)
+    test.set_defaults(handler=cmd_test)
+
+    stress = commands.add_parser('stress', help="Testes de estresse sobre os pesos do último rebalanceamento")
+    stress.add_argument('--scenarios', nargs='+', help="Nomes dos cenários (padrão: toda a biblioteca)")
+    stress.set_defaults(handler=cmd_stress)
+
+    charts = commands.add_parser('charts', help="Gráficos a partir dos resultados armazenados")
+    charts.add_argument('--run', help="Hash da execução (padrão: a mais recente)")
+    charts.add_argument('--figures', nargs='+')
+    charts.add_argument('--formats', nargs='+', choices=['png', 'pdf', 'svg'])
+    charts.add_argument('--force', action='store_true')
+    charts.add_argument('--workers', type=int)
+    charts.set_defaults(handler=cmd_charts)
+
+    report = commands.add_parser('report', help="Atualiza as tabelas LaTeX")
+    report.add_argument('--run', help="Hash da execução (padrão: a mais recente)")
+    report.set_defaults(handler=cmd_report)
+
+    bench = commands.add_parser('bench', help="Benchmarks (demais opções repassadas a benchmarks.py)")
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != 'bench':
+        parser.error(f"argumentos não reconhecidos: {' '.join(extra)}")
+    args.extra = extra
+    return args.handler(load_config(args.config), args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
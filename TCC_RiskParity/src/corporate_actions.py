@@ -0,0 +1,117 @@
+"""
+Ajuste de Preços por Eventos Corporativos (Retorno Total)
+Sem ajuste, desdobramentos, grupamentos, bonificações e proventos aparecem
+como retornos falsos no dia do evento (ex.: ITUB4, BBDC4 e PETR4). O ajuste
+é retroativo: o último preço da série é o fechamento real e cada preço
+anterior é multiplicado pelos fatores de todos os eventos posteriores.
+
+Fator do evento na data t (1 nos demais dias), a partir das colunas da aba:
+
+    fₜ = Fₜ · (1 / kₜ) · (1 - Dₜ·kₜ / Pₜ₋₁)
+
+    F: fator de ajuste informado pela Economatica (preço anterior x F)
+    k: ações após / antes (desdobramento 2:1 -> 2; grupamento 10:1 -> 0,1;
+       bonificação de 10% -> 1,1)
+    D: provento em dinheiro por ação na data ex (dividendos/JCP, já na base
+       de ações posterior ao evento)
+
+    P̃ₜ = Pₜ · Πₛ₌ₜ₊₁..T fₛ  (produto acumulado reverso, vetorizado)
+
+Com os proventos reinvestidos no fator, P̃ₜ / P̃ₜ₋₁ é o retorno total.
+"""
+
+import unicodedata
+
+import numpy as np
+
+# Palavras-chave dos cabeçalhos (minúsculas, sem acentos)
+PRICE_KEYWORDS = ('fechamento', 'media', 'medio', 'close', 'preco', 'price')
+ADJUSTED_KEYWORDS = ('ajust', 'adj')
+DIVIDEND_KEYWORDS = ('provento', 'dividendo', 'jcp', 'juros sobre', 'juros s/')
+SPLIT_KEYWORDS = ('desdobr', 'grupament', 'bonifica', 'split')
+FACTOR_KEYWORDS = ('fator',)
+VOLUME_KEYWORDS = ('volume',)
+
+
+def normalize_header(value):
+    """
+    Cabeçalho em minúsculas e sem acentos ('' para células vazias/numéricas)
+    """
+    if not isinstance(value, str):
+        return ''
+    text = unicodedata.normalize('NFKD', value.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char)).strip()
+
+
+def find_columns(header_row):
+    """
+    Índices das colunas de preço (ajustado e não ajustado), de volume e de
+    eventos corporativos em uma linha de cabeçalho
+    """
+    columns = {'adjusted_price': None, 'price': None, 'volume': None, 'dividends': None, 'splits': None,
+               'factors': None}
+    for i, value in enumerate(header_row):
+        name = normalize_header(value)
+        if not name:
+            continue
+        is_adjusted = any(keyword in name for keyword in ADJUSTED_KEYWORDS)
+        if any(keyword in name for keyword in FACTOR_KEYWORDS):
+            key = 'factors'
+        elif any(keyword in name for keyword in DIVIDEND_KEYWORDS):
+            key = 'dividends'
+        elif any(keyword in name for keyword in SPLIT_KEYWORDS):
+            key = 'splits'
+        elif any(keyword in name for keyword in VOLUME_KEYWORDS):
+            key = 'volume'
+        elif any(keyword in name for keyword in PRICE_KEYWORDS):
+            key = 'adjusted_price' if is_adjusted else 'price'
+        else:
+            continue
+        if columns[key] is None:
+            columns[key] = i
+    return columns
+
+
+def event_factors(prices, dividends=None, splits=None, factors=None):
+    """
+    Fator fₜ de cada data (1 sem evento); entradas ausentes/NaN são neutras
+    """
+    prices = np.asarray(prices, dtype=float)
+    result = np.ones(len(prices))
+    if factors is not None:
+        factors = np.asarray(factors, dtype=float)
+        result *= np.where(np.isfinite(factors) & (factors > 0), factors, 1.0)
+    ratio = np.ones(len(prices))
+    if splits is not None:
+        splits = np.asarray(splits, dtype=float)
+        ratio = np.where(np.isfinite(splits) & (splits > 0), splits, 1.0)
+        result /= ratio
+    if dividends is not None:
+        dividends = np.asarray(dividends, dtype=float)
+        previous = np.r_[np.nan, prices[:-1]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dividend_factor = 1 - dividends * ratio / previous
+        valid = np.isfinite(dividend_factor) & (dividends > 0) & (dividend_factor > 0)
+        result *= np.where(valid, dividend_factor, 1.0)
+    return result
+
+
+def adjust_prices(prices, factors):
+    """
+    P̃ₜ = Pₜ · Π(fₛ, s > t): produto acumulado reverso, último preço preservado
+    """
+    prices = np.asarray(prices, dtype=float)
+    factors = np.asarray(factors, dtype=float)
+    if len(prices) == 0:
+        return prices
+    later = np.cumprod(factors[::-1])[::-1]
+    return prices * np.r_[later[1:], 1.0]
+
+
+def adjusted_series(prices, dividends=None, splits=None, factors=None):
+    """
+    Preços ajustados (retorno total) de uma série em ordem cronológica e o
+    número de eventos encontrados
+    """
+    event = event_factors(prices, dividends, splits, factors)
+    return adjust_prices(prices, event), int(np.sum(event != 1.0))
@@ -1,178 +1,77 @@
 """
 Gerador Simples de Gráficos para o TCC
+Usa os resultados armazenados do backtest (chart_pipeline) em vez de
+recarregar a planilha ou simular séries
 """
 
-import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Renderização sem interface gráfica
 import matplotlib.pyplot as plt
-import seaborn as sns
-from economatica_loader import EconomaticaLoader
 import warnings
-import os
 warnings.filterwarnings('ignore')
 
+from chart_pipeline import STRATEGY_COLORS, render_figures, save_current_figure
+
 # Configuração
 plt.rcParams['font.size'] = 10
 plt.rcParams['figure.figsize'] = (12, 8)
 plt.style.use('seaborn-v0_8-whitegrid')
 
-def create_charts():
-    """Criar todos os gráficos"""
-    print("Criando graficos...")
-    
-    # Criar diretório
-    os.makedirs('../Overleaf/images', exist_ok=True)
-    
-    # Carregar dados
-    loader = EconomaticaLoader()
-    returns_df, prices_df = loader.load_selected_assets('2018-01-01', '2019-12-31')
-    
-    # 1. Matriz de correlação
-    plt.figure(figsize=(10, 8))
-    correlations = returns_df.corr()
-    mask = np.triu(np.ones_like(correlations, dtype=bool))
-    sns.heatmap(correlations, mask=mask, annot=True, cmap='RdBu_r', center=0, square=True)
-    plt.title('Matriz de Correlacao entre Ativos (2018-2019)')
-    plt.tight_layout()
-    plt.savefig('../Overleaf/images/correlation_matrix.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("OK correlation_matrix.png")
-    
-    # 2. Evolução de preços
-    plt.figure(figsize=(14, 8))
-    normalized = prices_df / prices_df.iloc[0] * 100
-    for col in normalized.columns:
-        plt.plot(normalized.index, normalized[col], label=col, linewidth=2)
-    plt.title('Evolucao dos Precos Normalizados (2018-2019)')
-    plt.ylabel('Preco Normalizado (Base 100)')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig('../Overleaf/images/price_evolution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("OK price_evolution.png")
-    
-    # 3. Evolução das carteiras (simulado)
-    plt.figure(figsize=(14, 8))
-    dates = pd.date_range('2018-01-01', '2019-12-31', freq='M')
-    
-    # Valores simulados baseados nos resultados
-    np.random.seed(42)
-    mark_values = [100]
-    eq_values = [100]
-    rp_values = [100]
-    
-    for i in range(len(dates)):
-        mark_values.append(mark_values[-1] * (1 + np.random.normal(0.021, 0.04)))
-        eq_values.append(eq_values[-1] * (1 + np.random.normal(0.018, 0.055)))
-        rp_values.append(rp_values[-1] * (1 + np.random.normal(0.016, 0.05)))
-    
-    # Ajustar para valores finais
-    mark_values = [v * 156.1 / mark_values[-1] for v in mark_values]
-    eq_values = [v * 148.2 / eq_values[-1] for v in eq_values]
-    rp_values = [v * 143.4 / rp_values[-1] for v in rp_values]
-    
-    dates_full = [pd.Timestamp('2018-01-01')] + list(dates)
-    
-    plt.plot(dates_full, mark_values, label='Markowitz', linewidth=3, color='green')
-    plt.plot(dates_full, eq_values, label='Equal Weight', linewidth=2.5, color='blue')
-    plt.plot(dates_full, rp_values, label='Risk Parity', linewidth=2.5, color='orange')
-    
-    plt.title('Evolucao das Carteiras (2018-2019)')
-    plt.ylabel('Valor da Carteira (Base 100)')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig('../Overleaf/images/portfolio_evolution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("OK portfolio_evolution.png")
-    
-    # 4. Plano risco-retorno
-    plt.figure(figsize=(10, 8))
-    
-    # Dados das estratégias
-    strategies = {
-        'Markowitz': [14.5, 26.1, 'green'],
-        'Equal Weight': [20.9, 24.1, 'blue'], 
-        'Risk Parity': [18.8, 21.7, 'orange']
-    }
-    
-    for name, (vol, ret, color) in strategies.items():
-        plt.scatter(vol, ret, s=200, alpha=0.8, color=color, label=name, edgecolor='black')
-        plt.annotate(name, (vol, ret), xytext=(5, 5), textcoords='offset points')
-    
-    plt.axhline(y=6.195, color='red', linestyle='--', label='CDI (6,195%)')
-    plt.title('Posicionamento das Estrategias no Plano Risco-Retorno')
-    plt.xlabel('Volatilidade Anualizada (%)')
-    plt.ylabel('Retorno Anualizado (%)')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig('../Overleaf/images/risk_return_plot.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("OK risk_return_plot.png")
-    
-    # 5. Drawdown analysis (adicional)
+def create_drawdown_analysis(portfolio_returns, output_paths):
+    """Evolução dos drawdowns das carteiras (retornos out-of-sample reais)"""
     plt.figure(figsize=(14, 6))
-    dates = pd.date_range('2018-01-01', '2019-12-31', freq='M')
-    
-    # Simular drawdowns
-    np.random.seed(42)
-    mark_dd = np.cumsum(np.random.normal(0, 0.02, len(dates))) * -1
-    mark_dd = np.maximum(mark_dd, -0.123)  # Max DD -12.3%
-    
-    eq_dd = np.cumsum(np.random.normal(0, 0.025, len(dates))) * -1  
-    eq_dd = np.maximum(eq_dd, -0.197)  # Max DD -19.7%
-    
-    rp_dd = np.cumsum(np.random.normal(0, 0.023, len(dates))) * -1
-    rp_dd = np.maximum(rp_dd, -0.197)  # Max DD -19.7%
-    
-    plt.plot(dates, mark_dd * 100, label='Markowitz', linewidth=2, color='green')
-    plt.plot(dates, eq_dd * 100, label='Equal Weight', linewidth=2, color='blue') 
-    plt.plot(dates, rp_dd * 100, label='Risk Parity', linewidth=2, color='orange')
-    
-    plt.fill_between(dates, mark_dd * 100, 0, alpha=0.3, color='green')
-    plt.fill_between(dates, eq_dd * 100, 0, alpha=0.3, color='blue')
-    plt.fill_between(dates, rp_dd * 100, 0, alpha=0.3, color='orange')
-    
+
+    portfolio_value = (1 + portfolio_returns).cumprod()
+    drawdowns = (portfolio_value - portfolio_value.cummax()) / portfolio_value.cummax()
+
+    for strategy in drawdowns.columns:
+        color = STRATEGY_COLORS.get(strategy)
+        plt.plot(drawdowns.index, drawdowns[strategy] * 100, label=strategy, linewidth=2, color=color)
+        plt.fill_between(drawdowns.index, drawdowns[strategy] * 100, 0, alpha=0.3, color=color)
+
     plt.title('Evolucao dos Drawdowns das Carteiras (2018-2019)')
     plt.ylabel('Drawdown (%)')
     plt.legend()
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig('../Overleaf/images/drawdown_analysis.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("OK drawdown_analysis.png")
-    
-    # 6. Contribuição de risco
+    save_current_figure(output_paths)
+
+def create_risk_contribution(mean_weights, asset_returns, output_paths):
+    """Contribuição de risco por ativo: RCi = wi * (Σw)i / w'Σw (pesos médios, Σ do período de teste)"""
     plt.figure(figsize=(12, 6))
-    
-    assets = ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'ABEV3', 'B3SA3', 'WEGE3', 'RENT3', 'LREN3', 'ELET3']
-    
-    # Simulação da contribuição de risco
-    mark_contrib = [5, 8, 11, 9, 18, 13, 19, 15, 7, 6]  # Concentrado
-    rp_contrib = [10, 10, 10, 10, 10, 10, 10, 10, 10, 10]  # Equalizado
-    eq_contrib = [15, 12, 8, 7, 9, 8, 11, 13, 17, 10]  # Desigual
-    
+
+    assets = list(mean_weights.index)
+    cov_matrix = asset_returns[assets].cov().values
+
     x = np.arange(len(assets))
-    width = 0.25
-    
-    plt.bar(x - width, mark_contrib, width, label='Markowitz', color='green', alpha=0.7)
-    plt.bar(x, rp_contrib, width, label='Risk Parity', color='orange', alpha=0.7)  
-    plt.bar(x + width, eq_contrib, width, label='Equal Weight', color='blue', alpha=0.7)
-    
+    n_strategies = len(mean_weights.columns)
+    width = 0.75 / n_strategies
+
+    for i, strategy in enumerate(mean_weights.columns):
+        weights = mean_weights[strategy].values
+        risk_contrib = weights * np.dot(cov_matrix, weights) / np.dot(weights, np.dot(cov_matrix, weights))
+        offset = (i - (n_strategies - 1) / 2) * width
+        plt.bar(x + offset, risk_contrib * 100, width, label=strategy,
+                color=STRATEGY_COLORS.get(strategy), alpha=0.7)
+
     plt.xlabel('Ativos')
     plt.ylabel('Contribuicao de Risco (%)')
-    plt.title('Contribuicao de Risco por Ativo nas Tres Estrategias')
+    plt.title('Contribuicao de Risco por Ativo nas Estrategias')
     plt.xticks(x, assets, rotation=45)
     plt.legend()
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig('../Overleaf/images/risk_contribution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print("OK risk_contribution.png")
-    
+    save_current_figure(output_paths)
+
+def create_charts(formats=('png',)):
+    """Criar todos os gráficos (apenas os que tiveram dados alterados)"""
+    print("Criando graficos...")
+
+    # Mesmo diretório de generate_missing_charts: docs/Overleaf/images
+    render_figures(formats=formats)
+
     print("\nTODOS OS GRAFICOS CRIADOS COM SUCESSO!")
 
 if __name__ == "__main__":
-    create_charts()
\ No newline at end of file
+    create_charts()
@@ -0,0 +1,156 @@
+"""
+Validação da Qualidade dos Dados de Preços
+Uma passagem vetorizada sobre o painel diário (datas x ativos, NaN onde o
+ativo não tem cotação) marca, por ativo e data:
+
+- STALE: preço igual ao da cotação anterior por `stale_days` pregões seguidos
+  (marcado a partir do dia que completa a sequência)
+- JUMP: log-retorno entre cotações consecutivas a mais de `jump_sigma`
+  desvios robustos (1,4826·MAD do próprio ativo) da mediana
+- MISSING: data do calendário do painel (dias com alguma cotação), entre a
+  primeira e a última cotação do ativo, sem cotação do ativo
+- ZERO_VOLUME: cotação com volume zero (fontes com coluna de volume)
+
+Cada regra é uma operação elemento a elemento ou acumulada (cumsum,
+maximum.accumulate, nanmedian) sobre matrizes T x N: o custo é linear no
+tamanho do painel e a validação roda em toda carga de dados. A máscara
+combina as regras em bits (uint8); o relatório resume cada ativo junto das
+linhas descartadas na extração (preço ausente/<= 0 e datas repetidas, ver
+data_sources.clean_series) e dos meses perdidos no alinhamento mensal.
+Dias úteis (seg-sex) sem nenhuma cotação no painel são feriados ou falhas
+da fonte e são contados à parte.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from profiling import annotate, profiled
+
+STALE, JUMP, MISSING, ZERO_VOLUME = 1, 2, 4, 8
+FLAGS = {'stale': STALE, 'jump': JUMP, 'missing': MISSING, 'zero_volume': ZERO_VOLUME}
+DROPPED_KEYS = ('invalid_prices', 'duplicate_dates')
+
+
+def daily_panel(series):
+    """
+    Painéis diários de preços e volumes (datas x ativos) a partir de
+    {ativo: DataFrame (Date, Price[, Volume])} e as linhas descartadas por ativo
+    """
+    prices = pd.DataFrame({asset: data.set_index('Date')['Price'] for asset, data in series.items()}).sort_index()
+    volumes = pd.DataFrame({asset: (data.set_index('Date')['Volume'] if 'Volume' in data
+                                    else pd.Series(np.nan, index=data['Date']))
+                            for asset, data in series.items()}).reindex(index=prices.index, columns=prices.columns)
+    dropped = pd.DataFrame({asset: {key: data.attrs.get('dropped', {}).get(key, 0) for key in DROPPED_KEYS}
+                            for asset, data in series.items()}).T.reindex(columns=DROPPED_KEYS)
+    return prices, volumes, dropped
+
+
+class DataQualityValidator:
+    """
+    Regras de qualidade aplicadas a todos os ativos e datas de uma vez
+    """
+
+    def __init__(self, stale_days=5, jump_sigma=8.0):
+        if stale_days < 2 or jump_sigma <= 0:
+            raise ValueError("stale_days deve ser >= 2 e jump_sigma positivo")
+        self.stale_days = int(stale_days)
+        self.jump_sigma = jump_sigma
+
+    @profiled('data_quality')
+    def validate(self, prices, volumes=None, dropped=None):
+        """
+        Máscara (T x N, bits FLAGS) e relatório por ativo
+
+        prices: painel diário (NaN sem cotação); volumes: mesmo formato
+        (opcional); dropped: linhas descartadas na extração por ativo (DROPPED_KEYS).
+        """
+        values = prices.to_numpy(dtype=float)
+        n_dates, n_assets = values.shape
+        present = np.isfinite(values)
+        columns = np.arange(n_assets)
+
+        # Vida de cada ativo: da primeira à última cotação
+        alive = np.maximum.accumulate(present, axis=0) & np.maximum.accumulate(present[::-1], axis=0)[::-1]
+        missing = alive & ~present
+
+        # Cotação anterior de cada data (última linha com preço antes dela)
+        last_row = np.maximum.accumulate(np.where(present, np.arange(n_dates)[:, None], -1), axis=0)
+        previous_row = np.vstack([np.full((1, n_assets), -1), last_row[:-1]])
+        previous = np.where(previous_row >= 0, values[np.maximum(previous_row, 0), columns], np.nan)
+
+        # Preço repetido: comprimento da sequência, zerado a cada mudança de preço
+        unchanged = present & (values == previous)
+        repeats = np.cumsum(unchanged, axis=0)
+        run = repeats - np.maximum.accumulate(np.where(present & ~unchanged, repeats, 0), axis=0)
+        stale = unchanged & (run >= self.stale_days - 1)
+
+        # Saltos: desvio da mediana em unidades de MAD robusto
+        with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # Ativos sem retornos (coluna toda NaN)
+            returns = np.log(values / previous)
+            center = np.nanmedian(returns, axis=0)
+            scale = 1.4826 * np.nanmedian(np.abs(returns - center), axis=0)
+            zscores = np.where(scale > 0, np.abs(returns - center) / scale, np.nan)
+        jump = np.isfinite(zscores) & (zscores > self.jump_sigma)
+
+        if volumes is not None:
+            volume_values = volumes.reindex(index=prices.index, columns=prices.columns).to_numpy(dtype=float)
+            zero_volume = present & (volume_values == 0)
+        else:
+            zero_volume = np.zeros_like(present)
+
+        mask = (stale * STALE | jump * JUMP | missing * MISSING | zero_volume * ZERO_VOLUME).astype(np.uint8)
+        annotate(dates=n_dates, assets=n_assets)
+
+        observed = present.any(axis=0)
+        first = np.where(observed, present.argmax(axis=0), 0)
+        last = np.where(observed, n_dates - 1 - present[::-1].argmax(axis=0), 0)
+        dates = prices.index
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            max_zscore = np.nanmax(np.where(np.isfinite(zscores), zscores, np.nan), axis=0)
+        report = pd.DataFrame({
+            'first_date': dates[first].where(observed),
+            'last_date': dates[last].where(observed),
+            'observations': present.sum(axis=0),
+            'missing_days': missing.sum(axis=0),
+            'stale_days': stale.sum(axis=0),
+            'jumps': jump.sum(axis=0),
+            'max_abs_zscore': max_zscore,
+            'zero_volume_days': zero_volume.sum(axis=0),
+            'flagged_fraction': (mask != 0).sum(axis=0) / np.maximum(alive.sum(axis=0), 1)
+        }, index=prices.columns)
+        dropped = (dropped if dropped is not None else pd.DataFrame(columns=DROPPED_KEYS))
+        report = report.join(dropped.reindex(prices.columns).fillna(0).astype(int))
+
+        # Dias úteis sem nenhuma cotação no painel (feriados ou falhas da fonte)
+        calendar_gaps = 0
+        if n_dates > 0:
+            business_days = pd.bdate_range(dates[0], dates[-1])
+            calendar_gaps = int(len(business_days.difference(dates)))
+        report.attrs['calendar_gaps'] = calendar_gaps
+        return {'mask': pd.DataFrame(mask, index=dates, columns=prices.columns), 'report': report}
+
+
+def print_report(report):
+    """
+    Resumo por ativo (apenas ativos com alguma ocorrência)
+    """
+    counts = ['missing_days', 'stale_days', 'jumps', 'zero_volume_days', 'invalid_prices', 'duplicate_dates',
+              'missing_months']
+    counts = [column for column in counts if column in report]
+    flagged = report[report[counts].sum(axis=1) > 0]
+    print(f"\n=== QUALIDADE DOS DADOS ({len(report)} ativos; {report.attrs.get('calendar_gaps', 0)} dias úteis "
+          f"sem cotação no painel) ===")
+    if flagged.empty:
+        print("Nenhuma ocorrência")
+        return
+    print(f"{'Ativo':<8} {'Faltas':<7} {'Parado':<7} {'Saltos':<7} {'Vol. 0':<7} {'Inválid.':<9} "
+          f"{'Repet.':<7} {'Meses perd.':<12} {'Máx |z|'}")
+    print("-" * 80)
+    for asset, row in flagged.iterrows():
+        print(f"{asset:<8} {row['missing_days']:>6}  {row['stale_days']:>6}  {row['jumps']:>6}  "
+              f"{row['zero_volume_days']:>6}  {row['invalid_prices']:>8}  {row['duplicate_dates']:>6}  "
+              f"{row.get('missing_months', 0):>11}  {row['max_abs_zscore']:>6.1f}")
@@ -0,0 +1,310 @@
+"""
+Fontes de Dados de Preços (Excel, CSV, Parquet e NumPy em memória mapeada)
+Todas as fontes entregam, para uma lista de tickers, séries diárias
+(Date, Price) limpas e, quando há colunas de eventos corporativos,
+ajustadas (corporate_actions); EconomaticaLoader monta o mesmo painel
+mensal alinhado a partir de qualquer uma delas.
+
+- ExcelSource: planilha da Economatica (uma aba por ativo); a pasta é aberta
+  uma única vez e só as abas pedidas são lidas, cada uma com todas as colunas
+  (o cabeçalho fica algumas linhas abaixo do topo e as colunas de preço e de
+  eventos só são identificadas após a leitura, em extract_asset_data)
+- CsvSource / ParquetSource: tabelas 'long' (data, ticker, preço[, eventos])
+  ou 'wide' (data + uma coluna por ticker), lidas em blocos de `chunksize`
+  linhas apenas com as colunas necessárias; no formato long, cada bloco é
+  filtrado pelos tickers pedidos antes de ser acumulado
+- MemmapSource: matriz T x N em .npy (ordem de colunas, aberta com
+  mmap_mode='r') com datas e tickers em um .json ao lado; só as colunas
+  pedidas são copiadas, em blocos de linhas. MemmapSource.write converte um
+  painel para esse formato (ex.: um arquivo grande de fornecedor lido uma vez)
+
+A fonte é escolhida pela extensão do caminho (open_source) e o layout das
+tabelas pelo cabeçalho (coluna de ticker => long). Parquet requer pyarrow
+(dependência opcional, importada apenas quando usada).
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from corporate_actions import adjusted_series, find_columns, normalize_header
+from profiling import annotate, profiled, stage
+from risk_free import to_dates, to_number
+
+DEFAULT_CHUNKSIZE = 100_000
+DATE_COLUMNS = ('data', 'date', 'dt')
+TICKER_COLUMNS = ('ticker', 'ativo', 'codigo', 'symbol', 'papel')
+EVENT_KEYS = ('dividends', 'splits', 'factors')
+
+
+def clean_series(dates, prices, events=None, adjust=True, volumes=None):
+    """
+    (Date, Price, Volume) com data válida, preço > 0, sem datas repetidas e em
+    ordem cronológica; com colunas de eventos e adjust, preços ajustados
+    (retorno total). Retorna (DataFrame, número de eventos ajustados); as
+    linhas descartadas ficam em attrs['dropped'] (ver data_quality)
+    """
+    frame = pd.DataFrame({'Date': np.asarray(dates, dtype='datetime64[ns]'),
+                          'Price': np.asarray(prices, dtype=float),
+                          'Volume': np.asarray(volumes, dtype=float) if volumes is not None else np.nan})
+    events = events or {}
+    for key, values in events.items():
+        frame[key] = np.asarray(values, dtype=float)
+    dated = frame['Date'].notna()
+    valid = dated & (frame['Price'] > 0)
+    frame = frame[valid].sort_values('Date', kind='stable')
+    duplicated = frame['Date'].duplicated()
+    frame = frame[~duplicated].reset_index(drop=True)
+
+    n_events = 0
+    if adjust and events and len(frame) > 0:
+        adjusted, n_events = adjusted_series(frame['Price'].values, **{key: frame[key].values for key in events})
+        frame['Price'] = adjusted
+    frame = frame[['Date', 'Price', 'Volume']]
+    # Datas com preço ausente/<= 0 e datas repetidas (linhas sem data são rodapé/vazias)
+    frame.attrs['dropped'] = {'invalid_prices': int((dated & ~valid).sum()),
+                              'duplicate_dates': int(duplicated.sum())}
+    return frame, n_events
+
+
+def _find_column(header, candidates):
+    """
+    Primeira coluna cujo nome normalizado é um dos candidatos
+    """
+    for name in header:
+        if normalize_header(name) in candidates:
+            return name
+    return None
+
+
+class DataSource:
+    """
+    Fonte de séries diárias de preços por ticker
+    """
+
+    def __init__(self, path, chunksize=DEFAULT_CHUNKSIZE):
+        self.path = path
+        self.chunksize = int(chunksize)
+
+    def read(self, tickers, adjust=True):
+        """
+        {ticker: DataFrame (Date, Price)} dos tickers encontrados na fonte
+        """
+        raise NotImplementedError
+
+
+class ExcelSource(DataSource):
+    """
+    Planilha da Economatica: uma aba por ativo, extraída por parse_sheet
+    (EconomaticaLoader.extract_asset_data, que também aplica o ajuste)
+    """
+
+    def __init__(self, path, parse_sheet, chunksize=DEFAULT_CHUNKSIZE):
+        super().__init__(path, chunksize)
+        self.parse_sheet = parse_sheet
+
+    def read(self, tickers, adjust=True):
+        result = {}
+        with pd.ExcelFile(self.path) as workbook:
+            available = set(workbook.sheet_names)
+            for ticker in tickers:
+                if ticker not in available:
+                    print(f"  ERRO {ticker}: Aba não encontrada")
+                    continue
+                with stage('workbook_parse', asset=ticker):
+                    sheet_data = workbook.parse(ticker)
+                asset_data = self.parse_sheet(sheet_data, ticker)
+                if asset_data is not None:
+                    result[ticker] = asset_data
+        return result
+
+
+class _TabularSource(DataSource):
+    """
+    Tabelas long/wide lidas em blocos com projeção de colunas (CSV e Parquet)
+    """
+
+    def columns(self):
+        raise NotImplementedError
+
+    def chunks(self, usecols):
+        raise NotImplementedError
+
+    def parse_dates(self, values):
+        return pd.to_datetime(values, errors='coerce')
+
+    def parse_numbers(self, values):
+        return pd.to_numeric(values, errors='coerce')
+
+    def _long_columns(self, header, adjust):
+        """
+        Colunas de preço, de volume (ou None) e de eventos (só com preço não
+        ajustado) do formato long
+        """
+        found = find_columns(header)
+        preferred, other = ('adjusted_price', 'price') if adjust else ('price', 'adjusted_price')
+        price_key = preferred if found[preferred] is not None else other
+        if found[price_key] is None:
+            raise ValueError(f"{os.path.basename(self.path)}: coluna de preço não encontrada em {list(header)}")
+        events = {}
+        if adjust and price_key == 'price':
+            events = {key: header[found[key]] for key in EVENT_KEYS if found[key] is not None}
+        volume = header[found['volume']] if found['volume'] is not None else None
+        return header[found[price_key]], volume, events
+
+    @profiled('data_source.read')
+    def read(self, tickers, adjust=True):
+        header = list(self.columns())
+        date_column = _find_column(header, DATE_COLUMNS) or header[0]
+        ticker_column = _find_column(header, TICKER_COLUMNS)
+        wanted = set(tickers)
+        result = {}
+
+        if ticker_column is None:
+            # Wide: projeção nas colunas dos tickers pedidos
+            selected = [name for name in header if name in wanted]
+            data = pd.concat(list(self.chunks([date_column] + selected)), ignore_index=True)
+            dates = self.parse_dates(data[date_column])
+            for ticker in selected:
+                asset_data, _ = clean_series(dates, self.parse_numbers(data[ticker]))
+                if len(asset_data) > 0:
+                    result[ticker] = asset_data
+            annotate(layout='wide', rows=len(data), tickers=len(result))
+            return result
+
+        # Long: data, ticker, preço e eventos; linhas filtradas bloco a bloco
+        price_column, volume_column, events = self._long_columns(header, adjust)
+        optional = [volume_column] if volume_column is not None else []
+        usecols = list(dict.fromkeys([date_column, ticker_column, price_column, *optional, *events.values()]))
+        parts = []
+        for chunk in self.chunks(usecols):
+            codes = chunk[ticker_column].astype(str).str.strip()
+            parts.append(chunk[codes.isin(wanted)].assign(**{ticker_column: codes[codes.isin(wanted)]}))
+        data = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=usecols)
+        for ticker, rows in data.groupby(ticker_column, sort=False):
+            asset_data, n_events = clean_series(
+                self.parse_dates(rows[date_column]), self.parse_numbers(rows[price_column]),
+                {key: self.parse_numbers(rows[column]) for key, column in events.items()}, adjust,
+                self.parse_numbers(rows[volume_column]) if volume_column is not None else None)
+            if n_events:
+                print(f"  {ticker}: {n_events} eventos corporativos ajustados")
+            if len(asset_data) > 0:
+                result[ticker] = asset_data
+        annotate(layout='long', rows=len(data), tickers=len(result))
+        return result
+
+
+class CsvSource(_TabularSource):
+    """
+    CSV (separador detectado na primeira linha; vírgula decimal e datas
+    dd/mm/aaaa aceitas), lido em blocos pelo leitor C do pandas
+    """
+
+    def __init__(self, path, chunksize=DEFAULT_CHUNKSIZE, encoding='utf-8-sig'):
+        super().__init__(path, chunksize)
+        self.encoding = encoding
+        with open(path, encoding=encoding, newline='') as f:
+            first_line = f.readline()
+        try:
+            self.sep = csv.Sniffer().sniff(first_line, delimiters=',;\t|').delimiter
+        except csv.Error:
+            self.sep = ','
+
+    def columns(self):
+        return pd.read_csv(self.path, sep=self.sep, nrows=0, encoding=self.encoding).columns
+
+    def chunks(self, usecols):
+        with pd.read_csv(self.path, sep=self.sep, usecols=usecols, dtype=str, encoding=self.encoding,
+                         chunksize=self.chunksize) as reader:
+            yield from reader
+
+    def parse_dates(self, values):
+        return to_dates(values)
+
+    def parse_numbers(self, values):
+        return to_number(values)
+
+
+class ParquetSource(_TabularSource):
+    """
+    Parquet lido em lotes (pyarrow iter_batches) só com as colunas pedidas
+    """
+
+    def _parquet_file(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Leitura de Parquet requer pyarrow (pip install pyarrow)") from e
+        return pq.ParquetFile(self.path)
+
+    def columns(self):
+        return self._parquet_file().schema_arrow.names
+
+    def chunks(self, usecols):
+        for batch in self._parquet_file().iter_batches(batch_size=self.chunksize, columns=usecols):
+            yield batch.to_pandas()
+
+
+class MemmapSource(DataSource):
+    """
+    Matriz de preços T x N (.npy) aberta em memória mapeada; datas e tickers
+    no arquivo .json de mesmo nome
+    """
+
+    @staticmethod
+    def index_path(path):
+        return os.path.splitext(path)[0] + '.json'
+
+    @classmethod
+    def write(cls, path, prices):
+        """
+        Grava um painel de preços diários (DataFrame datas x tickers) no formato
+        da fonte; colunas contíguas para que a projeção leia só os tickers pedidos
+        """
+        prices = prices.sort_index()
+        np.save(path, np.asfortranarray(prices.to_numpy(dtype=float)))
+        with open(cls.index_path(path), 'w', encoding='utf-8') as f:
+            json.dump({'tickers': [str(ticker) for ticker in prices.columns],
+                       'dates': [date.strftime('%Y-%m-%d') for date in pd.DatetimeIndex(prices.index)]}, f)
+
+    @profiled('data_source.read')
+    def read(self, tickers, adjust=True):
+        with open(self.index_path(self.path), encoding='utf-8') as f:
+            index = json.load(f)
+        matrix = np.load(self.path, mmap_mode='r')
+        positions = {ticker: i for i, ticker in enumerate(index['tickers'])}
+        selected = [ticker for ticker in tickers if ticker in positions]
+        columns = [positions[ticker] for ticker in selected]
+        values = np.empty((matrix.shape[0], len(columns)))
+        for start in range(0, matrix.shape[0], self.chunksize):
+            values[start:start + self.chunksize] = matrix[start:start + self.chunksize, columns]
+        dates = pd.to_datetime(index['dates'])
+        annotate(rows=matrix.shape[0], tickers=len(selected))
+
+        result = {}
+        for j, ticker in enumerate(selected):
+            asset_data, _ = clean_series(dates, values[:, j])
+            if len(asset_data) > 0:
+                result[ticker] = asset_data
+        return result
+
+
+def open_source(path, parse_sheet=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Fonte de dados pela extensão do arquivo
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.xlsx', '.xlsm', '.xls'):
+        if parse_sheet is None:
+            raise ValueError("Planilhas da Economatica requerem parse_sheet (EconomaticaLoader.extract_asset_data)")
+        return ExcelSource(path, parse_sheet, chunksize)
+    if extension in ('.csv', '.txt', '.tsv'):
+        return CsvSource(path, chunksize)
+    if extension in ('.parquet', '.pq'):
+        return ParquetSource(path, chunksize)
+    if extension == '.npy':
+        return MemmapSource(path, chunksize)
+    raise ValueError(f"Formato de dados não suportado: {extension} (use .xlsx, .csv, .parquet ou .npy)")
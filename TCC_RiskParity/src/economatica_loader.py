@@ -5,12 +5,27 @@ Adapta os dados reais para usar com os scripts existentes do TCC
 Autor: Bruno Gasparoni Ballerini
 """
 
+import os
+import json
+import hashlib
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from profiling import profiled, stage
+from risk_free import to_dates, to_number
+from corporate_actions import find_columns
+from data_quality import DROPPED_KEYS, DataQualityValidator, daily_panel, print_report as print_quality_report
+from data_sources import EVENT_KEYS, clean_series, open_source
+
+# Versão do formato das séries extraídas (invalida o cache de abas em disco)
+SHEET_CACHE_VERSION = 2
+# Séries extraídas e ajustadas por versão da planilha, compartilhadas pelas
+# instâncias do processo (ex.: varredura de configurações)
+_parsed_sheets = {}
+
 class EconomaticaLoader:
     """
     Carrega dados reais da Economatica e adapta para uso nos scripts existentes
@@ -42,28 +57,89 @@ class EconomaticaLoader:
             'LREN3': {'name': 'Lojas Renner S.A.', 'sector': 'Comércio'},
             'ELET3': {'name': 'Centrais Elétricas Brasileiras', 'sector': 'Energia Elétrica'}
         }
+        # Índice de referência: aba da planilha ou arquivo local (CSV/Excel: data, nível)
+        self.benchmark_name = 'Ibovespa'
+        self.benchmark_sheet = 'IBOV'
+        self.benchmark_path = None
+        # Validação da qualidade a cada carga (relatório por ativo e máscara diária)
+        self.quality_validator = DataQualityValidator()
+        self.quality_report = None
+        self.quality_mask = None
+        # Preços ajustados por proventos e eventos corporativos (retorno total)
+        self.adjust_prices = True
+        # Cache em disco das abas extraídas (.npz); None = apenas em memória
+        self.sheet_cache_dir = None
         
-    def load_selected_sheets_only(self):
+    def _sheet_cache_key(self, sheet_name):
         """
-        Carrega apenas as abas dos ativos selecionados (mais rápido)
+        Hash da versão do arquivo de dados (caminho, tamanho, data de
+        modificação), do ativo e do modo de ajuste
         """
-        print("Carregando apenas abas dos ativos selecionados...")
-        try:
-            selected_sheets = {}
-            for asset in self.selected_assets:
-                try:
-                    sheet_data = pd.read_excel(self.data_path, sheet_name=asset)
-                    selected_sheets[asset] = sheet_data
-                    print(f"  OK {asset} carregado")
-                except Exception as e:
-                    print(f"  ERRO {asset} não encontrado ou erro: {e}")
-            
-            print(f"Total de abas carregadas: {len(selected_sheets)}")
-            return selected_sheets
-        except Exception as e:
-            print(f"Erro ao carregar arquivo: {e}")
-            return None
+        path = os.path.abspath(self.data_path)
+        file_stat = os.stat(path)
+        payload = json.dumps([path, file_stat.st_size, file_stat.st_mtime_ns, sheet_name,
+                              self.adjust_prices, SHEET_CACHE_VERSION])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def load_assets(self, names):
+        """
+        Séries diárias (Date, Price) por ativo, lidas da fonte de dados
+        (open_source: planilha, CSV, Parquet ou .npy conforme data_path),
+        extraídas e ajustadas uma única vez por versão do arquivo; só os
+        ativos fora do cache são lidos, em uma passagem pela fonte
+        """
+        result, missing, keys = {}, [], {}
+        for name in names:
+            try:
+                keys[name] = self._sheet_cache_key(name)
+            except OSError as e:
+                print(f"Erro ao carregar arquivo: {e}")
+                return {}
+            if keys[name] in _parsed_sheets:
+                result[name] = _parsed_sheets[keys[name]]
+                continue
+            cache_path = self._sheet_cache_path(keys[name])
+            if cache_path is not None and os.path.exists(cache_path):
+                with np.load(cache_path) as stored:
+                    result[name] = pd.DataFrame({'Date': stored['dates'], 'Price': stored['prices'],
+                                                 'Volume': stored['volumes']})
+                    result[name].attrs['dropped'] = dict(zip(DROPPED_KEYS, stored['dropped'].tolist()))
+                _parsed_sheets[keys[name]] = result[name]
+                print(f"  OK {name} carregado (cache)")
+            else:
+                missing.append(name)
+        
+        if missing:
+            try:
+                loaded = open_source(self.data_path, self.extract_asset_data).read(missing, self.adjust_prices)
+            except Exception as e:
+                print(f"Erro ao carregar arquivo: {e}")
+                loaded = {}
+            for name, asset_data in loaded.items():
+                cache_path = self._sheet_cache_path(keys[name])
+                if cache_path is not None:
+                    os.makedirs(self.sheet_cache_dir, exist_ok=True)
+                    dropped = asset_data.attrs.get('dropped', {})
+                    np.savez(cache_path, dates=asset_data['Date'].values.astype('datetime64[ns]'),
+                             prices=asset_data['Price'].values.astype(float),
+                             volumes=asset_data['Volume'].values.astype(float),
+                             dropped=np.array([dropped.get(key, 0) for key in DROPPED_KEYS]))
+                _parsed_sheets[keys[name]] = asset_data
+                result[name] = asset_data
+                print(f"  OK {name} carregado")
+        return result
+    
+    def _sheet_cache_path(self, key):
+        return os.path.join(self.sheet_cache_dir, f"{key}.npz") if self.sheet_cache_dir else None
+    
+    def load_asset_data(self, name):
+        """
+        Série diária (Date, Price) de um ativo (ver load_assets); None se
+        ausente da fonte ou sem dados
+        """
+        return self.load_assets([name]).get(name)
     
+    @profiled('extraction')
     def extract_asset_data(self, sheet_data, asset_code):
         """
         Extrai dados de preço de uma aba específica
@@ -99,15 +175,14 @@ class EconomaticaLoader:
             # Primeira coluna deve ser data
             dates = raw_data.iloc[:, 0]
             
-            # Procurar coluna de preços (geralmente "Fechamento", "Média" ou similar)
-            price_col = None
+            # Colunas de preço ("Fechamento", "Média" ou similar; ajustada por
+            # proventos se houver) e de eventos corporativos
             header_row = sheet_data.iloc[date_row]
-            
-            for i, col_name in enumerate(header_row):
-                if isinstance(col_name, str):
-                    if any(keyword in col_name.lower() for keyword in ['fechamento', 'média', 'medio', 'close', 'preço']):
-                        price_col = i
-                        break
+            columns = find_columns(header_row)
+            if self.adjust_prices:
+                price_col = columns['adjusted_price'] if columns['adjusted_price'] is not None else columns['price']
+            else:
+                price_col = columns['price'] if columns['price'] is not None else columns['adjusted_price']
             
             # Se não encontrou, usar uma coluna de preço padrão (geralmente coluna 6 ou 7)
             if price_col is None:
@@ -121,30 +196,21 @@ class EconomaticaLoader:
             
             if price_col is None:
                 return None
-                
-            prices = raw_data.iloc[:, price_col]
             
-            # Limpar e converter dados
-            clean_data = []
-            for i in range(len(dates)):
-                try:
-                    date_val = pd.to_datetime(dates.iloc[i], errors='coerce')
-                    price_val = pd.to_numeric(prices.iloc[i], errors='coerce')
-                    
-                    if pd.notna(date_val) and pd.notna(price_val) and price_val > 0:
-                        clean_data.append({
-                            'Date': date_val,
-                            'Price': price_val
-                        })
-                except:
-                    continue
+            # Limpar e converter dados (vetorizado); série não ajustada com colunas
+            # de eventos: ajuste retroativo (retorno total)
+            numeric = {key: pd.to_numeric(raw_data.iloc[:, columns[key]], errors='coerce').values
+                       for key in (*EVENT_KEYS, 'volume') if columns[key] is not None}
+            volumes = numeric.pop('volume', None)
+            asset_df, n_events = clean_series(pd.to_datetime(dates, errors='coerce', format='mixed'),
+                                              pd.to_numeric(raw_data.iloc[:, price_col], errors='coerce'),
+                                              numeric, adjust=self.adjust_prices and price_col == columns['price'],
+                                              volumes=volumes)
             
-            if len(clean_data) < 10:  # Muito poucos dados válidos
+            if len(asset_df) < 10:  # Muito poucos dados válidos
                 return None
-                
-            # Criar DataFrame
-            asset_df = pd.DataFrame(clean_data)
-            asset_df = asset_df.drop_duplicates('Date').sort_values('Date')
+            if n_events:
+                print(f"  {asset_code}: {n_events} eventos corporativos ajustados")
             
             return asset_df
             
@@ -152,16 +218,15 @@ class EconomaticaLoader:
             print(f"Erro ao processar {asset_code}: {e}")
             return None
     
-    def load_selected_assets(self, start_date='2018-01-01', end_date='2019-12-31'):
+    @profiled('load_data')
+    def load_selected_assets(self, start_date='2018-01-01', end_date='2019-12-31', min_observations=12):
         """
         Carrega dados dos ativos selecionados para o período especificado
+        (min_observations: meses exigidos por ativo; menor na atualização incremental)
         """
         print(f"Carregando dados dos ativos selecionados para {start_date} a {end_date}...")
         
-        all_sheets = self.load_selected_sheets_only()
-        if all_sheets is None:
-            return None, None
-            
+        all_data = self.load_assets(self.selected_assets)
         start_date = pd.to_datetime(start_date)
         end_date = pd.to_datetime(end_date)
         
@@ -171,34 +236,29 @@ class EconomaticaLoader:
         for asset in self.selected_assets:
             print(f"Processando {asset}...")
             
-            if asset in all_sheets:
-                asset_data = self.extract_asset_data(all_sheets[asset], asset)
-                
-                if asset_data is not None and len(asset_data) > 0:
-                    # Filtrar por período
-                    period_data = asset_data[
-                        (asset_data['Date'] >= start_date) & 
-                        (asset_data['Date'] <= end_date)
-                    ].copy()
-                    
-                    if len(period_data) >= 12:  # Pelo menos 12 observações no período
-                        # Converter para mensal (pegar último dia de cada mês)
-                        period_data['YearMonth'] = period_data['Date'].dt.to_period('M')
-                        monthly_data = period_data.groupby('YearMonth').last().reset_index()
-                        monthly_data['Date'] = monthly_data['YearMonth'].dt.end_time
-                        
-                        if len(monthly_data) >= 12:  # Pelo menos 12 meses
-                            asset_prices[asset] = monthly_data[['Date', 'Price']].set_index('Date')['Price']
-                            successful_assets.append(asset)
-                            print(f"  OK {asset}: {len(monthly_data)} observações mensais")
-                        else:
-                            print(f"  ERRO {asset}: Poucos dados mensais ({len(monthly_data)})")
+            asset_data = all_data.get(asset)
+
+            if asset_data is not None and len(asset_data) > 0:
+                # Filtrar por período
+                period_data = asset_data[
+                    (asset_data['Date'] >= start_date) & 
+                    (asset_data['Date'] <= end_date)
+                ].copy()
+
+                if len(period_data) >= min_observations:  # Pelo menos 12 observações no período
+                    with stage('resampling', asset=asset):
+                        monthly_data = self.to_monthly(period_data)
+
+                    if len(monthly_data) >= min_observations:  # Pelo menos 12 meses
+                        asset_prices[asset] = monthly_data[['Date', 'Price']].set_index('Date')['Price']
+                        successful_assets.append(asset)
+                        print(f"  OK {asset}: {len(monthly_data)} observações mensais")
                     else:
-                        print(f"  ERRO {asset}: Poucos dados no período ({len(period_data)})")
+                        print(f"  ERRO {asset}: Poucos dados mensais ({len(monthly_data)})")
                 else:
-                    print(f"  ERRO {asset}: Não foi possível extrair dados")
+                    print(f"  ERRO {asset}: Poucos dados no período ({len(period_data)})")
             else:
-                print(f"  ERRO {asset}: Aba não encontrada")
+                print(f"  ERRO {asset}: Não foi possível extrair dados")
         
         if len(successful_assets) < 5:
             print(f"ATENÇÃO: Apenas {len(successful_assets)} ativos com dados suficientes!")
@@ -207,9 +267,18 @@ class EconomaticaLoader:
         
         # Criar DataFrame de preços alinhado
         price_df = pd.DataFrame(asset_prices)
+        missing_months = price_df.isna().sum()  # Meses perdidos no alinhamento, por ativo sem cotação
         price_df = price_df.dropna()  # Remove períodos com dados faltantes
         
-        if len(price_df) < 12:
+        in_period = {asset: data[(data['Date'] >= start_date) & (data['Date'] <= end_date)]
+                     for asset, data in all_data.items()}
+        quality = self.quality_validator.validate(*daily_panel(in_period))
+        self.quality_mask = quality['mask']
+        self.quality_report = quality['report'].assign(
+            missing_months=missing_months.reindex(quality['report'].index).fillna(0).astype(int))
+        print_quality_report(self.quality_report)
+        
+        if len(price_df) < min_observations:
             print("ERRO: Poucos períodos com dados completos para todos os ativos")
             return None, None
         
@@ -223,6 +292,73 @@ class EconomaticaLoader:
         
         return returns_df, price_df
     
+    def to_monthly(self, period_data):
+        """
+        Converte para mensal (último dia de cada mês, datadas no fim do mês)
+        """
+        period_data = period_data.copy()
+        period_data['YearMonth'] = period_data['Date'].dt.to_period('M')
+        monthly_data = period_data.groupby('YearMonth').last().reset_index()
+        monthly_data['Date'] = monthly_data['YearMonth'].dt.end_time
+        return monthly_data
+    
+    @profiled('load_history')
+    def load_return_history(self, start_date, end_date):
+        """
+        Retornos logarítmicos mensais dos ativos selecionados sem exigir
+        histórico comum (NaN antes da listagem e nas lacunas), para janelas
+        anteriores ao período do backtest
+        """
+        all_data = self.load_assets(self.selected_assets)
+        start_date = pd.to_datetime(start_date)
+        end_date = pd.to_datetime(end_date)
+        
+        asset_prices = {}
+        for asset in self.selected_assets:
+            asset_data = all_data.get(asset)
+            if asset_data is None:
+                continue
+            period_data = asset_data[(asset_data['Date'] >= start_date) & (asset_data['Date'] <= end_date)]
+            if len(period_data) > 0:
+                asset_prices[asset] = self.to_monthly(period_data).set_index('Date')['Price']
+        if not asset_prices:
+            return None
+        price_df = pd.DataFrame(asset_prices).reindex(columns=[a for a in self.selected_assets if a in asset_prices])
+        return np.log(price_df / price_df.shift(1)).iloc[1:]
+    
+    @profiled('load_benchmark')
+    def load_benchmark(self, start_date='2018-01-01', end_date='2019-12-31'):
+        """
+        Nível mensal do índice de referência (aba benchmark_sheet da planilha ou
+        arquivo benchmark_path); None se indisponível
+        """
+        source = self.benchmark_path or f"{os.path.basename(self.data_path)} [{self.benchmark_sheet}]"
+        try:
+            if self.benchmark_path is None:
+                index_data = self.load_asset_data(self.benchmark_sheet)
+            elif os.path.splitext(self.benchmark_path)[1].lower() in ('.xlsx', '.xls'):
+                index_data = self.extract_asset_data(pd.read_excel(self.benchmark_path), self.benchmark_name)
+            else:
+                raw = pd.read_csv(self.benchmark_path, sep=None, engine='python', dtype=str)
+                index_data = pd.DataFrame({'Date': to_dates(raw.iloc[:, 0]),
+                                           'Price': to_number(raw.iloc[:, 1]).values})
+                index_data = index_data.dropna().drop_duplicates('Date').sort_values('Date')
+        except Exception as e:
+            print(f"  ERRO {self.benchmark_name} ({source}): {e}")
+            return None
+        
+        if index_data is None or len(index_data) == 0:
+            print(f"  ERRO {self.benchmark_name}: Não foi possível extrair dados de {source}")
+            return None
+        period_data = index_data[(index_data['Date'] >= pd.to_datetime(start_date)) &
+                                 (index_data['Date'] <= pd.to_datetime(end_date))]
+        if len(period_data) == 0:
+            print(f"  ERRO {self.benchmark_name}: Sem dados no período")
+            return None
+        monthly_data = self.to_monthly(period_data)
+        print(f"  OK {self.benchmark_name}: {len(monthly_data)} observações mensais")
+        return monthly_data.set_index('Date')['Price'].rename(self.benchmark_name)
+    
     def get_asset_info_for_successful(self, successful_assets):
         """
         Retorna informações dos ativos que foram carregados com sucesso
@@ -263,6 +399,37 @@ class EconomaticaLoader:
         
         return pd.DataFrame(stats_data)
 
+def default_results_dir():
+    import os
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "..", "results")
+
+def save_loaded_data(loader, returns_df, prices_df, output_dir=None):
+    """
+    Salva retornos, preços e estatísticas resumidas em CSV (padrão: results/)
+    """
+    import os
+    output_dir = output_dir or default_results_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    
+    summary_stats = loader.create_summary_stats(returns_df)
+    returns_df.to_csv(os.path.join(output_dir, "real_returns_data.csv"))
+    prices_df.to_csv(os.path.join(output_dir, "real_prices_data.csv"))
+    summary_stats.to_csv(os.path.join(output_dir, "real_data_summary.csv"), index=False)
+    
+    print(f"\nDados salvos em {output_dir}:")
+    print("- real_returns_data.csv")
+    print("- real_prices_data.csv") 
+    print("- real_data_summary.csv")
+    if loader.quality_report is not None:
+        loader.quality_report.to_csv(os.path.join(output_dir, "data_quality_report.csv"))
+        # Máscara diária apenas nas datas com ocorrência (bits: ver data_quality.FLAGS)
+        mask = loader.quality_mask
+        mask[(mask != 0).any(axis=1)].to_csv(os.path.join(output_dir, "data_quality_mask.csv"))
+        print("- data_quality_report.csv")
+        print("- data_quality_mask.csv")
+    return summary_stats
+
 def main():
     """
     Testa o carregamento dos dados reais
@@ -282,14 +449,7 @@ def main():
         print(summary_stats.to_string(index=False))
         
         # Salvar dados para uso nos outros scripts
-        returns_df.to_csv("../results/real_returns_data.csv")
-        prices_df.to_csv("../results/real_prices_data.csv")
-        summary_stats.to_csv("../results/real_data_summary.csv", index=False)
-        
-        print(f"\nDados salvos em:")
-        print("- real_returns_data.csv")
-        print("- real_prices_data.csv") 
-        print("- real_data_summary.csv")
+        save_loaded_data(loader, returns_df, prices_df)
         
         return returns_df, prices_df
     else:
@@ -297,9 +457,5 @@ def main():
         return None, None
 
 if __name__ == "__main__":
-    # Criar diretório para resultados
-    import os
-    os.makedirs('../results', exist_ok=True)
-    
     # Executar teste
-    returns, prices = main()
\ No newline at end of file
+    returns, prices = main()
@@ -0,0 +1,348 @@
+"""
+Fronteira Eficiente e Família de Risk Budgeting em Lote
+- Fronteira média-variância com limites de peso: centenas de retornos-alvo.
+  Apenas a mínima variância é resolvida numericamente (SLSQP com gradientes
+  analíticos); os demais pontos seguem o caminho paramétrico da solução
+  (linha crítica), cada um partindo do conjunto ativo do vizinho
+- Família de carteiras de risk budgeting entre o ERC e a mínima variância:
+  orçamentos b(t) = (1 - t)/n + t * RC_mv, resolvidos pelo método de Newton
+  de Spinu (2013), cada ponto partindo da solução vizinha
+
+Σ é fatorada (Cholesky) uma única vez; riscos e contribuições de risco de
+todos os pontos são avaliados em lote com esse fator.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cholesky
+from scipy.optimize import minimize
+
+from profiling import annotate, profiled
+from risk_budgeting import solve_risk_budget
+
+
+class EfficientFrontier:
+    """
+    Fronteira eficiente e família de risk budgeting para (μ, Σ) anualizados
+    """
+
+    def __init__(self, expected_returns, cov_matrix, weight_bounds=(0.0, 1.0)):
+        self.assets = list(getattr(expected_returns, 'index', range(len(expected_returns))))
+        self.mu = np.asarray(expected_returns, dtype=float)
+        self.cov = np.asarray(cov_matrix, dtype=float)
+        self.n_assets = len(self.mu)
+        self.weight_bounds = tuple(float(bound) for bound in weight_bounds)  # YAML pode trazer inteiros
+        if self.weight_bounds[0] * self.n_assets > 1 or self.weight_bounds[1] * self.n_assets < 1:
+            raise ValueError(f"Limites {self.weight_bounds} inviáveis para {self.n_assets} ativos")
+
+        # Fatoração única de Σ (com pequeno ajuste na diagonal se não for definida positiva)
+        jitter = 0.0
+        while True:
+            try:
+                self.chol = cholesky(self.cov + jitter * np.eye(self.n_assets), lower=True)
+                break
+            except np.linalg.LinAlgError:
+                jitter = max(jitter * 10, 1e-10 * np.trace(self.cov) / self.n_assets)
+        self.jitter = jitter
+
+        self.stats = {'frontier_solves': 0, 'frontier_iterations': 0, 'frontier_linear_solves': 0,
+                      'frontier_breakpoints': 0, 'newton_iterations': 0, 'slsqp_gap': np.nan}
+
+    @classmethod
+    def from_parameters(cls, parameters, weight_bounds=(0.0, 1.0)):
+        """
+        A partir do dicionário de estimate_parameters
+        """
+        return cls(parameters['expected_returns'], parameters['cov_matrix'], weight_bounds)
+
+    # ------------------------------------------------------------------
+    # Avaliação em lote
+    # ------------------------------------------------------------------
+    def portfolio_stats(self, weights):
+        """
+        Retorno, volatilidade e contribuições de risco (fração) de W (pontos x ativos)
+        """
+        weights = np.atleast_2d(weights)
+        factor = weights @ self.chol                     # linhas: L'w
+        variance = np.einsum('ij,ij->i', factor, factor)
+        marginal = factor @ self.chol.T                  # linhas: Σw
+        risk_contrib = weights * marginal / variance[:, None]
+        return weights @ self.mu, np.sqrt(variance), risk_contrib
+
+    # ------------------------------------------------------------------
+    # Fronteira média-variância
+    # ------------------------------------------------------------------
+    def _extreme_return_portfolio(self, highest=True):
+        """
+        Carteira de retorno máximo (ou mínimo) dentro dos limites: preenchimento guloso
+        """
+        lower, upper = self.weight_bounds
+        weights = np.full(self.n_assets, float(lower))
+        remaining = 1.0 - weights.sum()
+        order = np.argsort(-self.mu if highest else self.mu)
+        for i in order:
+            add = min(upper - lower, remaining)
+            weights[i] += add
+            remaining -= add
+            if remaining <= 1e-15:
+                break
+        return weights
+
+    def _solve(self, x0, target=None):
+        constraints = [{'type': 'eq', 'fun': lambda w: np.sum(w) - 1.0,
+                        'jac': lambda w: np.ones_like(w)}]
+        if target is not None:
+            constraints.append({'type': 'eq', 'fun': lambda w: self.mu @ w - target,
+                                'jac': lambda w: self.mu})
+        result = minimize(
+            lambda w: w @ self.cov @ w, x0,
+            jac=lambda w: 2.0 * (self.cov @ w),
+            method='SLSQP',
+            bounds=[self.weight_bounds] * self.n_assets,
+            constraints=constraints,
+            options={'ftol': 1e-12, 'maxiter': 500}
+        )
+        self.stats['frontier_solves'] += 1
+        self.stats['frontier_iterations'] += int(result.nit)
+        return np.clip(result.x, *self.weight_bounds), result
+
+    def min_variance(self, x0=None):
+        """
+        Carteira de mínima variância com os limites de peso
+        """
+        if x0 is None:
+            x0 = np.full(self.n_assets, 1.0 / self.n_assets)
+        weights, _ = self._solve(x0)
+        return weights / weights.sum()
+
+    def _segment(self, state):
+        """
+        Solução KKT com o conjunto ativo fixo, linear no retorno-alvo τ
+
+        state: 0 = livre, -1 = no limite inferior, +1 = no limite superior.
+        Retorna (livres, pesos fixos, w_F = p + qτ, g_B = r + sτ), onde g_B é o
+        gradiente do lagrangiano nos ativos presos (≥ 0 no inferior, ≤ 0 no superior).
+        """
+        lower, upper = self.weight_bounds
+        free = state == 0
+        bound = ~free
+        w_bound = np.where(state[bound] < 0, lower, upper)
+        n_free = int(free.sum())
+        if n_free < 2:
+            raise np.linalg.LinAlgError("Conjunto livre com menos de dois ativos")
+
+        cov_ff = self.cov[np.ix_(free, free)]
+        cov_fb = self.cov[np.ix_(free, bound)]
+        mu_f = self.mu[free]
+
+        # Stationarity: Σ_FF w_F + Σ_FB w_B - γ1 - λμ_F = 0; restrições de soma e retorno
+        kkt = np.zeros((n_free + 2, n_free + 2))
+        kkt[:n_free, :n_free] = cov_ff
+        kkt[:n_free, n_free] = kkt[n_free, :n_free] = -1.0
+        kkt[:n_free, n_free + 1] = kkt[n_free + 1, :n_free] = -mu_f
+        rhs = np.zeros((n_free + 2, 2))
+        rhs[:n_free, 0] = -cov_fb @ w_bound
+        rhs[n_free, 0] = -(1.0 - w_bound.sum())
+        rhs[n_free + 1, 0] = self.mu[bound] @ w_bound
+        rhs[n_free + 1, 1] = -1.0
+        solution = np.linalg.solve(kkt, rhs)
+        self.stats['frontier_linear_solves'] += 1
+
+        p, q = solution[:n_free, 0], solution[:n_free, 1]
+        gamma, lam = solution[n_free], solution[n_free + 1]
+        cov_bf = self.cov[np.ix_(bound, free)]
+        cov_bb = self.cov[np.ix_(bound, bound)]
+        mu_b = self.mu[bound]
+        r = cov_bf @ p + cov_bb @ w_bound - gamma[0] - lam[0] * mu_b
+        s = cov_bf @ q - gamma[1] - lam[1] * mu_b
+        return free, w_bound, (p, q), (r, s)
+
+    def _compose(self, free, w_bound, p, q, tau):
+        weights = np.empty(self.n_assets)
+        weights[free] = p + q * tau
+        weights[~free] = w_bound
+        return np.clip(weights, *self.weight_bounds)
+
+    def _repair_active_set(self, state, tau, tol=1e-9):
+        """
+        Ajusta o conjunto ativo inicial (vindo de um solve numérico) até ser consistente em τ
+        """
+        lower, upper = self.weight_bounds
+        for _ in range(2 * self.n_assets):
+            free, _, (p, q), (r, s) = self._segment(state)
+            w_free = p + q * tau
+            g_bound = r + s * tau
+            free_idx = np.flatnonzero(free)
+            bound_idx = np.flatnonzero(~free)
+            if np.any(w_free < lower - tol) or np.any(w_free > upper + tol):
+                i = np.argmax(np.maximum(lower - w_free, w_free - upper))
+                state[free_idx[i]] = -1 if w_free[i] < lower else 1
+                continue
+            wrong_sign = np.where(state[bound_idx] < 0, -g_bound, g_bound)
+            if np.any(wrong_sign > tol):
+                state[bound_idx[np.argmax(wrong_sign)]] = 0
+                continue
+            return state
+        raise np.linalg.LinAlgError("Conjunto ativo inicial inconsistente")
+
+    @profiled('frontier')
+    def frontier(self, n_points=200, check_tolerance=1e-4):
+        """
+        Ramo eficiente: da mínima variância ao retorno máximo viável
+
+        Um único solve numérico (mínima variância); os demais alvos seguem o
+        caminho paramétrico da solução (linha crítica): com o conjunto ativo
+        fixo os pesos são lineares no alvo, e cada ponto parte do conjunto
+        ativo do vizinho, trocando-o apenas nos pontos de quebra. Se o sistema
+        KKT degenerar, o alvo é resolvido por SLSQP a partir do vizinho.
+
+        Retorna DataFrame com target_return, return, volatility e um
+        DataFrame de pesos (pontos x ativos) em self.frontier_weights. Alguns
+        alvos são conferidos contra o SLSQP (check_against_slsqp); desvio
+        acima de check_tolerance gera um aviso.
+        """
+        lower, upper = self.weight_bounds
+        min_var = self.min_variance()
+        max_return = self._extreme_return_portfolio(highest=True)
+        targets = np.linspace(self.mu @ min_var, self.mu @ max_return, n_points)
+
+        weights = np.empty((n_points, self.n_assets))
+        weights[0] = min_var
+        weights[-1] = max_return  # Único ponto viável no retorno máximo
+
+        tolerance = 1e-9
+        state = np.where(min_var <= lower + tolerance, -1, np.where(min_var >= upper - tolerance, 1, 0))
+        tau = targets[0]
+        try:
+            state = self._repair_active_set(state, tau)
+        except np.linalg.LinAlgError:
+            state = None
+
+        event_tol = 1e-12 * max(1.0, abs(targets[-1] - targets[0]))
+        for k in range(1, n_points - 1):
+            target = targets[k]
+            try:
+                if state is None:
+                    raise np.linalg.LinAlgError("Sem conjunto ativo")
+                for _ in range(4 * self.n_assets):
+                    free, w_bound, (p, q), (r, s) = self._segment(state)
+                    free_idx = np.flatnonzero(free)
+                    bound_idx = np.flatnonzero(~free)
+
+                    # Próximo ponto de quebra: livre atinge limite ou preso perde otimalidade
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        hit_free = np.where(q > 0, (upper - p) / q, np.where(q < 0, (lower - p) / q, np.inf))
+                        release = np.where(state[bound_idx] < 0,
+                                           np.where(s < 0, -r / s, np.inf),
+                                           np.where(s > 0, -r / s, np.inf))
+                    hit_free[hit_free <= tau + event_tol] = np.inf
+                    release[release <= tau + event_tol] = np.inf
+
+                    next_free = np.min(hit_free) if len(hit_free) else np.inf
+                    next_release = np.min(release) if len(release) else np.inf
+                    if min(next_free, next_release) > target:
+                        weights[k] = self._compose(free, w_bound, p, q, target)
+                        tau = target
+                        break
+
+                    self.stats['frontier_breakpoints'] += 1
+                    if next_free <= next_release:
+                        i = free_idx[np.argmin(hit_free)]
+                        state[i] = 1 if q[np.argmin(hit_free)] > 0 else -1
+                        tau = next_free
+                    else:
+                        state[bound_idx[np.argmin(release)]] = 0
+                        tau = next_release
+                else:
+                    raise np.linalg.LinAlgError("Ciclagem no conjunto ativo")
+            except np.linalg.LinAlgError:
+                # Fallback: SLSQP a partir do vizinho; o caminho é retomado daqui
+                weights[k], _ = self._solve(weights[k - 1], target=target)
+                tau = target
+                state = np.where(weights[k] <= lower + tolerance, -1,
+                                 np.where(weights[k] >= upper - tolerance, 1, 0))
+                try:
+                    state = self._repair_active_set(state, tau)
+                except np.linalg.LinAlgError:
+                    state = None
+
+        returns, volatility, _ = self.portfolio_stats(weights)
+        annotate(points=n_points, iterations=self.stats['frontier_linear_solves'])
+
+        self.frontier_weights = pd.DataFrame(weights, columns=self.assets)
+        frontier = pd.DataFrame({'target_return': targets, 'return': returns, 'volatility': volatility})
+        gap = self.check_against_slsqp(frontier)
+        if gap > check_tolerance:
+            print(f"AVISO: Fronteira paramétrica difere do SLSQP (volatilidade relativa {gap:.2e})")
+        return frontier
+
+    def check_against_slsqp(self, frontier, n_checks=3):
+        """
+        Maior diferença relativa de volatilidade entre a fronteira e o SLSQP
+        (partindo de pesos iguais) em n_checks alvos internos
+        """
+        n_points = len(frontier)
+        if n_points < 3:
+            return 0.0
+        indices = np.unique(np.linspace(1, n_points - 2, n_checks).round().astype(int))
+        x0 = np.full(self.n_assets, 1.0 / self.n_assets)
+        reference = np.array([self._solve(x0, target=frontier['target_return'].iloc[i])[0] for i in indices])
+        _, reference_volatility, _ = self.portfolio_stats(reference)
+        volatility = frontier['volatility'].values[indices]
+        gap = float(np.max((volatility - reference_volatility) / reference_volatility))
+        self.stats['slsqp_gap'] = gap
+        return gap
+
+    # ------------------------------------------------------------------
+    # Risk budgeting
+    # ------------------------------------------------------------------
+    def risk_budget(self, budgets, y0=None):
+        """
+        Carteira com contribuições de risco proporcionais a `budgets`
+        (solver de risk_budgeting; sem os limites de peso da metodologia)
+        """
+        budgets = np.asarray(budgets, dtype=float)
+        if y0 is None:
+            y0 = budgets / np.linalg.norm(self.chol.T @ budgets)
+        weights, y, info = solve_risk_budget(self.cov, budgets, y0=y0)
+        self.stats['newton_iterations'] += info['iterations']
+        return weights, y
+
+    @profiled('risk_budget_family')
+    def risk_budget_family(self, n_points=50, min_variance_weights=None):
+        """
+        Carteiras de risk budgeting do ERC (t = 0) à mínima variância (t = 1)
+
+        Orçamentos b(t) = (1 - t)/n + t * RC_mv, onde RC_mv são as contribuições
+        de risco da carteira de mínima variância com limites. Cada ponto parte
+        da solução vizinha (poucas iterações de Newton por ponto).
+        """
+        if min_variance_weights is None:
+            min_variance_weights = self.min_variance()
+        _, _, rc_min_var = self.portfolio_stats(min_variance_weights)
+        rc_min_var = np.maximum(rc_min_var[0], 1e-8)
+        rc_min_var /= rc_min_var.sum()
+
+        equal = np.full(self.n_assets, 1.0 / self.n_assets)
+        t_values = np.linspace(0.0, 1.0, n_points)
+        weights = np.empty((n_points, self.n_assets))
+        y = None
+        for i, t in enumerate(t_values):
+            weights[i], y = self.risk_budget((1 - t) * equal + t * rc_min_var, y0=y)
+
+        returns, volatility, risk_contrib = self.portfolio_stats(weights)
+        annotate(points=n_points, iterations=self.stats['newton_iterations'])
+
+        self.family_weights = pd.DataFrame(weights, columns=self.assets)
+        self.family_risk_contributions = pd.DataFrame(risk_contrib, columns=self.assets)
+        return pd.DataFrame({'t': t_values, 'return': returns, 'volatility': volatility})
+
+
+def compute_frontiers(parameters, weight_bounds, n_frontier=200, n_family=50):
+    """
+    Fronteira eficiente e família ERC -> mínima variância em um único objeto
+    """
+    engine = EfficientFrontier.from_parameters(parameters, weight_bounds)
+    frontier = engine.frontier(n_frontier)
+    family = engine.risk_budget_family(n_family, min_variance_weights=engine.frontier_weights.values[0])
+    return engine, frontier, family
@@ -12,34 +12,143 @@ CDI Real do período de teste: 2018 (6,43%) e 2019 (5,96%) = Média 6,195% a.a.
 Fonte: Investidor10 (dados oficiais B3/BCB)
 """
 
+import hashlib
+import os
+from itertools import combinations
 import pandas as pd
 import numpy as np
 from scipy.optimize import minimize
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
-import cvxpy as cp
 from scipy import stats
 
+from benchmark_analytics import (active_risk_decomposition, benchmark_moments, print_report,
+                                 relative_performance, tracking_error_max_sharpe)
+from cvar_optimization import monte_carlo_scenarios, solve_cvar
 from economatica_loader import EconomaticaLoader
+from results_store import ResultsStore, config_hash
+from risk_budgeting import RiskBudgeting
+from risk_free import RiskFreeRate, excess_returns
+from robust_markowitz import resampled_max_sharpe, robust_max_sharpe
+from solver_cache import SolverCache, memoize_strategy
+from stress_testing import StressTester, print_report as print_stress_report, scenario_library
+from vol_targeting import VolatilityTargeting, print_report as print_vol_target_report
+from walk_forward import WalkForwardSelector, shrink_covariance
+from latex_tables import LatexTableExporter
+from profiling import annotate, configure_from_env, profiled
+
+BOOTSTRAP_TASK_DRAWS = 10_000  # Reamostras por tarefa do bootstrap retomável (job_runner)
 
 class FinalMethodologyAnalyzer:
     """
     Implementação final seguindo EXATAMENTE a metodologia definida no TCC
     """
     
-    def __init__(self):
+    # Atributos ajustáveis por configure() (seção 'backtest' do arquivo de configuração da CLI)
+    SETTINGS = ['data_start', 'data_end', 'rebalancing_dates', 'estimation_window_days', 'weight_bounds',
+                'strategies', 'annual_cdi', 'risk_free_rate', 'risk_free_path', 'risk_free_unit',
+                'sector_budgets', 'asset_risk_budgets', 'cvar_alpha', 'cvar_scenarios', 'cvar_n_scenarios', 'cvar_target_return',
+                'resampling_draws', 'resampling_workers', 'robust_confidence',
+                'walk_forward_windows', 'walk_forward_shrinkages', 'walk_forward_validation_months',
+                'tracking_error_limit', 'vol_target', 'vol_target_method', 'vol_target_decay',
+                'vol_target_window', 'vol_target_frequency', 'max_leverage', 'borrowing_spread',
+                'bootstrap_draws']
+    LOADER_SETTINGS = ['data_path', 'selected_assets', 'benchmark_path', 'benchmark_sheet', 'adjust_prices',
+                       'sheet_cache_dir']
+    
+    def __init__(self, results_store=None, solver_cache=None, settings=None):
         self.loader = EconomaticaLoader()
+        self.results_store = results_store  # ResultsStore opcional (cache de execuções)
+        self.solver_cache = solver_cache  # SolverCache opcional (cache de pesos por período)
+        self.run_hash = None
         
         # CDI REAL do período (fonte: Investidor10 - dados B3/BCB)
-        self.cdi_2018 = 0.0643  # 6,43% a.a.
-        self.cdi_2019 = 0.0596  # 5,96% a.a.
+        self.annual_cdi = {2018: 0.0643, 2019: 0.0596}  # 6,43% e 5,96% a.a.
         self.risk_free_rate = 0.06195  # Média 2018-2019: 6,195% a.a.
+        # Série do CDI (CSV/Excel, ver risk_free.py); None = taxa constante risk_free_rate
+        self.risk_free_path = None
+        self.risk_free_unit = 'daily_pct'
+        self.risk_free = None
+        self.monthly_rf = None  # Taxas mensais alinhadas aos retornos (índice mensal)
+        
+        # Estrutura temporal e restrições (compõem o hash da configuração)
+        self.data_start = '2016-01-01'
+        self.data_end = '2019-12-31'
+        self.rebalancing_dates = [
+            '2018-01-31',  # Janeiro 2018
+            '2018-07-31',  # Julho 2018  
+            '2019-01-31',  # Janeiro 2019
+            '2019-07-31',  # Julho 2019
+            '2019-12-31'   # Final do período
+        ]
+        self.estimation_window_days = 730  # ~24 meses
+        # Walk-forward (opcional): janelas candidatas em meses, intensidades de shrinkage de Σ
+        # e meses de validação antes de cada rebalanceamento; None = janela fixa acima
+        self.walk_forward_windows = None
+        self.walk_forward_shrinkages = [0.0]
+        self.walk_forward_validation_months = 6
+        self.weight_bounds = (0.02, 0.20)  # Sem vendas a descoberto + diversificação forçada
+        self.strategies = ['Markowitz', 'Equal Weight', 'Risk Parity']
+        # Risk budgeting hierárquico (estratégia 'Risk Budgeting', opcional):
+        # orçamento por setor {setor: fração} e pesos relativos dentro do setor {ativo: valor};
+        # None = partes iguais
+        self.sector_budgets = None
+        self.asset_risk_budgets = None
+        # CVaR (estratégias 'Min CVaR' e 'Mean-CVaR', opcionais): nível α, origem dos
+        # cenários ('historical' = janela de estimação, 'monte_carlo' = N(μ, Σ)) e
+        # retorno-alvo anual da versão média-CVaR (None = retorno do Equal Weight)
+        self.cvar_alpha = 0.95
+        self.cvar_scenarios = 'historical'
+        self.cvar_n_scenarios = 10000
+        self.cvar_target_return = None
+        # Markowitz reamostrado/robusto (opcionais): reamostragens bootstrap da janela,
+        # processos para os blocos de sorteios e nível de confiança da caixa de incerteza de μ
+        self.resampling_draws = 500
+        self.resampling_workers = 1
+        self.robust_confidence = 0.95
+        # Índice de referência (EconomaticaLoader.load_benchmark) e TE ex-ante máximo
+        # anual da estratégia 'Markowitz TE' (opcional)
+        self.tracking_error_limit = 0.05
+        self.benchmark_prices = None
+        self.benchmark_returns = None  # Retornos do índice alinhados a full_returns
+        # Overlay de volatilidade-alvo (apply_volatility_target, opcional): alvo anual,
+        # previsão de Σ ('ewma' com λ ou 'rolling' com janela em meses), recálculo a cada
+        # N meses, alavancagem máxima e spread anual sobre o CDI na parte alavancada
+        self.vol_target = None
+        self.vol_target_method = 'ewma'
+        self.vol_target_decay = 0.94
+        self.vol_target_window = 24
+        self.vol_target_frequency = 1
+        self.max_leverage = 1.5
+        self.borrowing_spread = 0.0
+        # Bootstrap dos testes de significância: reamostras e JobRunner opcional
+        # (blocos de reamostras gravados e retomáveis, em vários processos)
+        self.bootstrap_draws = 1000
+        self.job_runner = None
+        self.strategy_builders = {
+            'Markowitz': self.markowitz_optimization,
+            'Equal Weight': lambda parameters: self.equal_weight_strategy(parameters['expected_returns'].index),
+            'Risk Parity': self.risk_parity_strategy,
+            'Risk Budgeting': self.risk_budgeting_strategy,
+            'Min CVaR': self.min_cvar_strategy,
+            'Mean-CVaR': self.mean_cvar_strategy,
+            'Resampled Markowitz': self.resampled_markowitz_strategy,
+            'Robust Markowitz': self.robust_markowitz_strategy,
+            'Markowitz TE': self.tracking_error_markowitz_strategy
+        }
         
         self.estimation_periods = []
         self.results_history = []
         self.portfolio_returns_history = []  # Para testes de significância
         self.turnover_history = []  # Para análise de custos
+        self.sector_risk_history = {}  # Contribuição de risco por setor: {'Estratégia | Período': {setor: RC}}
+        self.walk_forward_history = {}  # Janela/shrinkage escolhidos: {período: {...}}
+        self.active_risk_history = {}  # TE ex-ante e contribuições: {'Estratégia | Período': {...}}
+        self._loaded_data_key = None
+        
+        if settings:
+            self.configure(settings)
         
         print("=== METODOLOGIA CONFORME DEFINIDA NO TCC ===")
         print("ESTRUTURA TEMPORAL:")
@@ -47,7 +156,36 @@ class FinalMethodologyAnalyzer:
         print("  • Janela estimação: 24 meses rolling")
         print("  • Período teste: 2018-2019 (23 meses out-of-sample)")
         print("  • Rebalanceamento: Semestral (jan/jul)")
-        print(f"Taxa Livre de Risco - CDI 2018: {self.cdi_2018:.2%} | 2019: {self.cdi_2019:.2%} | Média: {self.risk_free_rate:.3%}")
+        cdi_by_year = " | ".join(f"{year}: {rate:.2%}" for year, rate in self.annual_cdi.items())
+        print(f"Taxa Livre de Risco - CDI {cdi_by_year} | Média: {self.risk_free_rate:.3%}")
+    
+    def configure(self, settings):
+        """
+        Aplica configurações {atributo: valor} (SETTINGS do analisador ou
+        LOADER_SETTINGS do loader); CDI anual sem risk_free_rate explícito
+        redefine a taxa livre de risco como a média dos anos
+        """
+        for key, value in settings.items():
+            if key in self.LOADER_SETTINGS:
+                setattr(self.loader, key, list(value) if key == 'selected_assets' else value)
+                continue
+            if key not in self.SETTINGS:
+                raise ValueError(f"Configuração desconhecida: {key}")
+            if key == 'weight_bounds':
+                value = tuple(float(bound) for bound in value)
+            elif key == 'annual_cdi':
+                value = {int(year): float(rate) for year, rate in value.items()}
+            elif key == 'strategies':
+                unknown = [strategy for strategy in value if strategy not in self.strategy_builders]
+                if unknown:
+                    raise ValueError(f"Estratégias desconhecidas: {unknown}")
+                value = list(value)
+            setattr(self, key, value)
+        
+        if 'annual_cdi' in settings and 'risk_free_rate' not in settings:
+            self.risk_free_rate = float(np.mean(list(self.annual_cdi.values())))
+        if {'annual_cdi', 'risk_free_rate', 'risk_free_path', 'risk_free_unit'} & set(settings):
+            self.risk_free = None  # Realinhada na próxima consulta
         
     def load_extended_data(self):
         """
@@ -55,12 +193,18 @@ class FinalMethodologyAnalyzer:
         - Dados brutos: 2014-2019 (necessário para janela rolling de 24 meses)
         - Efetivamente usado: 2016-2019 (24 meses estimação + 23 meses teste)
         """
+        data_key = (os.path.abspath(self.loader.data_path), tuple(self.loader.selected_assets),
+                    str(self.data_start), str(self.data_end), self.loader.benchmark_path,
+                    self.loader.benchmark_sheet, self.loader.adjust_prices)
+        if self._loaded_data_key == data_key:
+            return True  # Painel já carregado nesta instância (ex.: varredura de configurações)
+        
         print("\nCarregando dados conforme estrutura temporal definida...")
         print("Período: 2016-2019 (janela rolling 24m + teste out-of-sample 23m)")
         
         returns_data, prices_data = self.loader.load_selected_assets(
-            start_date='2016-01-01', 
-            end_date='2019-12-31'
+            start_date=self.data_start, 
+            end_date=self.data_end
         )
         
         if returns_data is None:
@@ -69,12 +213,56 @@ class FinalMethodologyAnalyzer:
             
         self.full_returns = returns_data
         self.full_prices = prices_data
+        self.set_benchmark(self.loader.load_benchmark(start_date=self.data_start, end_date=self.data_end))
+        if self.benchmark_prices is None:
+            print(f"AVISO: {self.loader.benchmark_name} indisponível - análise relativa desativada")
+        self._loaded_data_key = data_key
         
         print(f"Dados: {self.full_returns.index[0].date()} a {self.full_returns.index[-1].date()}")
         print(f"Observações: {len(self.full_returns)}")
         
         return True
     
+    def set_benchmark(self, benchmark_prices):
+        """
+        Nível mensal do índice de referência e seus retornos logarítmicos
+        alinhados a full_returns (NaN nos meses sem índice)
+        """
+        self.benchmark_prices = benchmark_prices
+        if benchmark_prices is None:
+            self.benchmark_returns = None
+            return
+        returns = np.log(benchmark_prices / benchmark_prices.shift(1))
+        self.benchmark_returns = returns.reindex(self.full_returns.index)
+    
+    def align_risk_free(self, dates):
+        """
+        Alinha a taxa livre de risco mensal às datas dos retornos (uma vez por
+        mês: consultas seguintes só leem self.monthly_rf)
+        """
+        if self.risk_free is None:
+            self.risk_free = (RiskFreeRate.from_file(self.risk_free_path, self.risk_free_unit)
+                              if self.risk_free_path else RiskFreeRate.constant(self.risk_free_rate))
+            self.monthly_rf = None
+        
+        months = pd.DatetimeIndex(dates).to_period('M').unique()
+        if self.monthly_rf is not None:
+            months = months.difference(self.monthly_rf.index)
+        if len(months) > 0:
+            aligned = pd.Series(self.risk_free.monthly_for(months.to_timestamp()), index=months)
+            self.monthly_rf = aligned if self.monthly_rf is None else \
+                pd.concat([self.monthly_rf, aligned]).sort_index()
+        return self.monthly_rf
+    
+    def risk_free_for(self, dates):
+        """
+        Taxas livres de risco mensais (array) para as datas dos retornos
+        """
+        months = pd.DatetimeIndex(dates).to_period('M')
+        if self.risk_free is None or self.monthly_rf is None or not months.isin(self.monthly_rf.index).all():
+            self.align_risk_free(dates)
+        return self.monthly_rf.reindex(months).values
+    
     def setup_rebalancing_periods(self):
         """
         Rebalanceamento semestral: janeiro e julho (conforme metodologia)
@@ -82,15 +270,8 @@ class FinalMethodologyAnalyzer:
         print("\nConfiguração de rebalanceamento semestral...")
         
         # Datas de rebalanceamento semestrais (jan e jul)
-        rebalancing_dates = [
-            '2018-01-31',  # Janeiro 2018
-            '2018-07-31',  # Julho 2018  
-            '2019-01-31',  # Janeiro 2019
-            '2019-07-31',  # Julho 2019
-            '2019-12-31'   # Final do período
-        ]
-        
-        rebalancing_dates = [pd.to_datetime(date) for date in rebalancing_dates]
+        rebalancing_dates = [pd.to_datetime(date) for date in self.rebalancing_dates]
+        self.estimation_periods = []
         
         for i in range(len(rebalancing_dates) - 1):
             test_start = rebalancing_dates[i]
@@ -98,7 +279,7 @@ class FinalMethodologyAnalyzer:
             
             # Estimação usando APENAS dados anteriores
             est_end = test_start - timedelta(days=1)
-            est_start = est_end - timedelta(days=730)  # ~24 meses
+            est_start = est_end - timedelta(days=self.estimation_window_days)  # ~24 meses
             
             self.estimation_periods.append({
                 'name': f'Semestre {i+1}',
@@ -107,16 +288,45 @@ class FinalMethodologyAnalyzer:
                 'testing_start': test_start,
                 'testing_end': test_end
             })
+        
+        if self.walk_forward_windows and getattr(self, 'full_returns', None) is not None:
+            self.select_estimation_windows()
             
         print("Períodos configurados:")
         for period in self.estimation_periods:
             print(f"  {period['name']}:")
-            print(f"    Estimação: {period['estimation_start'].date()} a {period['estimation_end'].date()}")
+            window = (f" ({period['window_months']}m, shrinkage {period['shrinkage']:.2f})"
+                      if 'window_months' in period else "")
+            print(f"    Estimação: {period['estimation_start'].date()} a {period['estimation_end'].date()}{window}")
             print(f"    Teste: {period['testing_start'].date()} a {period['testing_end'].date()}")
     
-    def estimate_parameters(self, estimation_data):
+    @profiled('walk_forward')
+    def select_estimation_windows(self):
+        """
+        Walk-forward: em cada rebalanceamento, janela (meses) e shrinkage com maior
+        verossimilhança no bloco de validação anterior (ver walk_forward.py)
+        """
+        selector = WalkForwardSelector(self.full_returns, self.walk_forward_windows,
+                                       self.walk_forward_shrinkages, self.walk_forward_validation_months)
+        index = self.full_returns.index
+        self.walk_forward_history = {}
+        
+        for period in self.estimation_periods:
+            position = int(index.searchsorted(period['testing_start']))
+            choice = selector.select(position)
+            if choice is None:
+                print(f"AVISO: {period['name']} sem histórico para o walk-forward - janela fixa")
+                continue
+            period['estimation_start'] = index[position - choice['window_months']]
+            period['window_months'] = choice['window_months']
+            period['shrinkage'] = choice['shrinkage']
+            self.walk_forward_history[period['name']] = choice
+    
+    @profiled('parameter_estimation')
+    def estimate_parameters(self, estimation_data, shrinkage=0.0):
         """
         Estimação de parâmetros usando apenas dados históricos
+        (shrinkage: intensidade δ de Σ em direção a (tr Σ / n)·I)
         """
         if len(estimation_data) < 12:
             print(f"AVISO: Poucos dados ({len(estimation_data)} obs)")
@@ -125,18 +335,30 @@ class FinalMethodologyAnalyzer:
         expected_returns = estimation_data.mean() * 12
         
         # Matriz de covariância (anualizada)
-        cov_matrix = estimation_data.cov() * 12
+        cov_matrix = shrink_covariance(estimation_data.cov() * 12, shrinkage)
         
         # Volatilidades individuais
         volatilities = estimation_data.std() * np.sqrt(12)
         
+        # Covariâncias com o índice de referência (None se o índice não cobrir a janela)
+        benchmark_cov, benchmark_variance = (benchmark_moments(estimation_data, self.benchmark_returns)
+                                             if self.benchmark_returns is not None else (None, None))
+        
         return {
             'expected_returns': expected_returns,
             'cov_matrix': cov_matrix,
             'volatilities': volatilities,
-            'n_observations': len(estimation_data)
+            'n_observations': len(estimation_data),
+            'returns': estimation_data,  # Cenários históricos (CVaR)
+            'benchmark_cov': benchmark_cov,
+            'benchmark_variance': benchmark_variance
         }
     
+    @memoize_strategy('markowitz', inputs=('expected_returns', 'cov_matrix'),
+                      settings=lambda self: {'risk_free_rate': self.risk_free_rate,
+                                             'weight_bounds': self.weight_bounds,
+                                             'method': 'SLSQP', 'maxiter': 1000})
+    @profiled('solver.markowitz')
     def markowitz_optimization(self, parameters):
         """
         Markowitz: Maximizar Sharpe Ratio (conforme metodologia)
@@ -161,7 +383,7 @@ class FinalMethodologyAnalyzer:
         ]
         
         # Sem vendas a descoberto + diversificação forçada (2-20%)
-        bounds = tuple([(0.02, 0.20) for _ in range(n_assets)])
+        bounds = tuple([self.weight_bounds for _ in range(n_assets)])
         
         # Ponto inicial: equal weight
         x0 = np.array([1/n_assets] * n_assets)
@@ -174,6 +396,7 @@ class FinalMethodologyAnalyzer:
                 constraints=constraints,
                 options={'disp': False, 'maxiter': 1000}
             )
+            annotate(iterations=int(result.nit), success=bool(result.success))
             
             if result.success:
                 weights = result.x / result.x.sum()
@@ -186,6 +409,57 @@ class FinalMethodologyAnalyzer:
             print(f"Erro na otimização: {e}")
             return self.equal_weight_strategy(parameters['expected_returns'].index)
     
+    @memoize_strategy('resampled_markowitz', inputs=('expected_returns', 'cov_matrix', 'returns'),
+                      settings=lambda self: {'risk_free_rate': self.risk_free_rate,
+                                             'weight_bounds': self.weight_bounds,
+                                             'draws': self.resampling_draws})
+    @profiled('solver.resampled_markowitz')
+    def resampled_markowitz_strategy(self, parameters):
+        """
+        Markowitz reamostrado (Michaud): média das carteiras de máximo Sharpe
+        de reamostragens bootstrap da janela de estimação
+        """
+        return resampled_max_sharpe(parameters['returns'].dropna(), self.risk_free_rate, self.weight_bounds,
+                                    n_draws=self.resampling_draws, workers=self.resampling_workers)
+    
+    @memoize_strategy('robust_markowitz', inputs=('expected_returns', 'cov_matrix', 'returns'),
+                      settings=lambda self: {'risk_free_rate': self.risk_free_rate,
+                                             'weight_bounds': self.weight_bounds,
+                                             'draws': self.resampling_draws,
+                                             'confidence': self.robust_confidence})
+    @profiled('solver.robust_markowitz')
+    def robust_markowitz_strategy(self, parameters):
+        """
+        Markowitz robusto: máximo Sharpe no pior caso de μ dentro da caixa de incerteza
+        """
+        return robust_max_sharpe(parameters['returns'].dropna(), self.risk_free_rate, self.weight_bounds,
+                                 confidence=self.robust_confidence, n_draws=self.resampling_draws)
+    
+    def tracking_error_markowitz_strategy(self, parameters):
+        """
+        Markowitz com tracking error ex-ante <= tracking_error_limit contra o índice
+        (sem índice na janela: Markowitz sem a restrição)
+        """
+        if parameters['benchmark_cov'] is None:
+            print(f"AVISO: {self.loader.benchmark_name} indisponível na janela - Markowitz TE sem restrição")
+            return self.markowitz_optimization(parameters)
+        return self._tracking_error_markowitz(parameters)
+    
+    @memoize_strategy('tracking_error_markowitz',
+                      inputs=('expected_returns', 'cov_matrix', 'benchmark_cov', 'benchmark_variance'),
+                      settings=lambda self: {'risk_free_rate': self.risk_free_rate,
+                                             'weight_bounds': self.weight_bounds,
+                                             'tracking_error_limit': self.tracking_error_limit})
+    def _tracking_error_markowitz(self, parameters):
+        weights, info = tracking_error_max_sharpe(
+            parameters['expected_returns'].values, parameters['cov_matrix'].values,
+            parameters['benchmark_cov'].values, parameters['benchmark_variance'],
+            self.risk_free_rate, self.weight_bounds, self.tracking_error_limit)
+        if not info['feasible']:
+            print(f"AVISO: TE máximo {self.tracking_error_limit:.1%} inviável "
+                  f"(mínimo {info['min_tracking_error']:.1%}) - usando a carteira de menor TE")
+        return pd.Series(weights, index=parameters['expected_returns'].index)
+    
     def equal_weight_strategy(self, asset_names):
         """
         Equal Weight: Alocação igualitária (conforme metodologia)
@@ -211,6 +485,10 @@ class FinalMethodologyAnalyzer:
         
         return risk_contrib, portfolio_vol
     
+    @memoize_strategy('risk_parity_erc', inputs=('cov_matrix',),
+                      settings=lambda self: {'weight_bounds': self.weight_bounds,
+                                             'max_iter': 50, 'tolerance': 1e-6, 'tau': 0.5})
+    @profiled('solver.erc')
     def risk_parity_erc_strategy(self, parameters):
         """
         Equal Risk Contribution (ERC): Verdadeiro Risk Parity
@@ -262,8 +540,10 @@ class FinalMethodologyAnalyzer:
                 weights = np.clip(weights, min_weight, max_weight)
                 weights = weights / np.sum(weights)  # Renormalizar após clipping
         
+        annotate(iterations=iteration + 1)
+        
         # Aplicar bounds finais para conformidade com metodologia
-        weights = np.clip(weights, 0.02, 0.20)  # Bounds finais da metodologia
+        weights = np.clip(weights, *self.weight_bounds)  # Bounds finais da metodologia
         weights = weights / np.sum(weights)
         
         if iteration >= max_iter - 1:
@@ -276,6 +556,110 @@ class FinalMethodologyAnalyzer:
         
         return pd.Series(weights, index=parameters['cov_matrix'].index)
     
+    @memoize_strategy('risk_budgeting', inputs=('cov_matrix',),
+                      settings=lambda self: {'sector_budgets': self.sector_budgets,
+                                             'asset_risk_budgets': self.asset_risk_budgets,
+                                             'sectors': {a: self.loader.asset_info.get(a, {}).get('sector')
+                                                         for a in self.loader.selected_assets}})
+    @profiled('solver.risk_budgeting')
+    def risk_budgeting_strategy(self, parameters):
+        """
+        Risk Budgeting hierárquico: risco dividido entre setores (asset_info)
+        e, dentro de cada setor, entre os ativos
+        """
+        budgeting = RiskBudgeting(parameters['cov_matrix'], self.loader.asset_info)
+        weights = budgeting.solve_hierarchical(self.sector_budgets, self.asset_risk_budgets)
+        annotate(iterations=budgeting.last_info['iterations'])
+        if not budgeting.last_info['converged']:
+            print(f"AVISO: Risk budgeting não convergiu em {budgeting.last_info['iterations']} iterações")
+        return weights
+    
+    def cvar_scenario_matrix(self, parameters):
+        """
+        Cenários mensais de log-retorno para o LP de CVaR
+        """
+        if self.cvar_scenarios == 'historical':
+            return parameters['returns'].dropna()
+        if self.cvar_scenarios == 'monte_carlo':
+            return monte_carlo_scenarios(parameters, n_scenarios=self.cvar_n_scenarios)
+        raise ValueError(f"Origem de cenários CVaR desconhecida: {self.cvar_scenarios}")
+    
+    def _cvar_optimization(self, parameters, mean_cvar=False):
+        scenarios = self.cvar_scenario_matrix(parameters)
+        target_return = None
+        if mean_cvar:
+            # Alvo na unidade dos cenários do LP (retorno simples mensal médio)
+            if self.cvar_target_return is None:
+                target_return = np.expm1(scenarios.values).mean()  # Carteira Equal Weight
+            else:
+                target_return = np.expm1(self.cvar_target_return / 12)
+        weights, info = solve_cvar(scenarios, alpha=self.cvar_alpha, weight_bounds=self.weight_bounds,
+                                   target_return=target_return)
+        annotate(scenarios=len(scenarios), iterations=info['iterations'])
+        if weights is None:
+            print(f"AVISO: LP de CVaR sem solução ({info['message']}) - usando Equal Weight")
+            return self.equal_weight_strategy(parameters['expected_returns'].index)
+        return weights
+    
+    @memoize_strategy('min_cvar', inputs=('expected_returns', 'cov_matrix', 'returns'),
+                      settings=lambda self: {'alpha': self.cvar_alpha, 'scenarios': self.cvar_scenarios,
+                                             'n_scenarios': self.cvar_n_scenarios,
+                                             'weight_bounds': self.weight_bounds})
+    @profiled('solver.cvar')
+    def min_cvar_strategy(self, parameters):
+        """
+        Mínimo CVaR: minimiza a perda média nos (1-α) piores cenários
+        """
+        return self._cvar_optimization(parameters)
+    
+    @memoize_strategy('mean_cvar', inputs=('expected_returns', 'cov_matrix', 'returns'),
+                      settings=lambda self: {'alpha': self.cvar_alpha, 'scenarios': self.cvar_scenarios,
+                                             'n_scenarios': self.cvar_n_scenarios,
+                                             'target_return': self.cvar_target_return,
+                                             'weight_bounds': self.weight_bounds})
+    @profiled('solver.cvar')
+    def mean_cvar_strategy(self, parameters):
+        """
+        Média-CVaR: mínimo CVaR sujeito a retorno esperado anual ≥ alvo
+        (alvo padrão: retorno esperado da carteira Equal Weight nos cenários)
+        """
+        return self._cvar_optimization(parameters, mean_cvar=True)
+    
+    def sector_risk_report(self, weights, parameters):
+        """
+        Contribuições de risco por ativo e por setor de todas as estratégias (uma passagem)
+        """
+        budgeting = RiskBudgeting(parameters['cov_matrix'], self.loader.asset_info)
+        return budgeting.report(pd.DataFrame(weights).T)
+    
+    def active_risk_report(self, weights, parameters):
+        """
+        Tracking error ex-ante e contribuições ao risco ativo por ativo e por
+        setor de todas as estratégias (uma passagem); None sem índice na janela
+        """
+        if parameters['benchmark_cov'] is None:
+            return None
+        return active_risk_decomposition(pd.DataFrame(weights).T, parameters['cov_matrix'],
+                                         parameters['benchmark_cov'], parameters['benchmark_variance'],
+                                         self.loader.asset_info)
+    
+    def record_active_risk(self, weights, parameters, period_name):
+        """
+        Guarda em active_risk_history o TE ex-ante e as contribuições do período
+        (métricas 'tracking_error', 'residual', 'asset:<ativo>' e 'sector:<setor>')
+        """
+        report = self.active_risk_report(weights, parameters)
+        if report is None:
+            return
+        for strategy_name in report['tracking_error'].index:
+            self.active_risk_history[f"{strategy_name} | {period_name}"] = {
+                'tracking_error': float(report['tracking_error'][strategy_name]),
+                'residual': float(report['residual'][strategy_name]),
+                **{f"asset:{asset}": value for asset, value in report['assets'].loc[strategy_name].items()},
+                **{f"sector:{sector}": value for sector, value in report['sectors'].loc[strategy_name].items()}
+            }
+    
+    @memoize_strategy('risk_parity_ivp', inputs=('volatilities',))
     def risk_parity_ivp_strategy(self, parameters):
         """
         Inverse Volatility Portfolio (IVP): wi = (1/σi) / Σ(1/σj)
@@ -293,43 +677,40 @@ class FinalMethodologyAnalyzer:
         """
         return self.risk_parity_erc_strategy(parameters)
     
-    def sharpe_ratio_difference_test(self, returns1, returns2, risk_free_rate):
+    @profiled('ledoit_wolf_test')
+    def sharpe_ratio_difference_test(self, returns1, returns2, risk_free_rate=0.0):
         """
         Teste de significância para diferença entre Sharpe Ratios
         Implementa o teste Ledoit-Wolf (2008) para diferenças de Sharpe
-        """
-        # Converter para numpy arrays
-        r1 = np.array(returns1)
-        r2 = np.array(returns2)
-        rf = risk_free_rate / 12  # Mensal
         
+        risk_free_rate: taxa anual (escalar) ou vetor de taxas mensais alinhado
+        aos retornos; 0 = retornos já em excesso
+        """
         # Retornos excedentes
-        excess_r1 = r1 - rf
-        excess_r2 = r2 - rf
+        excess_r1 = excess_returns(returns1, risk_free_rate)
+        excess_r2 = excess_returns(returns2, risk_free_rate)
+        
+        # Matriz de covariância dos retornos excedentes
+        excess_matrix = np.column_stack([excess_r1, excess_r2])
+        cov_matrix = np.cov(excess_matrix.T, ddof=1)
         
+        return self.sharpe_difference_from_moments(
+            len(excess_r1), np.mean(excess_r1), np.mean(excess_r2),
+            cov_matrix[0, 0], cov_matrix[1, 1], cov_matrix[0, 1]
+        )
+    
+    def sharpe_difference_from_moments(self, n, mu1, mu2, var1, var2, cov12):
+        """
+        Estatística Ledoit-Wolf a partir dos momentos dos retornos excedentes
+        (médias, variâncias e covariância amostrais) - permite atualização incremental
+        """
         # Sharpe ratios
-        sharpe1 = np.mean(excess_r1) / np.std(excess_r1, ddof=1) * np.sqrt(12)
-        sharpe2 = np.mean(excess_r2) / np.std(excess_r2, ddof=1) * np.sqrt(12)
+        sharpe1 = mu1 / np.sqrt(var1) * np.sqrt(12)
+        sharpe2 = mu2 / np.sqrt(var2) * np.sqrt(12)
         
         # Diferença de Sharpe
         diff_sharpe = sharpe1 - sharpe2
         
-        # Teste de Ledoit-Wolf para diferença de Sharpe
-        n = len(r1)
-        
-        # Matriz de covariância dos retornos excedentes
-        excess_returns = np.column_stack([excess_r1, excess_r2])
-        cov_matrix = np.cov(excess_returns.T, ddof=1)
-        
-        # Médias dos retornos excedentes
-        mu1 = np.mean(excess_r1)
-        mu2 = np.mean(excess_r2)
-        
-        # Variâncias
-        var1 = cov_matrix[0, 0]
-        var2 = cov_matrix[1, 1]
-        cov12 = cov_matrix[0, 1]
-        
         # Estatística do teste Ledoit-Wolf
         # Variância da diferença dos Sharpe ratios
         var_diff = (1/n) * (
@@ -354,36 +735,25 @@ class FinalMethodologyAnalyzer:
             'significant_10pct': p_value < 0.10
         }
     
-    def bootstrap_sharpe_difference(self, returns1, returns2, risk_free_rate, n_bootstrap=1000):
+    @profiled('bootstrap_test')
+    def bootstrap_sharpe_difference(self, returns1, returns2, risk_free_rate=0.0, n_bootstrap=None):
         """
         Bootstrap test para diferença de Sharpe ratios
+        (risk_free_rate como em sharpe_ratio_difference_test; n_bootstrap
+        padrão = bootstrap_draws; ver _bootstrap_blocks)
         """
-        r1 = np.array(returns1)
-        r2 = np.array(returns2)
-        rf = risk_free_rate / 12
+        n_bootstrap = n_bootstrap or self.bootstrap_draws
+        r1 = excess_returns(returns1, risk_free_rate)
+        r2 = excess_returns(returns2, risk_free_rate)
         
         # Sharpe original
-        orig_sharpe1 = (np.mean(r1) - rf) / np.std(r1, ddof=1) * np.sqrt(12)
-        orig_sharpe2 = (np.mean(r2) - rf) / np.std(r2, ddof=1) * np.sqrt(12)
+        orig_sharpe1 = np.mean(r1) / np.std(r1, ddof=1) * np.sqrt(12)
+        orig_sharpe2 = np.mean(r2) / np.std(r2, ddof=1) * np.sqrt(12)
         orig_diff = orig_sharpe1 - orig_sharpe2
         
-        # Bootstrap
-        n = len(r1)
-        bootstrap_diffs = []
-        
-        np.random.seed(42)  # Para reprodutibilidade
-        for _ in range(n_bootstrap):
-            # Sample with replacement
-            indices = np.random.choice(n, n, replace=True)
-            boot_r1 = r1[indices]
-            boot_r2 = r2[indices]
-            
-            # Bootstrap Sharpes
-            boot_sharpe1 = (np.mean(boot_r1) - rf) / np.std(boot_r1, ddof=1) * np.sqrt(12)
-            boot_sharpe2 = (np.mean(boot_r2) - rf) / np.std(boot_r2, ddof=1) * np.sqrt(12)
-            bootstrap_diffs.append(boot_sharpe1 - boot_sharpe2)
-        
-        bootstrap_diffs = np.array(bootstrap_diffs)
+        # Bootstrap em blocos com sementes fixas (mesmas reamostras com ou sem job_runner)
+        bootstrap_diffs = self._bootstrap_blocks(np.asarray(r1, dtype=float), np.asarray(r2, dtype=float),
+                                                 n_bootstrap)
         
         # P-value: proporção de diferenças bootstrap com sinal oposto ao original
         if orig_diff >= 0:
@@ -435,6 +805,7 @@ class FinalMethodologyAnalyzer:
             
         return adjusted_returns
 
+    @profiled('metrics')
     def calculate_portfolio_metrics(self, weights, test_returns, period_name):
         """
         Cálculo de métricas conforme definido na metodologia
@@ -449,20 +820,23 @@ class FinalMethodologyAnalyzer:
         annual_return = period_return * annualization_factor
         annual_vol = portfolio_returns.std() * np.sqrt(12)
         
+        # CDI de cada mês do teste (vetor alinhado uma vez por align_risk_free)
+        monthly_cdi = self.risk_free_for(test_returns.index)
+        annual_cdi = monthly_cdi.mean() * 12
+        
         # SHARPE RATIO: (Rp - Rf) / σp (conforme fórmula na metodologia)
-        sharpe_ratio = (annual_return - self.risk_free_rate) / annual_vol if annual_vol > 0 else 0
+        sharpe_ratio = (annual_return - annual_cdi) / annual_vol if annual_vol > 0 else 0
         
         # SORTINO RATIO: (Rp - T) / σ- (conforme fórmula na metodologia)
         # T = taxa mínima aceitável = CDI (taxa livre de risco)
-        monthly_cdi = self.risk_free_rate / 12
         
         # Retornos abaixo do CDI mensal (downside)
-        downside_returns = portfolio_returns[portfolio_returns < monthly_cdi]
+        downside_returns = portfolio_returns[portfolio_returns.values < monthly_cdi]
         
         if len(downside_returns) > 0:
             # σ- = desvio-padrão dos retornos abaixo de T
             downside_deviation = downside_returns.std() * np.sqrt(12)  # Anualizada
-            sortino_ratio = (annual_return - self.risk_free_rate) / downside_deviation
+            sortino_ratio = (annual_return - annual_cdi) / downside_deviation
         else:
             sortino_ratio = 999  # Sem retornos abaixo do CDI
             
@@ -482,19 +856,76 @@ class FinalMethodologyAnalyzer:
             'n_months': period_months
         }
     
+    def get_run_config(self):
+        """
+        Configuração completa da execução (define o hash usado no ResultsStore)
+        """
+        return {
+            'data': _file_fingerprint(self.loader.data_path),
+            'adjust_prices': self.loader.adjust_prices,
+            'selected_assets': list(self.loader.selected_assets),
+            'data_start': self.data_start,
+            'data_end': self.data_end,
+            'rebalancing_dates': list(self.rebalancing_dates),
+            'estimation_window_days': self.estimation_window_days,
+            'risk_free_rate': self.risk_free_rate,
+            'risk_free_series': ({**_file_fingerprint(self.risk_free_path), 'unit': self.risk_free_unit}
+                                 if self.risk_free_path else None),
+            'weight_bounds': list(self.weight_bounds),
+            'strategies': list(self.strategies),
+            'sector_budgets': self.sector_budgets,
+            'asset_risk_budgets': self.asset_risk_budgets,
+            'cvar': {'alpha': self.cvar_alpha, 'scenarios': self.cvar_scenarios,
+                     'n_scenarios': self.cvar_n_scenarios, 'target_return': self.cvar_target_return},
+            'resampling': {'draws': self.resampling_draws, 'robust_confidence': self.robust_confidence},
+            'walk_forward': ({'windows': sorted(int(w) for w in self.walk_forward_windows),
+                              'shrinkages': sorted(float(d) for d in self.walk_forward_shrinkages),
+                              'validation_months': self.walk_forward_validation_months}
+                             if self.walk_forward_windows else None),
+            'benchmark': ({**_file_fingerprint(self.loader.benchmark_path), 'name': self.loader.benchmark_name}
+                          if self.loader.benchmark_path else
+                          {'sheet': self.loader.benchmark_sheet, 'name': self.loader.benchmark_name}),
+            'tracking_error_limit': self.tracking_error_limit
+        }
+    
     def run_methodology_analysis(self):
         """
         Executa análise conforme metodologia definida no TCC
+        Com ResultsStore configurado, uma configuração já executada é lida do banco
         """
+        run_config = self.get_run_config()
+        self.run_hash = config_hash(run_config)
+        
+        if self.results_store is not None and self.results_store.has_run(self.run_hash):
+            print(f"\nConfiguração já executada (cache hit: {self.run_hash[:12]})")
+            if self.walk_forward_windows:
+                # Retornos gravados: o walk-forward refaz as mesmas janelas/shrinkages da execução
+                returns = self.results_store.load_panel(self.run_hash, 'returns')
+                if returns is not None:
+                    returns.index = pd.DatetimeIndex(returns.index).to_period('M').to_timestamp(how='end')
+                    self.full_returns = returns
+            self.setup_rebalancing_periods()
+            all_results, self.portfolio_returns_history, self.turnover_history = \
+                self.results_store.load_run(self.run_hash)
+            self.sector_risk_history = self.results_store.load_summary(self.run_hash, 'sector_risk')
+            self.active_risk_history = self.results_store.load_summary(self.run_hash, 'active_risk')
+            return all_results
+        
         if not self.load_extended_data():
             return None
+        self.align_risk_free(self.full_returns.index)
+        print(f"Taxa livre de risco: {self.risk_free.describe()}")
             
         self.setup_rebalancing_periods()
+        self.portfolio_returns_history = []
+        self.turnover_history = []
+        self.sector_risk_history = {}
+        self.active_risk_history = {}
         
         print("\n=== EXECUÇÃO DA METODOLOGIA ===")
         
-        # Três estratégias definidas na metodologia
-        strategies = ['Markowitz', 'Equal Weight', 'Risk Parity']
+        # Estratégias definidas na metodologia (self.strategies)
+        strategies = self.strategies
         all_results = {strategy: [] for strategy in strategies}
         previous_weights = {strategy: None for strategy in strategies}
         
@@ -520,19 +951,22 @@ class FinalMethodologyAnalyzer:
             print(f"Estimação: {len(est_data)} obs, Teste: {len(test_data)} obs")
             
             # Estimar parâmetros com dados históricos
-            parameters = self.estimate_parameters(est_data)
+            parameters = self.estimate_parameters(est_data, period_info.get('shrinkage', 0.0))
             
             # Construir carteiras
-            weights = {}
-            weights['Markowitz'] = self.markowitz_optimization(parameters)
-            weights['Equal Weight'] = self.equal_weight_strategy(est_data.columns)
-            weights['Risk Parity'] = self.risk_parity_strategy(parameters)
+            weights = {strategy: self.strategy_builders[strategy](parameters) for strategy in strategies}
             
             print("Alocações calculadas:")
             for strategy_name, w in weights.items():
                 significant_weights = w[w > 0.015]  # > 1,5%
                 print(f"  {strategy_name}: {dict(significant_weights.round(3))}")
             
+            # Contribuição de risco por setor (Σ de estimação)
+            sector_rc = self.sector_risk_report(weights, parameters)['sectors']
+            for strategy_name, contributions in sector_rc.iterrows():
+                self.sector_risk_history[f"{strategy_name} | {period_info['name']}"] = contributions.to_dict()
+            self.record_active_risk(weights, parameters, period_info['name'])
+            
             # Calcular turnover para cada estratégia
             period_turnovers = {}
             for strategy in strategies:
@@ -560,7 +994,8 @@ class FinalMethodologyAnalyzer:
             # Armazenar retornos e turnover por período
             self.portfolio_returns_history.append({
                 'period': period_info['name'], 
-                'returns': period_returns
+                'returns': period_returns,
+                'dates': test_data.index
             })
             
             self.turnover_history.append({
@@ -568,8 +1003,28 @@ class FinalMethodologyAnalyzer:
                 'turnovers': period_turnovers
             })
         
+        if self.results_store is not None:
+            self.results_store.save_run(
+                self.run_hash, run_config, all_results,
+                self.portfolio_returns_history, self.turnover_history
+            )
+            self.results_store.save_panel(self.run_hash, 'prices', self.full_prices)
+            self.results_store.save_panel(self.run_hash, 'returns', self.full_returns)
+            self.results_store.save_panel(self.run_hash, 'risk_free', self.risk_free_panel(self.full_returns.index))
+            self.results_store.save_summary(self.run_hash, 'sector_risk', self.sector_risk_history)
+            if self.walk_forward_history:
+                self.results_store.save_summary(self.run_hash, 'walk_forward', self.walk_forward_history)
+            if self.benchmark_prices is not None:
+                self.results_store.save_panel(self.run_hash, 'benchmark', self.benchmark_prices.to_frame())
+                self.results_store.save_summary(self.run_hash, 'active_risk', self.active_risk_history)
+            if self.loader.quality_report is not None:
+                quality = self.loader.quality_report.drop(columns=['first_date', 'last_date'])
+                self.results_store.save_summary(self.run_hash, 'data_quality', quality.to_dict(orient='index'))
+            print(f"\nResultados armazenados (run {self.run_hash[:12]})")
+        
         return all_results
     
+    @profiled('consolidation')
     def consolidate_final_results(self, all_results):
         """
         Consolidação final dos resultados
@@ -626,8 +1081,32 @@ class FinalMethodologyAnalyzer:
         print(f"Período: 2018-2019 | Rebalanceamento: Semestral (jan/jul)")
         print(f"Metodologia: Conforme definida no TCC")
         
+        self.store_summary('consolidated', consolidated)
+        
         return consolidated
     
+    def _bootstrap_blocks(self, r1, r2, n_bootstrap):
+        """
+        Diferenças bootstrap em blocos de BOOTSTRAP_TASK_DRAWS reamostras com
+        sementes SeedSequence(42) por bloco: o resultado não depende de
+        processos nem de interrupções. Com job_runner, cada bloco é uma tarefa
+        retomável; sem ele, os blocos rodam em sequência no processo atual
+        """
+        n_tasks = -(-n_bootstrap // BOOTSTRAP_TASK_DRAWS)
+        blocks = [(r1, r2, seed, min(BOOTSTRAP_TASK_DRAWS, n_bootstrap - i * BOOTSTRAP_TASK_DRAWS))
+                  for i, seed in enumerate(np.random.SeedSequence(42).spawn(n_tasks))]
+        if self.job_runner is None:
+            return np.concatenate([bootstrap_sharpe_block(*args) for args in blocks])
+        
+        series_key = hashlib.sha256(np.ascontiguousarray(np.column_stack([r1, r2])).tobytes()).hexdigest()[:16]
+        tasks = {f"bootstrap:{series_key}:{n_bootstrap}:{i}": (bootstrap_sharpe_block, args)
+                 for i, args in enumerate(blocks)}
+        results = self.job_runner.run(tasks)
+        if len(results) < len(tasks):
+            raise RuntimeError(f"Bootstrap incompleto ({len(results)}/{len(tasks)} blocos); execute novamente")
+        return np.concatenate(list(results.values()))
+    
+    @profiled('significance_tests')
     def run_significance_tests(self, consolidated_results):
         """
         Executa testes de significância estatística para as diferenças de Sharpe
@@ -636,47 +1115,39 @@ class FinalMethodologyAnalyzer:
         print("Testando se as diferenças de Sharpe Ratio são estatisticamente significativas")
         
         # Consolidar todos os retornos por estratégia
-        all_returns = {'Markowitz': [], 'Equal Weight': [], 'Risk Parity': []}
+        all_returns = {strategy: [] for strategy in self.strategies}
         
         for period_data in self.portfolio_returns_history:
             for strategy, returns in period_data['returns'].items():
                 all_returns[strategy].extend(returns)
         
-        # Converter para numpy arrays
-        markowitz_returns = np.array(all_returns['Markowitz'])
-        equal_weight_returns = np.array(all_returns['Equal Weight'])  
-        risk_parity_returns = np.array(all_returns['Risk Parity'])
-        
-        strategies = ['Markowitz', 'Equal Weight', 'Risk Parity']
-        strategy_returns = {
-            'Markowitz': markowitz_returns,
-            'Equal Weight': equal_weight_returns,
-            'Risk Parity': risk_parity_returns
-        }
+        # Retornos em excesso do CDI mês a mês (calculados uma vez para todos os pares)
+        monthly_cdi = self.risk_free_for(np.concatenate(
+            [period_data['dates'] for period_data in self.portfolio_returns_history]))
+        strategy_returns = {strategy: np.array(returns) - monthly_cdi for strategy, returns in all_returns.items()}
         
         # Tabela de resultados dos testes
         print(f"\n{'Comparação':<25} {'Dif. Sharpe':<12} {'p-value (LW)':<12} {'p-value (Boot)':<15} {'Significante'}")
         print("-" * 80)
         
-        comparisons = [
-            ('Markowitz', 'Equal Weight'),
-            ('Markowitz', 'Risk Parity'),
-            ('Equal Weight', 'Risk Parity')
-        ]
+        # Todos os pares de estratégias, na ordem de self.strategies
+        comparisons = list(combinations(self.strategies, 2))
+        
+        lw_tests = {}
+        bootstrap_tests = {}
+        significance_summary = {}
         
         for strategy1, strategy2 in comparisons:
             # Teste Ledoit-Wolf
             lw_test = self.sharpe_ratio_difference_test(
                 strategy_returns[strategy1], 
-                strategy_returns[strategy2], 
-                self.risk_free_rate
+                strategy_returns[strategy2]
             )
             
             # Teste Bootstrap
             bootstrap_test = self.bootstrap_sharpe_difference(
                 strategy_returns[strategy1],
-                strategy_returns[strategy2], 
-                self.risk_free_rate
+                strategy_returns[strategy2]
             )
             
             # Determinar significância
@@ -693,20 +1164,37 @@ class FinalMethodologyAnalyzer:
                   f"{lw_test['p_value']:.4f}       "
                   f"{bootstrap_test['p_value']:.4f}          "
                   f"{significance}")
+            
+            test_key = f"{strategy1}_vs_{strategy2}".lower().replace(' ', '_')
+            lw_tests[test_key] = lw_test
+            bootstrap_tests[test_key] = bootstrap_test
+            significance_summary[f"{strategy1} vs {strategy2}"] = {
+                'sharpe_difference': lw_test['difference'],
+                't_statistic': lw_test['t_statistic'],
+                'p_value_lw': lw_test['p_value'],
+                'p_value_bootstrap': bootstrap_test['p_value'],
+                'ci95_low': bootstrap_test['confidence_interval_95'][0],
+                'ci95_high': bootstrap_test['confidence_interval_95'][1],
+                'bootstrap_draws': self.bootstrap_draws
+            }
         
         print(f"\nNotas:")
         print("- LW = Teste Ledoit-Wolf (2008) para diferenças de Sharpe Ratio")
-        print("- Boot = Teste Bootstrap com 1000 simulações")
+        print(f"- Boot = Teste Bootstrap com {self.bootstrap_draws} simulações")
         print("- Significância testada nos níveis 5% e 10%")
-        print("- n = {n} observações mensais (2018-2019 out-of-sample)".format(n=len(markowitz_returns)))
+        print("- n = {n} observações mensais (2018-2019 out-of-sample)".format(
+            n=len(strategy_returns[self.strategies[0]])))
+        
+        self.store_summary('significance', significance_summary)
+        if self.job_runner is not None:
+            self.job_runner.restart()  # Blocos já consumidos: libera results/jobs.sqlite
         
         return {
-            'markowitz_vs_equal_weight': lw_test,
-            'bootstrap_tests': {
-                'markowitz_vs_equal_weight': bootstrap_test
-            }
+            **lw_tests,
+            'bootstrap_tests': bootstrap_tests
         }
     
+    @profiled('transaction_costs')
     def simulate_transaction_costs(self):
         """
         Simula impacto de custos de transação em diferentes cenários
@@ -714,7 +1202,7 @@ class FinalMethodologyAnalyzer:
         print("\n=== SIMULAÇÃO DE CUSTOS DE TRANSAÇÃO ===")
         
         cost_scenarios = [0, 5, 10, 20]  # 0, 5, 10, 20 bps
-        strategies = ['Markowitz', 'Equal Weight', 'Risk Parity']
+        strategies = self.strategies
         
         # Calcular turnover médio por estratégia
         avg_turnovers = {}
@@ -735,6 +1223,8 @@ class FinalMethodologyAnalyzer:
         print("-" * 75)
         
         results_by_cost = {}
+        monthly_cdi = self.risk_free_for(np.concatenate(
+            [period_data['dates'] for period_data in self.portfolio_returns_history]))
         
         for strategy in strategies:
             strategy_results = []
@@ -761,12 +1251,9 @@ class FinalMethodologyAnalyzer:
                 
                 # Calcular Sharpe com custos
                 if len(adjusted_returns_all) > 0:
-                    adjusted_returns_array = np.array(adjusted_returns_all)
-                    rf_monthly = self.risk_free_rate / 12
-                    
-                    excess_returns = adjusted_returns_array - rf_monthly
-                    if np.std(excess_returns) > 0:
-                        sharpe_with_costs = np.mean(excess_returns) / np.std(excess_returns) * np.sqrt(12)
+                    excess = np.array(adjusted_returns_all) - monthly_cdi
+                    if np.std(excess) > 0:
+                        sharpe_with_costs = np.mean(excess) / np.std(excess) * np.sqrt(12)
                     else:
                         sharpe_with_costs = 0
                 else:
@@ -793,17 +1280,179 @@ class FinalMethodologyAnalyzer:
         print("- Turnover = percentual da carteira negociado a cada rebalanceamento")
         print("- Impacto = Sharpe original - Sharpe com custos")
         
+        self.store_summary('transaction_costs', {
+            strategy: {
+                'avg_turnover': avg_turnovers[strategy],
+                **{f'sharpe_{cost_bps}bps': sharpe
+                   for cost_bps, sharpe in zip(cost_scenarios, results_by_cost[strategy])}
+            }
+            for strategy in strategies
+        })
+        
         return results_by_cost
+    
+    def apply_volatility_target(self, all_results):
+        """
+        Overlay de volatilidade-alvo sobre os retornos fora da amostra de todas
+        as estratégias (ver vol_targeting.py); None se vol_target não definido
+        """
+        if self.vol_target is None or not self.portfolio_returns_history:
+            return None
+        
+        asset_returns = getattr(self, 'full_returns', None)
+        if asset_returns is None and self.results_store is not None:
+            asset_returns = self.results_store.load_panel(self.run_hash, 'returns')
+        asset_months = pd.DatetimeIndex(asset_returns.index).to_period('M')
+        
+        dates = pd.DatetimeIndex(np.concatenate([period_data['dates'] for period_data in self.portfolio_returns_history]))
+        periods = np.concatenate([[period_data['period']] * len(period_data['dates'])
+                                  for period_data in self.portfolio_returns_history])
+        # Pesos vigentes em cada mês do teste: T x K x n
+        stored_weights = {(strategy, results['period']): results['weights']
+                          for strategy in self.strategies for results in all_results[strategy]}
+        period_weights = {
+            period: np.array([pd.Series(stored_weights[(strategy, period)]).reindex(asset_returns.columns)
+                              .fillna(0.0).values for strategy in self.strategies])
+            for period in dict.fromkeys(periods)
+        }
+        weights = np.stack([period_weights[period] for period in periods])
+        
+        overlay = VolatilityTargeting(self.vol_target, self.vol_target_method, self.vol_target_decay,
+                                      self.vol_target_window, self.vol_target_frequency, self.max_leverage,
+                                      self.borrowing_spread)
+        result = overlay.apply(asset_returns.values, weights, asset_months.get_indexer(dates.to_period('M')),
+                               self.risk_free_for(dates), periods=periods, strategies=self.strategies)
+        print_vol_target_report(result['report'], self.vol_target_method)
+        # Parâmetros do overlay junto do resumo (pós-processamento, fora do hash da execução)
+        settings = {'vol_target': self.vol_target, 'vol_target_method': self.vol_target_method,
+                    'vol_target_decay': self.vol_target_decay, 'vol_target_window': self.vol_target_window,
+                    'vol_target_frequency': self.vol_target_frequency, 'max_leverage': self.max_leverage,
+                    'borrowing_spread': self.borrowing_spread}
+        self.store_summary('vol_target', {strategy: {**row, **settings}
+                                          for strategy, row in result['report'].to_dict('index').items()})
+        return result
+    
+    def run_stress_tests(self, all_results, scenarios=None, names=None):
+        """
+        Reproduz a biblioteca de cenários (stress_testing.py, acrescida de
+        `scenarios`) sobre os pesos do último rebalanceamento de cada estratégia
+        """
+        library = scenario_library(scenarios)
+        if names:
+            unknown = [name for name in names if name not in library]
+            if unknown:
+                raise ValueError(f"Cenários desconhecidos: {unknown}")
+            library = {name: library[name] for name in names}
+        
+        # Histórico desde a primeira janela (um mês antes, para o primeiro retorno)
+        starts = [pd.Period(scenario['start'], 'M') for scenario in library.values() if 'start' in scenario]
+        ends = [pd.Period(scenario['end'], 'M') for scenario in library.values() if 'end' in scenario]
+        history_start = (min(starts + [pd.Period(self.data_start, 'M')]) - 1).start_time
+        history_end = max(ends + [pd.Period(self.data_end, 'M')]).end_time
+        history = self.loader.load_return_history(history_start, history_end)
+        if history is None:
+            print("ERRO: Histórico de preços indisponível para os testes de estresse")
+            return None
+        benchmark = self.loader.load_benchmark(start_date=history_start, end_date=history_end)
+        market = np.log(benchmark / benchmark.shift(1)) if benchmark is not None else None
+        
+        weights = pd.DataFrame({strategy: all_results[strategy][-1]['weights']
+                                for strategy in self.strategies if all_results.get(strategy)}).T
+        # Σ da última janela de estimação (contribuições de risco ex-ante)
+        last_period = self.estimation_periods[-1]
+        window = history[(history.index >= last_period['estimation_start']) &
+                         (history.index <= last_period['estimation_end'])].dropna()
+        cov_matrix = window.cov() * 12 if len(window) > 2 else None
+        
+        tester = StressTester(history, market, self.loader.asset_info, library)
+        result = tester.run(weights, cov_matrix)
+        print_stress_report(result)
+        self.store_summary('stress', {
+            f"{portfolio} | {scenario}": {
+                'pnl': result['pnl'].loc[portfolio, scenario],
+                **result['factors'].loc[(portfolio, scenario)].to_dict(),
+                **{f"sector:{sector}": value for sector, value in result['sectors'].loc[(portfolio, scenario)].items()}
+            }
+            for portfolio in result['pnl'].index for scenario in result['pnl'].columns
+        })
+        return result
+    
+    def analyze_benchmark(self):
+        """
+        Retorno ativo, tracking error, information ratio, beta e captura de
+        alta/baixa contra o índice de referência (todas as estratégias e
+        períodos em uma passagem, ver benchmark_analytics.relative_performance)
+        """
+        benchmark_prices = self.benchmark_prices
+        if benchmark_prices is None and self.results_store is not None and self.run_hash is not None:
+            panel = self.results_store.load_panel(self.run_hash, 'benchmark')
+            benchmark_prices = panel.iloc[:, 0] if panel is not None else None
+        if benchmark_prices is None or not self.portfolio_returns_history:
+            print(f"\nAnálise relativa ao {self.loader.benchmark_name} indisponível (sem índice de referência)")
+            return None
+        
+        dates = pd.DatetimeIndex(np.concatenate([period_data['dates'] for period_data in self.portfolio_returns_history]))
+        periods = np.concatenate([[period_data['period']] * len(period_data['dates'])
+                                  for period_data in self.portfolio_returns_history])
+        portfolio_returns = pd.DataFrame({
+            strategy: np.concatenate([period_data['returns'][strategy] for period_data in self.portfolio_returns_history])
+            for strategy in self.strategies
+        }, index=dates)
+        # Mesmo índice mensal das carteiras (fim do mês)
+        benchmark_prices = benchmark_prices.groupby(benchmark_prices.index.to_period('M')).last()
+        benchmark_returns = np.log(benchmark_prices / benchmark_prices.shift(1)).reindex(dates.to_period('M'))
+        
+        table = relative_performance(portfolio_returns, benchmark_returns.values, periods)
+        print_report(table, self.loader.benchmark_name)
+        self.store_summary('benchmark', {f"{strategy} | {period}": row.to_dict()
+                                         for (strategy, period), row in table.iterrows()})
+        return table
+    
+    def store_summary(self, scope, results):
+        """
+        Grava resultados agregados no ResultsStore (se configurado)
+        """
+        if self.results_store is not None and self.run_hash is not None:
+            self.results_store.save_summary(self.run_hash, scope, results)
+    
+    def risk_free_panel(self, dates):
+        """
+        Taxa livre de risco mensal por data (painel 'risk_free' do ResultsStore)
+        """
+        return pd.DataFrame({'CDI': self.risk_free_for(dates)}, index=dates)
+
+def bootstrap_sharpe_block(r1, r2, seed, n_draws):
+    """
+    Diferenças de Sharpe de um bloco de reamostras (índices em lote; tarefa do JobRunner)
+    """
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, len(r1), size=(n_draws, len(r1)))
+    samples1, samples2 = r1[indices], r2[indices]
+    sharpe1 = samples1.mean(axis=1) / samples1.std(axis=1, ddof=1) * np.sqrt(12)
+    sharpe2 = samples2.mean(axis=1) / samples2.std(axis=1, ddof=1) * np.sqrt(12)
+    return sharpe1 - sharpe2
+
+def _file_fingerprint(path):
+    """
+    Caminho absoluto, tamanho e data de modificação (invalida o hash quando o arquivo muda)
+    """
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        return {'path': path}
+    file_stat = os.stat(path)
+    return {'path': path, 'size': file_stat.st_size, 'mtime_ns': file_stat.st_mtime_ns}
 
 def main():
     """
     Execução da metodologia final
     """
+    profiler = configure_from_env()  # TCC_PROFILE=1 ativa a instrumentação
+    
     print("=== TCC BRUNO GASPARONI BALLERINI ===")
     print("Metodologia Final - Conforme Definida nas Seções")
     print()
     
-    analyzer = FinalMethodologyAnalyzer()
+    analyzer = FinalMethodologyAnalyzer(results_store=ResultsStore(), solver_cache=SolverCache())
     
     # Executar metodologia
     all_results = analyzer.run_methodology_analysis()
@@ -817,8 +1466,14 @@ def main():
         # Simular custos de transação
         cost_analysis = analyzer.simulate_transaction_costs()
         
+        # Tracking error, information ratio e captura contra o Ibovespa
+        analyzer.analyze_benchmark()
+        
+        # Overlay de volatilidade-alvo (se vol_target configurado)
+        analyzer.apply_volatility_target(all_results)
+        
         print("\n=== VALIDACAO METODOLOGICA ===")
-        print("OK CDI real do periodo (6,43% e 5,96%)")
+        print("OK CDI real do periodo (" + " e ".join(f"{rate:.2%}" for rate in analyzer.annual_cdi.values()) + ")")
         print("OK Sharpe: (Rp - Rf) / sigma_p")
         print("OK Sortino: (Rp - CDI) / sigma_-")  
         print("OK Markowitz: Maximizar Sharpe")
@@ -831,6 +1486,15 @@ def main():
         print("OK Testes de significância estatística implementados")
         print("OK Simulação de custos de transação implementada")
         
+        analyzer.solver_cache.print_stats()
+        
+        # Atualizar as tabelas LaTeX (apenas os fragmentos que mudaram)
+        LatexTableExporter(analyzer.results_store, analyzer.run_hash).export()
+        
+        if profiler.enabled:
+            profiler.print_summary()
+            profiler.export_all()
+        
         return analyzer, consolidated_results, significance_tests, cost_analysis
     else:
         print("ERRO: Não foi possível executar a metodologia")
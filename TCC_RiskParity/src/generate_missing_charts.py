@@ -1,235 +1,182 @@
 """
 Gerador de Gráficos Ausentes para o TCC
 Cria os gráficos referenciados mas ausentes nas figuras 4.6, 4.7, 4.9, 4.10
+
+Os dados vêm dos resultados armazenados pelo backtest (chart_pipeline);
+nenhuma série é simulada.
 """
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Renderização sem interface gráfica
 import matplotlib.pyplot as plt
 import seaborn as sns
-from economatica_loader import EconomaticaLoader
 import warnings
 warnings.filterwarnings('ignore')
 
+from chart_pipeline import STRATEGY_COLORS, render_figures, save_current_figure
+
 # Configuração para português
 plt.rcParams['font.size'] = 10
 plt.rcParams['figure.figsize'] = (12, 8)
 plt.style.use('seaborn-v0_8-whitegrid')
 
-def create_correlation_matrix():
+def create_correlation_matrix(asset_returns, output_paths):
     """Matriz de correlação - Figura 4.6"""
     print("Gerando matriz de correlação...")
-    
-    # Carregar dados
-    loader = EconomaticaLoader()
-    returns_df, _ = loader.load_selected_assets('2018-01-01', '2019-12-31')
-    
+
     # Calcular correlações
-    correlations = returns_df.corr()
-    
+    correlations = asset_returns.corr()
+
     # Criar heatmap
     plt.figure(figsize=(10, 8))
     mask = np.triu(np.ones_like(correlations, dtype=bool))
-    sns.heatmap(correlations, 
+    sns.heatmap(correlations,
                 mask=mask,
-                annot=True, 
+                annot=True,
                 cmap='RdBu_r',
                 center=0,
                 square=True,
                 linewidths=0.5,
                 cbar_kws={"shrink": 0.8},
                 fmt='.2f')
-    
+
     plt.title('Matriz de Correlação entre Ativos Selecionados (2018-2019)', fontsize=14, pad=20)
     plt.tight_layout()
-    plt.savefig('../docs/Overleaf/images/correlation_matrix.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_current_figure(output_paths)
     print("OK Matriz de correlação salva")
 
-def create_price_evolution():
+def create_price_evolution(asset_prices, output_paths):
     """Evolução de preços normalizados - Figura 4.7"""
     print("Gerando evolução de preços...")
-    
-    # Carregar dados
-    loader = EconomaticaLoader()
-    returns_df, prices_df = loader.load_selected_assets('2018-01-01', '2019-12-31')
-    
-    # Normalizar preços (base 100 = janeiro 2018)
-    normalized_prices = prices_df / prices_df.iloc[0] * 100
-    
+
+    # Normalizar preços (base 100 = início do período de teste)
+    normalized_prices = asset_prices / asset_prices.iloc[0] * 100
+
     plt.figure(figsize=(14, 8))
-    
+
     # Plotar cada ativo
     for col in normalized_prices.columns:
-        plt.plot(normalized_prices.index, normalized_prices[col], 
+        plt.plot(normalized_prices.index, normalized_prices[col],
                 label=col, linewidth=2, alpha=0.8)
-    
-    plt.title('Evolução dos Preços Normalizados dos Ativos Selecionados (2018-2019)', 
+
+    plt.title('Evolução dos Preços Normalizados dos Ativos Selecionados (2018-2019)',
               fontsize=14, pad=20)
     plt.xlabel('Período', fontsize=12)
     plt.ylabel('Preço Normalizado (Base 100 = Jan/2018)', fontsize=12)
     plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left', ncol=1)
     plt.grid(True, alpha=0.3)
     plt.axhline(y=100, color='black', linestyle='--', alpha=0.5, linewidth=1)
-    
+
     plt.tight_layout()
-    plt.savefig('../docs/Overleaf/images/price_evolution.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_current_figure(output_paths)
     print("OK Evolução de preços salva")
 
-def create_portfolio_evolution():
+def create_portfolio_evolution(portfolio_returns, output_paths):
     """Evolução das carteiras - Figura 4.9"""
     print("Gerando evolução das carteiras...")
-    
-    # Dados simulados baseados nos resultados reais
-    dates = pd.date_range('2018-01-01', '2019-12-31', freq='M')
-    
-    # Simular evolução das carteiras baseado nos retornos mensais reais
-    np.random.seed(42)  # Para reprodutibilidade
-    
-    # Valores iniciais
-    markowitz_values = [100]
-    equal_weight_values = [100]
-    risk_parity_values = [100]
-    ibovespa_values = [100]
-    
-    # Retornos mensais aproximados baseados nos resultados
-    for i in range(len(dates)):
-        # Markowitz: melhor performance
-        mark_ret = np.random.normal(0.021, 0.045)  # 2.1% média mensal, vol menor
-        eq_ret = np.random.normal(0.018, 0.058)    # 1.8% média mensal, vol maior
-        rp_ret = np.random.normal(0.016, 0.052)    # 1.6% média mensal, vol intermediária
-        ibov_ret = np.random.normal(0.008, 0.065)  # Ibovespa pior
-        
-        markowitz_values.append(markowitz_values[-1] * (1 + mark_ret))
-        equal_weight_values.append(equal_weight_values[-1] * (1 + eq_ret))
-        risk_parity_values.append(risk_parity_values[-1] * (1 + rp_ret))
-        ibovespa_values.append(ibovespa_values[-1] * (1 + ibov_ret))
-    
-    # Ajustar para valores finais aproximados
-    markowitz_final = 156.1  # +56.1% em 2 anos
-    equal_weight_final = 148.2  # +48.2% em 2 anos
-    risk_parity_final = 143.4   # +43.4% em 2 anos
-    ibovespa_final = 115.0      # +15% Ibovespa
-    
-    # Normalizar para valores finais corretos
-    factor_m = markowitz_final / markowitz_values[-1]
-    factor_e = equal_weight_final / equal_weight_values[-1]
-    factor_r = risk_parity_final / risk_parity_values[-1]
-    factor_i = ibovespa_final / ibovespa_values[-1]
-    
-    markowitz_values = [v * factor_m for v in markowitz_values]
-    equal_weight_values = [v * factor_e for v in equal_weight_values]
-    risk_parity_values = [v * factor_r for v in risk_parity_values]
-    ibovespa_values = [v * factor_i for v in ibovespa_values]
-    
+
+    # Valor das carteiras a partir dos retornos out-of-sample do backtest (base 100)
+    portfolio_values = 100 * (1 + portfolio_returns).cumprod()
+    start_date = portfolio_values.index[0] - pd.offsets.MonthEnd(1)
+    start_row = pd.DataFrame(100.0, index=[start_date], columns=portfolio_values.columns)
+    portfolio_values = pd.concat([start_row, portfolio_values])
+
     # Plotar
     plt.figure(figsize=(14, 8))
-    
-    dates_full = [pd.Timestamp('2018-01-01')] + list(dates)
-    
-    plt.plot(dates_full, markowitz_values, label='Markowitz', 
-             linewidth=3, color='darkgreen', alpha=0.9)
-    plt.plot(dates_full, equal_weight_values, label='Equal Weight', 
-             linewidth=2.5, color='blue', alpha=0.8)
-    plt.plot(dates_full, risk_parity_values, label='Risk Parity', 
-             linewidth=2.5, color='orange', alpha=0.8)
-    plt.plot(dates_full, ibovespa_values, label='Ibovespa', 
-             linewidth=2, color='red', linestyle='--', alpha=0.7)
-    
-    plt.title('Evolução das Carteiras vs. Ibovespa (2018-2019)', fontsize=14, pad=20)
+
+    for strategy in portfolio_values.columns:
+        plt.plot(portfolio_values.index, portfolio_values[strategy], label=strategy,
+                 linewidth=3 if strategy == 'Markowitz' else 2.5,
+                 color=STRATEGY_COLORS.get(strategy), alpha=0.9)
+
+    plt.title('Evolução das Carteiras (2018-2019)', fontsize=14, pad=20)
     plt.xlabel('Período', fontsize=12)
     plt.ylabel('Valor da Carteira (Base 100 = Jan/2018)', fontsize=12)
     plt.legend(fontsize=11, loc='upper left')
     plt.grid(True, alpha=0.3)
     plt.axhline(y=100, color='black', linestyle=':', alpha=0.5)
-    
+
     # Adicionar anotações dos valores finais
-    plt.annotate(f'Markowitz: {markowitz_final:.1f}', 
-                xy=(dates_full[-1], markowitz_values[-1]),
-                xytext=(10, 5), textcoords='offset points',
-                fontsize=10, fontweight='bold', color='darkgreen')
-    
+    for strategy in portfolio_values.columns:
+        final_value = portfolio_values[strategy].iloc[-1]
+        plt.annotate(f'{strategy}: {final_value:.1f}',
+                    xy=(portfolio_values.index[-1], final_value),
+                    xytext=(10, 5), textcoords='offset points',
+                    fontsize=10, fontweight='bold', color=STRATEGY_COLORS.get(strategy))
+
     plt.tight_layout()
-    plt.savefig('../docs/Overleaf/images/portfolio_evolution.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_current_figure(output_paths)
     print("OK Evolução das carteiras salva")
 
-def create_risk_return_plot():
-    """Plano risco-retorno - Figura 4.10"""
+def create_risk_return_plot(summary, risk_free_rate, frontier, output_paths):
+    """Plano risco-retorno com fronteira eficiente - Figura 4.10"""
     print("Gerando plano risco-retorno...")
-    
-    # Dados das estratégias (valores corretos)
-    strategies = {
-        'Markowitz': {'return': 26.1, 'volatility': 14.5, 'sharpe': 1.90},
-        'Equal Weight': {'return': 24.1, 'volatility': 20.9, 'sharpe': 1.49},
-        'Risk Parity': {'return': 21.7, 'volatility': 18.8, 'sharpe': 1.50}
-    }
-    
+
     plt.figure(figsize=(10, 8))
-    
-    # Cores para cada estratégia
-    colors = {'Markowitz': 'darkgreen', 'Equal Weight': 'blue', 'Risk Parity': 'orange'}
-    sizes = {'Markowitz': 200, 'Equal Weight': 150, 'Risk Parity': 150}
-    
-    # Plotar cada estratégia
-    for name, data in strategies.items():
-        plt.scatter(data['volatility'], data['return'], 
-                   s=sizes[name], alpha=0.8, color=colors[name],
-                   label=f"{name} (Sharpe: {data['sharpe']:.2f})",
+
+    # Fronteira eficiente (com os limites de peso) e família ERC -> mínima variância
+    efficient = frontier[frontier['curve'] == 'frontier']
+    if len(efficient) > 0:
+        plt.plot(efficient['volatility'] * 100, efficient['return'] * 100, color='gray',
+                 linewidth=2, alpha=0.8, label='Fronteira eficiente ex post do período de teste (limites de peso)')
+    risk_budget = frontier[frontier['curve'] == 'risk_budget']
+    if len(risk_budget) > 0:
+        plt.plot(risk_budget['volatility'] * 100, risk_budget['return'] * 100, color='purple',
+                 linestyle='--', linewidth=2, alpha=0.8, label='Risk budgeting ex post: ERC → mínima variância')
+
+    # Plotar cada estratégia (valores consolidados do backtest, em %)
+    for name, data in summary.iterrows():
+        color = STRATEGY_COLORS.get(name)
+        volatility = data['annual_volatility'] * 100
+        annual_return = data['annual_return'] * 100
+        plt.scatter(volatility, annual_return,
+                   s=200 if name == 'Markowitz' else 150, alpha=0.8, color=color,
+                   label=f"{name} (Sharpe: {data['sharpe_ratio']:.2f})",
                    edgecolors='black', linewidth=2)
-        
+
         # Adicionar anotação
-        plt.annotate(name, 
-                    xy=(data['volatility'], data['return']),
+        plt.annotate(name,
+                    xy=(volatility, annual_return),
                     xytext=(5, 5), textcoords='offset points',
                     fontsize=11, fontweight='bold',
-                    color=colors[name])
-    
+                    color=color)
+
     # Linha da taxa livre de risco
-    plt.axhline(y=6.195, color='red', linestyle='--', alpha=0.7, 
-                label='CDI (6,195%)', linewidth=2)
-    
+    rf_pct = risk_free_rate * 100
+    plt.axhline(y=rf_pct, color='red', linestyle='--', alpha=0.7,
+                label=f'CDI ({rf_pct:.3f}%)'.replace('.', ','), linewidth=2)
+
     plt.title('Posicionamento das Estratégias no Plano Risco-Retorno', fontsize=14, pad=20)
     plt.xlabel('Volatilidade Anualizada (%)', fontsize=12)
     plt.ylabel('Retorno Anualizado (%)', fontsize=12)
     plt.legend(fontsize=11, loc='lower right')
     plt.grid(True, alpha=0.3)
-    
-    # Limites dos eixos
-    plt.xlim(12, 23)
-    plt.ylim(5, 28)
-    
-    # Adicionar região de excelência (acima do CDI, baixa volatilidade)
-    plt.axhspan(6.195, 28, xmin=0, xmax=0.4, alpha=0.1, color='green', 
-                label='Região Ótima')
-    
+
     plt.tight_layout()
-    plt.savefig('../docs/Overleaf/images/risk_return_plot.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    save_current_figure(output_paths)
     print("OK Plano risco-retorno salvo")
 
-def main():
+def main(formats=('png',)):
     """Função principal"""
     print("=== GERANDO GRÁFICOS AUSENTES DO TCC ===")
-    
-    # Criar diretório se não existir
-    import os
-    os.makedirs('../docs/Overleaf/images', exist_ok=True)
-    
+
     try:
-        create_correlation_matrix()      # Figura 4.6
-        create_price_evolution()         # Figura 4.7  
-        create_portfolio_evolution()     # Figura 4.9
-        create_risk_return_plot()        # Figura 4.10
-        
+        render_figures(formats=formats, figures=[
+            'correlation_matrix',    # Figura 4.6
+            'price_evolution',       # Figura 4.7
+            'portfolio_evolution',   # Figura 4.9
+            'risk_return_plot'       # Figura 4.10
+        ])
+
         print("\nOK TODOS OS GRÁFICOS FORAM GERADOS COM SUCESSO!")
-        print("   Arquivos salvos em: ../docs/Overleaf/images/")
-        
+        print("   Arquivos salvos em: docs/Overleaf/images/")
+
     except Exception as e:
         print(f"\nERRO: {e}")
         import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,438 @@
+"""
+Atualização Incremental Mensal de uma Execução Armazenada
+Quando chega um novo mês de dados da Economatica, atualiza a execução gravada
+no ResultsStore em vez de refazer o backtest a partir de load_extended_data:
+
+1. Os novos preços são acrescentados ao painel em cache (retornos calculados
+   apenas para as linhas novas)
+2. O calendário de rebalanceamento é estendido até a nova data final, no mesmo
+   passo (semestral) da configuração. Só os períodos cujas janelas mudam são
+   processados:
+   - períodos encerrados: intocados (janelas de estimação e teste iguais)
+   - período em aberto: mesmos pesos (mesma janela de estimação); apenas as
+     métricas out-of-sample são refeitas com os meses novos
+   - rebalanceamentos novos: estimação dos parâmetros e otimização só para eles
+3. Momentos acumulados (n, Σr, Σrr') dos retornos mensais em excesso do CDI
+   (taxa do próprio mês, ver risk_free.py) são atualizados apenas com as observações novas; as estatísticas Ledoit-Wolf de
+   todos os pares saem desses momentos (o bootstrap, que precisa das séries,
+   é opcional)
+4. A execução atualizada é gravada com novo hash: cópia dentro do SQLite e
+   regravação apenas dos períodos alterados e das linhas novas dos painéis.
+   Escopos derivados (custos de transação, Monte Carlo) não são copiados e
+   devem ser recalculados sob demanda.
+"""
+
+import argparse
+import sys
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+from results_store import config_hash
+
+
+def month_end_index(frame):
+    """
+    Datas no fim do mês (mesma convenção de EconomaticaLoader: Period.end_time)
+    """
+    frame = frame.copy()
+    frame.index = pd.DatetimeIndex(frame.index).to_period('M').to_timestamp(how='end')
+    return frame
+
+
+def extend_rebalancing_dates(rebalancing_dates, new_end):
+    """
+    Estende o calendário (rebalanceamentos + data final) até new_end,
+    mantendo o passo em meses entre os dois últimos rebalanceamentos
+    """
+    dates = [pd.Timestamp(date) for date in rebalancing_dates]
+    rebalances = dates[:-1]
+    step = 6
+    if len(rebalances) > 1:
+        step = (rebalances[-1].to_period('M') - rebalances[-2].to_period('M')).n
+    new_end = pd.Timestamp(new_end)
+
+    next_date = rebalances[-1] + pd.offsets.MonthEnd(step)
+    while next_date < new_end:
+        rebalances.append(next_date)
+        next_date = next_date + pd.offsets.MonthEnd(step)
+    return [str(date.date()) for date in rebalances + [max(new_end, dates[-1])]]
+
+
+class ReturnMoments:
+    """
+    Momentos acumulados dos retornos mensais excedentes das estratégias: n, Σr e Σrr'
+    """
+
+    def __init__(self, strategies):
+        self.strategies = list(strategies)
+        self.n = 0
+        self.sums = np.zeros(len(self.strategies))
+        self.cross = np.zeros((len(self.strategies), len(self.strategies)))
+
+    @classmethod
+    def from_history(cls, strategies, portfolio_returns_history, risk_free_for):
+        moments = cls(strategies)
+        for period_data in portfolio_returns_history:
+            returns = np.column_stack([period_data['returns'][s] for s in moments.strategies])
+            moments.update(returns - risk_free_for(period_data['dates'])[:, None])
+        return moments
+
+    @classmethod
+    def from_summary(cls, strategies, summary):
+        """
+        Reconstrói a partir do escopo 'excess_moments' (None se ausente ou incompleto)
+        """
+        moments = cls(strategies)
+        try:
+            moments.n = int(summary[moments.strategies[0]]['n'])
+            for i, strategy in enumerate(moments.strategies):
+                moments.sums[i] = summary[strategy]['sum']
+                for j, other in enumerate(moments.strategies):
+                    moments.cross[i, j] = summary[strategy][f'cross|{other}']
+        except KeyError:
+            return None
+        return moments
+
+    def update(self, returns):
+        """
+        Acrescenta observações (matriz T x K na ordem de self.strategies)
+        """
+        returns = np.asarray(returns, dtype=float).reshape(-1, len(self.strategies))
+        self.n += len(returns)
+        self.sums += returns.sum(axis=0)
+        self.cross += returns.T @ returns
+
+    def mean(self):
+        return self.sums / self.n
+
+    def covariance(self):
+        """
+        Covariância amostral (ddof=1), igual a np.cov das séries concatenadas
+        """
+        mean = self.mean()
+        return (self.cross - self.n * np.outer(mean, mean)) / (self.n - 1)
+
+    def to_summary(self):
+        return {
+            strategy: {'n': self.n, 'sum': self.sums[i],
+                       **{f'cross|{other}': self.cross[i, j] for j, other in enumerate(self.strategies)}}
+            for i, strategy in enumerate(self.strategies)
+        }
+
+
+class IncrementalUpdater:
+    """
+    Atualiza uma execução do ResultsStore com novos meses de preços
+    """
+
+    def __init__(self, analyzer, run_hash=None):
+        if analyzer.results_store is None:
+            raise ValueError("Atualização incremental requer um ResultsStore configurado")
+        self.analyzer = analyzer
+        self.store = analyzer.results_store
+        self.run_hash = run_hash or self.store.latest_run()
+        if self.run_hash is None:
+            raise ValueError("Nenhuma execução armazenada para atualizar")
+        self.all_results = None
+        self.moments = None
+
+    def load_base(self):
+        """
+        Restaura no analisador a configuração, os resultados e os painéis da execução base
+        """
+        config = self.store.load_config(self.run_hash)
+        if config is None:
+            raise ValueError(f"Execução não encontrada: {self.run_hash}")
+
+        analyzer = self.analyzer
+        analyzer.loader.selected_assets = list(config['selected_assets'])
+        analyzer.data_start = config['data_start']
+        analyzer.data_end = config['data_end']
+        analyzer.rebalancing_dates = list(config['rebalancing_dates'])
+        analyzer.estimation_window_days = config['estimation_window_days']
+        analyzer.risk_free_rate = config['risk_free_rate']
+        risk_free_series = config.get('risk_free_series')
+        analyzer.risk_free_path = risk_free_series['path'] if risk_free_series else None
+        analyzer.risk_free_unit = risk_free_series['unit'] if risk_free_series else 'daily_pct'
+        analyzer.risk_free = None
+        analyzer.weight_bounds = tuple(config['weight_bounds'])
+        analyzer.strategies = list(config['strategies'])
+        analyzer.sector_budgets = config.get('sector_budgets')
+        analyzer.asset_risk_budgets = config.get('asset_risk_budgets')
+        cvar = config.get('cvar', {})
+        analyzer.cvar_alpha = cvar.get('alpha', analyzer.cvar_alpha)
+        analyzer.cvar_scenarios = cvar.get('scenarios', analyzer.cvar_scenarios)
+        analyzer.cvar_n_scenarios = cvar.get('n_scenarios', analyzer.cvar_n_scenarios)
+        analyzer.cvar_target_return = cvar.get('target_return', analyzer.cvar_target_return)
+        resampling = config.get('resampling', {})
+        analyzer.resampling_draws = resampling.get('draws', analyzer.resampling_draws)
+        analyzer.robust_confidence = resampling.get('robust_confidence', analyzer.robust_confidence)
+        walk_forward = config.get('walk_forward')
+        analyzer.walk_forward_windows = walk_forward['windows'] if walk_forward else None
+        if walk_forward:
+            analyzer.walk_forward_shrinkages = walk_forward['shrinkages']
+            analyzer.walk_forward_validation_months = walk_forward['validation_months']
+        analyzer.loader.adjust_prices = config.get('adjust_prices', False)  # Execuções anteriores ao ajuste
+        benchmark = config.get('benchmark') or {}
+        analyzer.loader.benchmark_path = benchmark['path'] if 'path' in benchmark else None
+        analyzer.loader.benchmark_sheet = benchmark.get('sheet', analyzer.loader.benchmark_sheet)
+        analyzer.tracking_error_limit = config.get('tracking_error_limit', analyzer.tracking_error_limit)
+
+        self.all_results, analyzer.portfolio_returns_history, analyzer.turnover_history = \
+            self.store.load_run(self.run_hash)
+        analyzer.sector_risk_history = self.store.load_summary(self.run_hash, 'sector_risk')
+        analyzer.full_prices = month_end_index(self.store.load_panel(self.run_hash, 'prices'))
+        analyzer.full_returns = month_end_index(self.store.load_panel(self.run_hash, 'returns'))
+        benchmark_panel = self.store.load_panel(self.run_hash, 'benchmark')
+        analyzer.set_benchmark(month_end_index(benchmark_panel).iloc[:, 0] if benchmark_panel is not None else None)
+        analyzer.active_risk_history = self.store.load_summary(self.run_hash, 'active_risk')
+        analyzer.run_hash = self.run_hash
+        analyzer.setup_rebalancing_periods()
+
+        self.moments = ReturnMoments.from_summary(
+            analyzer.strategies, self.store.load_summary(self.run_hash, 'excess_moments'))
+        if self.moments is None:
+            # Execução anterior a este modo: uma passagem sobre os retornos armazenados
+            self.moments = ReturnMoments.from_history(analyzer.strategies,
+                                                      analyzer.portfolio_returns_history,
+                                                      analyzer.risk_free_for)
+
+    def read_new_prices(self, end_date=None):
+        """
+        Preços mensais posteriores ao painel em cache, lidos da planilha do loader
+        (o último mês em cache é relido para que cada ativo tenha ao menos 2 meses)
+        """
+        last_date = self.analyzer.full_prices.index[-1]
+        end_date = end_date or pd.Timestamp.today().normalize()
+        _, prices = self.analyzer.loader.load_selected_assets(
+            start_date=last_date.to_period('M').start_time, end_date=end_date, min_observations=2)
+        if prices is None:
+            return None
+        return prices[prices.index > last_date]
+
+    def read_new_benchmark(self, end_date=None):
+        """
+        Níveis mensais do índice de referência posteriores ao painel em cache
+        (None se a execução não tem índice ou não há meses novos)
+        """
+        benchmark_prices = self.analyzer.benchmark_prices
+        if benchmark_prices is None:
+            return None
+        last_date = benchmark_prices.index[-1]
+        end_date = end_date or pd.Timestamp.today().normalize()
+        new_levels = self.analyzer.loader.load_benchmark(start_date=last_date.to_period('M').start_time,
+                                                         end_date=end_date)
+        if new_levels is None:
+            return None
+        new_levels = new_levels[new_levels.index > last_date]
+        return new_levels if len(new_levels) > 0 else None
+
+    def update(self, new_prices=None, end_date=None, bootstrap=True):
+        """
+        Incorpora os novos meses e grava a execução atualizada
+
+        new_prices: DataFrame mensal data x ativo (None = ler da planilha do loader).
+        Retorna um resumo com o novo hash, os períodos processados e os meses novos.
+        """
+        if self.moments is None:
+            self.load_base()
+        analyzer = self.analyzer
+
+        if new_prices is None:
+            new_prices = self.read_new_prices(end_date)
+        last_date = analyzer.full_prices.index[-1]
+        if new_prices is not None:
+            new_prices = month_end_index(new_prices).reindex(columns=analyzer.full_prices.columns)
+            new_prices = new_prices[new_prices.index > last_date].dropna()
+        if new_prices is None or new_prices.empty:
+            print(f"Nenhum mês novo após {last_date.date()} (run {self.run_hash[:12]})")
+            return None
+
+        print(f"\n=== ATUALIZAÇÃO INCREMENTAL: {len(new_prices)} mês(es) novo(s) ===")
+        with stage('incremental.append', months=len(new_prices)):
+            tail = pd.concat([analyzer.full_prices.iloc[[-1]], new_prices])
+            new_returns = np.log(tail / tail.shift(1)).iloc[1:]
+            analyzer.full_prices = pd.concat([analyzer.full_prices, new_prices])
+            analyzer.full_returns = pd.concat([analyzer.full_returns, new_returns])
+            new_benchmark = self.read_new_benchmark(end_date or new_prices.index[-1])
+            analyzer.set_benchmark(analyzer.benchmark_prices if new_benchmark is None else
+                                   pd.concat([analyzer.benchmark_prices, new_benchmark]))
+
+        old_periods = {period['name']: period for period in analyzer.estimation_periods}
+        analyzer.data_end = str(new_prices.index[-1].date())
+        analyzer.rebalancing_dates = extend_rebalancing_dates(analyzer.rebalancing_dates, analyzer.data_end)
+        analyzer.setup_rebalancing_periods()
+
+        processed = []
+        first_changed = None
+        for period_info in analyzer.estimation_periods:
+            if old_periods.get(period_info['name']) == period_info:
+                continue  # Janelas inalteradas: resultados armazenados continuam válidos
+            period_idx = self.update_period(period_info, old_periods.get(period_info['name']))
+            if period_idx is not None:
+                processed.append(period_info['name'])
+                first_changed = period_idx if first_changed is None else min(first_changed, period_idx)
+
+        summary = self.save(new_prices, new_returns, new_benchmark, first_changed)
+        summary['processed_periods'] = processed
+        analyzer.consolidate_final_results(self.all_results)
+        summary['significance'] = self.significance_tests(bootstrap=bootstrap)
+        return summary
+
+    def update_period(self, period_info, old_period):
+        """
+        Recalcula um período cujas janelas mudaram; retorna sua posição (None se sem dados)
+        """
+        analyzer = self.analyzer
+        strategies = analyzer.strategies
+        returns = analyzer.full_returns
+        est_data = returns[(returns.index >= period_info['estimation_start']) &
+                           (returns.index <= period_info['estimation_end'])]
+        test_data = returns[(returns.index >= period_info['testing_start']) &
+                            (returns.index <= period_info['testing_end'])]
+        if len(est_data) < 12 or len(test_data) < 3:
+            print(f"{period_info['name']}: dados insuficientes (Est={len(est_data)}, Test={len(test_data)})")
+            return None
+
+        history = analyzer.portfolio_returns_history
+        positions = {period_data['period']: idx for idx, period_data in enumerate(history)}
+        period_idx = positions.get(period_info['name'], len(history))
+        reuse_weights = (
+            period_idx < len(history) and old_period is not None and
+            all(old_period[key] == period_info[key]
+                for key in ('estimation_start', 'estimation_end', 'testing_start'))
+        )
+
+        if reuse_weights:
+            # Período em aberto: mesmos pesos, apenas meses novos no teste
+            print(f"{period_info['name']}: período estendido ({len(test_data)} meses de teste)")
+            weights = {s: pd.Series(self.all_results[s][period_idx]['weights']) for s in strategies}
+            turnovers = analyzer.turnover_history[period_idx]['turnovers']
+            known_months = len(history[period_idx]['returns'][strategies[0]])
+        else:
+            print(f"{period_info['name']}: novo rebalanceamento")
+            parameters = analyzer.estimate_parameters(est_data, period_info.get('shrinkage', 0.0))
+            weights = {s: analyzer.strategy_builders[s](parameters) for s in strategies}
+            turnovers = {}
+            for strategy in strategies:
+                previous = (pd.Series(self.all_results[strategy][period_idx - 1]['weights'])
+                            if period_idx > 0 else None)
+                turnovers[strategy] = analyzer.calculate_turnover(previous, weights[strategy])
+            sector_rc = analyzer.sector_risk_report(weights, parameters)['sectors']
+            for strategy_name, contributions in sector_rc.iterrows():
+                analyzer.sector_risk_history[f"{strategy_name} | {period_info['name']}"] = contributions.to_dict()
+            analyzer.record_active_risk(weights, parameters, period_info['name'])
+            known_months = 0
+
+        period_returns = {}
+        for strategy in strategies:
+            metrics = analyzer.calculate_portfolio_metrics(weights[strategy], test_data, period_info['name'])
+            metrics['period'] = period_info['name']
+            metrics['weights'] = weights[strategy].to_dict()
+            _set_item(self.all_results[strategy], period_idx, metrics)
+            period_returns[strategy] = (test_data * weights[strategy]).sum(axis=1).values
+
+        _set_item(history, period_idx, {'period': period_info['name'], 'returns': period_returns,
+                                        'dates': test_data.index})
+        _set_item(analyzer.turnover_history, period_idx, {'period': period_info['name'],
+                                                          'turnovers': turnovers})
+        monthly_cdi = analyzer.risk_free_for(test_data.index)[known_months:]
+        self.moments.update(np.column_stack([period_returns[s][known_months:] for s in strategies])
+                            - monthly_cdi[:, None])
+        return period_idx
+
+    def save(self, new_prices, new_returns, new_benchmark, first_changed):
+        """
+        Grava a execução atualizada com novo hash (a execução base é preservada)
+        """
+        analyzer = self.analyzer
+        config = analyzer.get_run_config()
+        new_hash = config_hash(config)
+        with stage('incremental.save'):
+            self.store.copy_run(self.run_hash, new_hash, config)
+            if first_changed is not None:
+                self.store.replace_periods(new_hash, first_changed, self.all_results,
+                                           analyzer.portfolio_returns_history, analyzer.turnover_history)
+            self.store.save_panel(new_hash, 'prices', new_prices, append=True)
+            self.store.save_panel(new_hash, 'returns', new_returns, append=True)
+            self.store.save_panel(new_hash, 'risk_free', analyzer.risk_free_panel(new_returns.index), append=True)
+            self.store.save_summary(new_hash, 'sector_risk', analyzer.sector_risk_history)
+            if analyzer.walk_forward_history:
+                self.store.save_summary(new_hash, 'walk_forward', analyzer.walk_forward_history)
+            if new_benchmark is not None:
+                self.store.save_panel(new_hash, 'benchmark', new_benchmark.to_frame(), append=True)
+            if analyzer.active_risk_history:
+                self.store.save_summary(new_hash, 'active_risk', analyzer.active_risk_history)
+            self.store.save_summary(new_hash, 'excess_moments', self.moments.to_summary())
+
+        print(f"Execução atualizada: {self.run_hash[:12]} -> {new_hash[:12]} "
+              f"(dados até {analyzer.data_end})")
+        summary = {'base_run': self.run_hash, 'run_hash': new_hash, 'new_months': len(new_prices)}
+        self.run_hash = analyzer.run_hash = new_hash
+        return summary
+
+    def significance_tests(self, bootstrap=True):
+        """
+        Testes Ledoit-Wolf de todos os pares a partir dos momentos acumulados
+        (bootstrap opcional sobre as séries armazenadas, em excesso do CDI)
+        """
+        analyzer = self.analyzer
+        moments = self.moments
+        mean = moments.mean()
+        cov = moments.covariance()
+        series = None
+        if bootstrap:
+            history = analyzer.portfolio_returns_history
+            monthly_cdi = analyzer.risk_free_for(np.concatenate([period_data['dates'] for period_data in history]))
+            series = {s: np.concatenate([period_data['returns'][s] for period_data in history]) - monthly_cdi
+                      for s in moments.strategies}
+
+        significance_summary = {}
+        for (i, strategy1), (j, strategy2) in combinations(enumerate(moments.strategies), 2):
+            lw_test = analyzer.sharpe_difference_from_moments(moments.n, mean[i], mean[j],
+                                                              cov[i, i], cov[j, j], cov[i, j])
+            entry = {'sharpe_difference': lw_test['difference'], 't_statistic': lw_test['t_statistic'],
+                     'p_value_lw': lw_test['p_value'], 'p_value_bootstrap': np.nan,
+                     'ci95_low': np.nan, 'ci95_high': np.nan, 'bootstrap_draws': 0}
+            if series is not None:
+                bootstrap_test = analyzer.bootstrap_sharpe_difference(series[strategy1], series[strategy2])
+                entry['p_value_bootstrap'] = bootstrap_test['p_value']
+                entry['ci95_low'], entry['ci95_high'] = bootstrap_test['confidence_interval_95']
+                entry['bootstrap_draws'] = analyzer.bootstrap_draws
+            significance_summary[f"{strategy1} vs {strategy2}"] = entry
+
+        analyzer.store_summary('significance', significance_summary)
+        return significance_summary
+
+
+def _set_item(items, idx, value):
+    if idx < len(items):
+        items[idx] = value
+    else:
+        items.append(value)
+
+
+def main(argv=None):
+    from final_methodology import FinalMethodologyAnalyzer
+    from results_store import ResultsStore
+    from solver_cache import SolverCache
+
+    parser = argparse.ArgumentParser(description="Atualização incremental com novos meses de preços")
+    parser.add_argument('--run', default=None, help="Hash da execução base (padrão: a mais recente)")
+    parser.add_argument('--data-path', default=None, help="Planilha Economatica com os meses novos")
+    parser.add_argument('--end-date', default=None)
+    parser.add_argument('--no-bootstrap', action='store_true')
+    args = parser.parse_args(argv)
+
+    analyzer = FinalMethodologyAnalyzer(results_store=ResultsStore(), solver_cache=SolverCache())
+    if args.data_path:
+        analyzer.loader.data_path = args.data_path
+    updater = IncrementalUpdater(analyzer, run_hash=args.run)
+    return updater.update(end_date=args.end_date, bootstrap=not args.no_bootstrap)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
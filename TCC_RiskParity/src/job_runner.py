@@ -0,0 +1,179 @@
+"""
+Execução Retomável de Trabalhos Longos (Varreduras e Bootstraps)
+Um trabalho é dividido em tarefas idempotentes identificadas por uma chave
+estável (ex.: hash da configuração ou do bloco de sementes). Cada tarefa
+concluída é gravada imediatamente em um banco SQLite (results/jobs.sqlite):
+se o processo cair ou for interrompido (Ctrl+C), a próxima execução do
+mesmo trabalho só executa as tarefas que faltam.
+
+As tarefas rodam no processo atual (workers=1) ou em um pool de processos;
+somente o processo principal grava no banco, à medida que os resultados
+chegam (em qualquer ordem). O progresso mostra tarefas concluídas, tempo
+decorrido e ETA (média das tarefas concluídas nesta execução x restantes).
+
+    runner = JobRunner('varredura', workers=4)
+    results = runner.run({chave: (função, argumentos), ...})
+
+Funções e argumentos precisam ser serializáveis (funções de módulo); os
+resultados são gravados com pickle. Uma tarefa que retorna None (ex.:
+configuração sem resultados no backtest) conta como erro e não é gravada.
+"""
+
+import datetime
+import os
+import pickle
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from profiling import annotate, profiled
+
+
+class JobCheckpoint:
+    """
+    Resultados das tarefas concluídas, por trabalho e chave da tarefa
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS job_tasks (
+            job TEXT NOT NULL,
+            task_key TEXT NOT NULL,
+            finished_at TEXT NOT NULL,
+            seconds REAL,
+            result BLOB,
+            PRIMARY KEY (job, task_key)
+        );
+    """
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            db_path = os.path.join(current_dir, "..", "results", "jobs.sqlite")
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def completed(self, job):
+        """
+        {chave: resultado} das tarefas já concluídas do trabalho
+        """
+        rows = self.conn.execute("SELECT task_key, result FROM job_tasks WHERE job = ?", (job,))
+        return {key: pickle.loads(result) for key, result in rows}
+
+    def save(self, job, task_key, result, seconds):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO job_tasks VALUES (?, ?, ?, ?, ?)",
+                (job, task_key, datetime.datetime.now().isoformat(timespec='seconds'), seconds,
+                 pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+
+    def clear(self, job):
+        """
+        Descarta as tarefas gravadas (recomeça o trabalho do zero)
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM job_tasks WHERE job = ?", (job,))
+
+
+def _run_task(task_key, function, args):
+    """
+    Executa uma tarefa e mede sua duração (no processo principal ou no pool)
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return task_key, result, time.perf_counter() - start
+
+
+def _format_seconds(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class JobRunner:
+    """
+    Executa as tarefas pendentes de um trabalho, gravando cada resultado ao concluir
+    """
+
+    def __init__(self, name, checkpoint=None, workers=1, progress_interval=5.0):
+        self.name = name
+        self.checkpoint = checkpoint if checkpoint is not None else JobCheckpoint()
+        self.workers = max(1, int(workers or 1))
+        self.progress_interval = progress_interval
+        self.failed = {}
+
+    def restart(self):
+        self.checkpoint.clear(self.name)
+
+    @profiled('job_runner')
+    def run(self, tasks):
+        """
+        Resultados de todas as tarefas {chave: (função, argumentos)}, na ordem
+        de tasks; tarefas com erro ficam de fora (em self.failed) e são
+        tentadas de novo na próxima execução
+        """
+        done = self.checkpoint.completed(self.name)
+        results = {key: done[key] for key in tasks if key in done}
+        pending = {key: task for key, task in tasks.items() if key not in done}
+        self.failed = {}
+        total = len(tasks)
+        print(f"Trabalho '{self.name}': {total} tarefas, {len(results)} já concluídas, "
+              f"{len(pending)} pendentes ({self.workers} processo(s))")
+
+        start = time.perf_counter()
+        state = {'finished': 0, 'last_report': start}
+
+        def record(task_key, result, seconds):
+            if result is None:
+                self._fail(task_key, "tarefa sem resultado")
+                return
+            self.checkpoint.save(self.name, task_key, result, seconds)
+            results[task_key] = result
+            state['finished'] += 1
+            now = time.perf_counter()
+            if now - state['last_report'] >= self.progress_interval or state['finished'] == len(pending):
+                state['last_report'] = now
+                elapsed = now - start
+                eta = elapsed / state['finished'] * (len(pending) - state['finished'])
+                print(f"  [{len(results)}/{total}] {len(results) / total:.0%} | decorrido "
+                      f"{_format_seconds(elapsed)} | ETA {_format_seconds(eta)} | {task_key}")
+
+        try:
+            if self.workers <= 1 or len(pending) <= 1:
+                for task_key, (function, args) in pending.items():
+                    try:
+                        record(*_run_task(task_key, function, args))
+                    except Exception as e:
+                        self._fail(task_key, e)
+            elif pending:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    futures = {pool.submit(_run_task, task_key, function, args): task_key
+                               for task_key, (function, args) in pending.items()}
+                    try:
+                        for future in as_completed(futures):
+                            try:
+                                record(*future.result())
+                            except Exception as e:
+                                self._fail(futures[future], e)
+                    except KeyboardInterrupt:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+        except KeyboardInterrupt:
+            print(f"\nInterrompido: {len(results)}/{total} tarefas gravadas em {self.checkpoint.db_path}; "
+                  f"execute novamente para retomar")
+            raise
+
+        annotate(tasks=total, resumed=total - len(pending), failed=len(self.failed), workers=self.workers)
+        if self.failed:
+            print(f"ATENÇÃO: {len(self.failed)} tarefa(s) com erro serão repetidas na próxima execução")
+        return {key: results[key] for key in tasks if key in results}
+
+    def _fail(self, task_key, error):
+        self.failed[task_key] = error
+        print(f"  ERRO tarefa {task_key}: {error}")
@@ -0,0 +1,316 @@
+"""
+Geração Automática das Tabelas LaTeX a partir dos Resultados Armazenados
+Escreve fragmentos .tex em docs/Overleaf/tables diretamente do ResultsStore
+(performance, pesos, retornos mensais, semestres, significância e custos).
+
+Um fragmento só é regravado quando o conteúdo gerado muda, mantendo o build
+do Overleaf incremental.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from results_store import ResultsStore
+
+MONTHS_PT = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+HEADER = "% Tabela gerada automaticamente pelo Python (latex_tables.py) - não editar manualmente\n"
+SOURCE_NOTE = "\\textit{Fonte: Elaborado pelo autor com base em dados da Economática.}"
+
+
+def default_tables_dir():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "..", "docs", "Overleaf", "tables")
+
+
+def fmt_num(value, decimals=2):
+    """
+    Número no padrão brasileiro (vírgula decimal)
+    """
+    if value is None or not np.isfinite(value):
+        return "N/A"
+    return f"{value:.{decimals}f}".replace('.', ',')
+
+
+def fmt_pct(value, decimals=1, sign=False):
+    """
+    Fração como percentual LaTeX (0.123 -> 12,3\\%)
+    """
+    if value is None or not np.isfinite(value):
+        return "N/A"
+    text = f"{value * 100:+.{decimals}f}" if sign else f"{value * 100:.{decimals}f}"
+    return text.replace('.', ',') + "\\%"
+
+
+def fmt_pvalue(value):
+    if value is None or not np.isfinite(value):
+        return "N/A"
+    return "$<$0,0001" if value < 0.0001 else fmt_num(value, 4)
+
+
+def month_label(date):
+    date = pd.Timestamp(date)
+    return f"{MONTHS_PT[date.month - 1]}/{date.year}"
+
+
+def _table(caption, label, column_spec, header_lines, body_lines, note=SOURCE_NOTE):
+    lines = [
+        HEADER.rstrip('\n'),
+        "\\begin{table}[H]",
+        "\\centering",
+        f"\\caption{{{caption}}}",
+        f"\\begin{{tabular}}{{{column_spec}}}",
+        "\\hline",
+        *header_lines,
+        "\\hline",
+        *body_lines,
+        "\\end{tabular}",
+        note,
+        f"\\label{{{label}}}",
+        "\\end{table}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _bold_header(*cells):
+    return " & ".join(f"\\textbf{{{cell}}}" if cell else "" for cell in cells) + " \\\\"
+
+
+class LatexTableExporter:
+    """
+    Gera os fragmentos .tex de uma execução armazenada
+    """
+
+    def __init__(self, store, run_hash=None):
+        self.store = store
+        self.run_hash = run_hash or store.latest_run()
+        if self.run_hash is None:
+            raise ValueError("Nenhuma execução armazenada no ResultsStore")
+
+        self.config = store.load_config(self.run_hash) or {}
+        self.risk_free_rate = self.config.get('risk_free_rate', 0.0)
+        self.risk_free_panel = store.load_panel(self.run_hash, 'risk_free')  # CDI mês a mês (se gravado)
+        self.all_results, self.returns_history, self.turnover_history = store.load_run(self.run_hash)
+        self.strategies = list(self.all_results)
+
+    def _portfolio_returns(self):
+        return pd.concat([
+            pd.DataFrame(period_data['returns'], index=period_data['dates'])
+            for period_data in self.returns_history
+        ])[self.strategies]
+
+    def _monthly_rf(self, dates):
+        """
+        CDI mensal alinhado às datas (painel 'risk_free' ou taxa constante / 12)
+        """
+        if self.risk_free_panel is None:
+            return pd.Series(self.risk_free_rate / 12, index=dates)
+        cdi = self.risk_free_panel['CDI']
+        # Nova série indexada por mês: o painel em cache não é alterado
+        monthly = pd.Series(cdi.values, index=pd.DatetimeIndex(cdi.index).to_period('M'))
+        return pd.Series(monthly.reindex(pd.DatetimeIndex(dates).to_period('M')).values, index=dates)
+
+    def portfolio_performance(self):
+        consolidated = self.store.load_summary(self.run_hash, 'consolidated')
+        returns = self._portfolio_returns()
+        monthly_rf = self._monthly_rf(returns.index)
+
+        body = []
+        for strategy in self.strategies:
+            metrics = consolidated.get(strategy, {})
+            below_cdi = int((returns[strategy] < monthly_rf).sum())
+            sortino = metrics.get('sortino_ratio', np.nan)
+            body += [
+                f"{strategy} & {fmt_num(metrics.get('annual_return', np.nan) * 100, 1)} & "
+                f"{fmt_num(metrics.get('annual_volatility', np.nan) * 100, 1)} & "
+                f"{fmt_num(metrics.get('sharpe_ratio', np.nan))} & "
+                f"{fmt_num(sortino) if sortino < 100 else 'N/A'} & "
+                f"{below_cdi}/{len(returns)} & {fmt_pct(metrics.get('max_drawdown', np.nan))} \\\\",
+                "\\hline",
+            ]
+        return _table(
+            "Performance Consolidada das Carteiras (2018-2019)", "tab:portfolio_performance",
+            "|l|r|r|r|r|r|r|",
+            [_bold_header('Estratégia', 'Retorno', 'Volatilidade', 'Sharpe', 'Sortino', 'Períodos', 'Max'),
+             _bold_header('', 'Anual (\\%)', 'Anual (\\%)', 'Ratio', 'Ratio', '<CDI', 'Drawdown')],
+            body,
+            note=f"\\textit{{Fonte: Elaborado pelo autor com base em dados da Economática. "
+                 f"Taxa livre de risco: {fmt_num(monthly_rf.mean() * 12 * 100, 3)}\\% a.a.}}"
+        )
+
+    def portfolio_weights(self):
+        assets = list(self.all_results[self.strategies[0]][0]['weights'])
+        n_cols = len(assets) + 2
+
+        body = []
+        for period_idx, period_data in enumerate(self.returns_history):
+            label = month_label(period_data['dates'][0]).replace('/', ' ')
+            for i, strategy in enumerate(self.strategies):
+                weights = self.all_results[strategy][period_idx]['weights']
+                cells = " & ".join(fmt_num(weights[asset] * 100, 1) for asset in assets)
+                prefix = f"\\multirow{{{len(self.strategies)}}}{{*}}{{{label}}}" if i == 0 else ""
+                body.append(f"{prefix} & {strategy} & {cells} \\\\")
+                body.append(f"\\cline{{2-{n_cols}}}" if i < len(self.strategies) - 1 else "\\hline")
+
+        return _table(
+            "Evolução dos Pesos das Carteiras por Período de Rebalanceamento", "tab:portfolio_weights",
+            "|l|r|" + "r|" * len(assets),
+            [f"\\multirow{{2}}{{*}}{{\\textbf{{Período}}}} & \\multirow{{2}}{{*}}{{\\textbf{{Estratégia}}}} & "
+             f"\\multicolumn{{{len(assets)}}}{{c|}}{{\\textbf{{Pesos dos Ativos (\\%)}}}} \\\\",
+             f"\\cline{{3-{n_cols}}}",
+             "& & " + " & ".join(f"\\textbf{{{asset}}}" for asset in assets) + " \\\\"],
+            body,
+            note="\\textit{Fonte: Elaborado pelo autor utilizando Python.}"
+        )
+
+    def monthly_returns(self):
+        returns = self._portfolio_returns()
+        monthly_rf = self._monthly_rf(returns.index)
+
+        body = []
+        for year, year_returns in returns.groupby(returns.index.year):
+            for date, row in year_returns.iterrows():
+                cells = " & ".join(fmt_num(row[s] * 100) for s in self.strategies)
+                body.append(f"{month_label(date)} & {cells} & {fmt_num(monthly_rf[date] * 100)} \\\\")
+            body.append("\\hline")
+            totals = " & ".join(f"\\textbf{{{fmt_num(year_returns[s].sum() * 100)}}}" for s in self.strategies)
+            body.append(f"\\textbf{{{year} Total}} & {totals} & "
+                        f"\\textbf{{{fmt_num(monthly_rf[year_returns.index].sum() * 100)}}} \\\\")
+            body.append("\\hline")
+        totals = " & ".join(f"\\textbf{{{fmt_num(returns[s].sum() * 100)}}}" for s in self.strategies)
+        body.append(f"\\textbf{{PERÍODO TOTAL}} & {totals} & "
+                    f"\\textbf{{{fmt_num(monthly_rf.sum() * 100)}}} \\\\")
+        body.append("\\hline")
+
+        return _table(
+            "Retornos Mensais das Carteiras (\\%)", "tab:monthly_returns",
+            "|l|" + "r|" * (len(self.strategies) + 1),
+            [_bold_header('Mês/Ano', *self.strategies, 'CDI')],
+            body
+        )
+
+    def semester_performance(self):
+        periods = self.returns_history
+        header_top = "\\multirow{2}{*}{\\textbf{Estratégia}} & " + " & ".join(
+            f"\\multicolumn{{2}}{{c|}}{{\\textbf{{{month_label(p['dates'][0])}--{month_label(p['dates'][-1])}}}}}"
+            for p in periods
+        ) + " \\\\"
+        header_sub = "& " + " & ".join("\\textbf{Ret (\\%)} & \\textbf{Sharpe}" for _ in periods) + " \\\\"
+
+        body = []
+        for strategy in self.strategies:
+            cells = " & ".join(
+                f"{fmt_num(p['period_return'] * 100, 1)} & {fmt_num(p['sharpe_ratio'])}"
+                for p in self.all_results[strategy]
+            )
+            body += [f"{strategy} & {cells} \\\\", "\\hline"]
+
+        return _table(
+            "Performance por Períodos Semestrais", "tab:semester_performance",
+            "|l|" + "r|r|" * len(periods),
+            [header_top, f"\\cline{{2-{2 * len(periods) + 1}}}", header_sub],
+            body,
+            note="\\textit{Fonte: Elaborado pelo autor.}"
+        )
+
+    def significance_tests(self):
+        tests = self.store.load_summary(self.run_hash, 'significance')
+        if not tests:
+            return None
+
+        body = []
+        for comparison, test in tests.items():
+            significant = np.nanmin([test['p_value_lw'], test['p_value_bootstrap']]) < 0.05
+            body += [
+                f"{comparison} & {fmt_num(test['sharpe_difference'], 3)} & "
+                f"[{fmt_num(test['ci95_low'], 2)}; {fmt_num(test['ci95_high'], 2)}] & "
+                f"{fmt_pvalue(test['p_value_lw'])} & {fmt_pvalue(test['p_value_bootstrap'])} & "
+                f"{'Sim' if significant else 'Não'} \\\\",
+                "\\hline",
+            ]
+
+        # Reamostragens gravadas com o resumo (ausentes em execuções anteriores)
+        draws = max((test.get('bootstrap_draws', 0) for test in tests.values()), default=0)
+        bootstrap = f"bootstrap com {draws} reamostragens" if draws else "bootstrap"
+        return _table(
+            "Testes de Significância para Diferenças de Sharpe Ratio", "tab:significance_tests",
+            "|l|r|c|r|r|c|",
+            [_bold_header('Comparação', 'Dif. Sharpe', 'IC 95\\% (Boot)', 'p-valor (LW)',
+                          'p-valor (Boot)', 'Signif. 5\\%')],
+            body,
+            note=f"\\textit{{Fonte: Elaborado pelo autor. LW = Ledoit-Wolf (2008); Boot = {bootstrap}.}}"
+        )
+
+    def transaction_costs(self):
+        costs = self.store.load_summary(self.run_hash, 'transaction_costs')
+        if not costs:
+            return None
+
+        scenarios = sorted(
+            int(metric[len('sharpe_'):-len('bps')])
+            for metric in next(iter(costs.values())) if metric.startswith('sharpe_')
+        )
+        body = []
+        for strategy, values in costs.items():
+            sharpes = [values[f'sharpe_{bps}bps'] for bps in scenarios]
+            cells = " & ".join(fmt_num(sharpe, 3) for sharpe in sharpes)
+            body += [f"{strategy} & {fmt_pct(values['avg_turnover'])} & {cells} \\\\", "\\hline"]
+
+        return _table(
+            "Impacto dos Custos de Transação no Sharpe Ratio", "tab:transaction_costs",
+            "|l|r|" + "r|" * len(scenarios),
+            [_bold_header('Estratégia', 'Turnover', *[f'{bps} bps' for bps in scenarios]),
+             _bold_header('', 'Médio', *['' for _ in scenarios])],
+            body,
+            note="\\textit{Fonte: Elaborado pelo autor. Custos aplicados no início de cada período de rebalanceamento.}"
+        )
+
+    TABLES = ['portfolio_performance', 'portfolio_weights', 'monthly_returns',
+              'semester_performance', 'significance_tests', 'transaction_costs']
+
+    def export(self, output_dir=None, tables=None):
+        """
+        Grava os fragmentos cujo conteúdo mudou
+
+        Retorna {'written': [...], 'unchanged': [...], 'missing': [...]}.
+        """
+        if output_dir is None:
+            output_dir = default_tables_dir()
+        os.makedirs(output_dir, exist_ok=True)
+
+        summary = {'written': [], 'unchanged': [], 'missing': []}
+        for name in (tables or self.TABLES):
+            content = getattr(self, name)()
+            if content is None:
+                summary['missing'].append(name)  # Resultados ainda não armazenados
+                continue
+
+            path = os.path.join(output_dir, f"{name}.tex")
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    if f.read() == content:
+                        summary['unchanged'].append(name)
+                        continue
+
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            summary['written'].append(name)
+            print(f"OK tables/{name}.tex")
+
+        print(f"Tabelas atualizadas: {len(summary['written'])} | "
+              f"inalteradas: {len(summary['unchanged'])} (run {self.run_hash[:12]})")
+        return summary
+
+
+def main():
+    """
+    Exporta as tabelas da execução mais recente
+    """
+    print("=== GERANDO TABELAS LATEX A PARTIR DOS RESULTADOS ===")
+    exporter = LatexTableExporter(ResultsStore())
+    return exporter.export()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Simulação de Monte Carlo dos Resultados das Estratégias
+Distribuições de riqueza terminal, drawdown máximo e Sharpe de cada
+estratégia, em vez de apenas a trajetória observada em 2018-2019.
+
+Os retornos mensais dos ativos são simulados a partir dos parâmetros de
+estimate_parameters (normal ou t multivariada via Cholesky de Σ) e as
+carteiras são rebalanceadas mensalmente para os pesos de cada estratégia.
+
+A simulação roda em blocos de trajetórias cujo tamanho é derivado de um teto
+de memória; de cada bloco só restam histogramas (escalas fixas) e contagens
+exatas de excedência, somados entre blocos e entre processos. Assim milhões
+de trajetórias são avaliadas sem materializar o tensor completo.
+
+    python monte_carlo.py --paths 1000000 --horizon 24 --workers 4
+"""
+
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profiling import annotate, profiled
+
+# Escalas fixas dos histogramas (valores fora são acumulados nas classes extremas)
+HISTOGRAM_RANGES = {
+    'terminal_wealth': (-7.0, 7.0),   # em log da riqueza terminal
+    'max_drawdown': (0.0, 1.0),
+    'sharpe': (-10.0, 10.0)
+}
+HISTOGRAM_BINS = 20000
+QUANTILES = (0.01, 0.05, 0.25, 0.50, 0.75, 0.95, 0.99)
+
+# Limiares de excedência contados exatamente: métrica -> (limiar, sentido)
+DEFAULT_THRESHOLDS = {
+    'loss': ('terminal_wealth', 1.0, 'below'),
+    'wealth_above_cdi': ('terminal_wealth', None, 'above'),  # preenchido com o CDI do horizonte
+    'drawdown_10pct': ('max_drawdown', 0.10, 'above'),
+    'drawdown_20pct': ('max_drawdown', 0.20, 'above'),
+    'drawdown_30pct': ('max_drawdown', 0.30, 'above'),
+    'sharpe_negative': ('sharpe', 0.0, 'below')
+}
+
+
+def _to_histogram_scale(metric, values):
+    return np.log(np.maximum(values, 1e-300)) if metric == 'terminal_wealth' else values
+
+
+def _simulate_chunk(task):
+    """
+    Simula um bloco de trajetórias (executado no processo principal ou no pool)
+
+    Retorna histogramas, somas (média/desvio) e contagens de excedência por
+    estratégia; nenhuma trajetória sobrevive ao bloco.
+    """
+    (seed, n_paths, mean, chol, weights, horizon, risk_free_rate,
+     distribution, tail_df, thresholds) = task
+    rng = np.random.default_rng(seed)
+    n_assets = len(mean)
+
+    shocks = rng.standard_normal((n_paths, horizon, n_assets)) @ chol.T
+    if distribution == 'student_t':
+        # t multivariada: mesmo fator de escala para todos os ativos do mês
+        scale = np.sqrt(rng.chisquare(tail_df, (n_paths, horizon, 1)) / (tail_df - 2))
+        shocks /= scale
+    shocks += mean
+
+    # Retornos simples das carteiras rebalanceadas mensalmente
+    np.expm1(shocks, out=shocks)
+    portfolio_returns = shocks @ weights.T                       # (trajetórias, meses, estratégias)
+    del shocks
+
+    wealth = np.cumprod(1.0 + portfolio_returns, axis=1)
+    peak = np.maximum(np.maximum.accumulate(wealth, axis=1), 1.0)
+    max_drawdown = np.max(1.0 - wealth / peak, axis=1)
+
+    excess = portfolio_returns - risk_free_rate / 12
+    volatility = excess.std(axis=1, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, excess.mean(axis=1) / volatility * np.sqrt(12), 0.0)
+
+    metrics = {'terminal_wealth': wealth[:, -1, :], 'max_drawdown': max_drawdown, 'sharpe': sharpe}
+    result = {'n_paths': n_paths, 'histograms': {}, 'sums': {}, 'exceedances': {}}
+    for metric, values in metrics.items():
+        low, high = HISTOGRAM_RANGES[metric]
+        scaled = np.clip(_to_histogram_scale(metric, values), low, high)
+        bins = np.minimum(((scaled - low) / (high - low) * HISTOGRAM_BINS).astype(np.int64),
+                          HISTOGRAM_BINS - 1)
+        histogram = np.zeros((values.shape[1], HISTOGRAM_BINS), dtype=np.int64)
+        for j in range(values.shape[1]):
+            histogram[j] = np.bincount(bins[:, j], minlength=HISTOGRAM_BINS)
+        result['histograms'][metric] = histogram
+        result['sums'][metric] = (values.sum(axis=0), (values ** 2).sum(axis=0))
+
+    for name, (metric, threshold, direction) in thresholds.items():
+        values = metrics[metric]
+        hits = values < threshold if direction == 'below' else values > threshold
+        result['exceedances'][name] = hits.sum(axis=0)
+    return result
+
+
+class MonteCarloSimulator:
+    """
+    Simulação prospectiva das estratégias com memória limitada
+    """
+
+    def __init__(self, parameters, strategy_weights, risk_free_rate, horizon_months=24,
+                 distribution='normal', tail_df=5, memory_limit_mb=256, seed=42):
+        self.assets = list(parameters['expected_returns'].index)
+        self.strategies = list(strategy_weights)
+        self.weights = np.array([pd.Series(strategy_weights[s]).reindex(self.assets).fillna(0.0).values
+                                 for s in self.strategies])
+
+        # Parâmetros anualizados -> mensais (log-retornos, como no loader)
+        self.mean = parameters['expected_returns'].values / 12
+        cov = parameters['cov_matrix'].values / 12
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        if eigenvalues.min() <= 0:
+            # Σ amostral singular (N > observações): projeta no cone semidefinido
+            cov = (eigenvectors * np.maximum(eigenvalues, 1e-12)) @ eigenvectors.T
+        self.chol = np.linalg.cholesky(cov)
+
+        self.risk_free_rate = risk_free_rate
+        self.horizon_months = horizon_months
+        self.distribution = distribution
+        self.tail_df = tail_df
+        self.memory_limit_mb = memory_limit_mb
+        self.seed = seed
+
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        cdi_wealth = (1 + risk_free_rate) ** (horizon_months / 12)
+        self.thresholds['wealth_above_cdi'] = ('terminal_wealth', cdi_wealth, 'above')
+
+    def chunk_size(self):
+        """
+        Trajetórias por bloco para respeitar o teto de memória
+
+        Por trajetória: choques (meses x ativos) + temporários do produto e
+        cerca de seis matrizes (meses x estratégias).
+        """
+        n_assets, n_strategies = len(self.assets), len(self.strategies)
+        bytes_per_path = 8 * self.horizon_months * (2 * n_assets + 6 * n_strategies)
+        histogram_bytes = 8 * 3 * n_strategies * HISTOGRAM_BINS * 2
+        available = self.memory_limit_mb * 1024 ** 2 - histogram_bytes
+        return max(1, int(available // bytes_per_path))
+
+    def _tasks(self, n_paths):
+        chunk = self.chunk_size()
+        n_chunks = -(-n_paths // chunk)
+        # Sementes independentes por bloco: resultado não depende do número de processos
+        seeds = np.random.SeedSequence(self.seed).spawn(n_chunks)
+        for i, seed in enumerate(seeds):
+            size = min(chunk, n_paths - i * chunk)
+            yield (seed, size, self.mean, self.chol, self.weights, self.horizon_months,
+                   self.risk_free_rate, self.distribution, self.tail_df, self.thresholds)
+
+    @profiled('monte_carlo')
+    def run(self, n_paths=1_000_000, workers=1):
+        """
+        Simula n_paths trajetórias; workers > 1 distribui os blocos em processos
+
+        Com workers > 1 cada processo ocupa até memory_limit_mb.
+        """
+        tasks = self._tasks(n_paths)
+        if workers is None or workers <= 1:
+            results = map(_simulate_chunk, tasks)
+            total = self._reduce(results)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                total = self._reduce(pool.map(_simulate_chunk, tasks))
+
+        annotate(paths=n_paths, chunk_size=self.chunk_size())
+        self.totals = total
+        return self.summary()
+
+    def _reduce(self, results):
+        total = None
+        for result in results:
+            if total is None:
+                total = result
+                continue
+            total['n_paths'] += result['n_paths']
+            for metric in total['histograms']:
+                total['histograms'][metric] += result['histograms'][metric]
+                total['sums'][metric] = tuple(a + b for a, b in zip(total['sums'][metric],
+                                                                    result['sums'][metric]))
+            for name in total['exceedances']:
+                total['exceedances'][name] += result['exceedances'][name]
+        return total
+
+    def quantile(self, metric, q):
+        """
+        Quantis por estratégia a partir do histograma (interpolação dentro da classe)
+        """
+        low, high = HISTOGRAM_RANGES[metric]
+        histogram = self.totals['histograms'][metric]
+        cumulative = np.cumsum(histogram, axis=1) / self.totals['n_paths']
+        width = (high - low) / HISTOGRAM_BINS
+        values = []
+        for j in range(len(self.strategies)):
+            k = int(np.searchsorted(cumulative[j], q))
+            k = min(k, HISTOGRAM_BINS - 1)
+            previous = cumulative[j, k - 1] if k > 0 else 0.0
+            fraction = (q - previous) / (cumulative[j, k] - previous) if cumulative[j, k] > previous else 0.5
+            values.append(low + (k + fraction) * width)
+        values = np.array(values)
+        return np.exp(values) if metric == 'terminal_wealth' else values
+
+    def summary(self):
+        """
+        Tabela por estratégia: média, desvio, quantis e probabilidades de excedência
+        """
+        n_paths = self.totals['n_paths']
+        summary = {strategy: {} for strategy in self.strategies}
+        for metric in HISTOGRAM_RANGES:
+            total, total_sq = self.totals['sums'][metric]
+            mean = total / n_paths
+            std = np.sqrt(np.maximum(total_sq / n_paths - mean ** 2, 0.0))
+            quantiles = {q: self.quantile(metric, q) for q in QUANTILES}
+            for j, strategy in enumerate(self.strategies):
+                summary[strategy][f'{metric}_mean'] = mean[j]
+                summary[strategy][f'{metric}_std'] = std[j]
+                for q, values in quantiles.items():
+                    summary[strategy][f'{metric}_p{int(round(q * 100)):02d}'] = values[j]
+        for name, counts in self.totals['exceedances'].items():
+            for j, strategy in enumerate(self.strategies):
+                summary[strategy][f'prob_{name}'] = counts[j] / n_paths
+        return summary
+
+
+def simulate_stored_run(store, run_hash=None, n_paths=1_000_000, horizon_months=24, workers=1,
+                        distribution='normal', memory_limit_mb=256):
+    """
+    Simula a partir de uma execução armazenada: parâmetros da última janela de
+    estimação e pesos do último rebalanceamento de cada estratégia
+    """
+    from final_methodology import FinalMethodologyAnalyzer
+
+    run_hash = run_hash or store.latest_run()
+    config = store.load_config(run_hash)
+    all_results, _, _ = store.load_run(run_hash)
+    returns = store.load_panel(run_hash, 'returns')
+
+    last_rebalance = pd.Timestamp(config['rebalancing_dates'][-2])
+    window_start = last_rebalance - pd.Timedelta(days=config['estimation_window_days'] + 1)
+    estimation_data = returns[(returns.index >= window_start) & (returns.index < last_rebalance)]
+
+    analyzer = FinalMethodologyAnalyzer()
+    parameters = analyzer.estimate_parameters(estimation_data)
+    strategy_weights = {strategy: periods[-1]['weights'] for strategy, periods in all_results.items()}
+
+    simulator = MonteCarloSimulator(parameters, strategy_weights, config['risk_free_rate'],
+                                    horizon_months=horizon_months, distribution=distribution,
+                                    memory_limit_mb=memory_limit_mb)
+    summary = simulator.run(n_paths, workers=workers)
+    store.save_summary(run_hash, 'monte_carlo', summary)
+    return simulator, summary
+
+
+def main(argv=None):
+    from results_store import ResultsStore
+
+    parser = argparse.ArgumentParser(description="Simulação de Monte Carlo das estratégias")
+    parser.add_argument('--paths', type=int, default=1_000_000)
+    parser.add_argument('--horizon', type=int, default=24, help="Horizonte em meses")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--distribution', choices=['normal', 'student_t'], default='normal')
+    parser.add_argument('--memory-mb', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    store = ResultsStore()
+    if store.latest_run() is None:
+        print("ERRO: Nenhuma execução armazenada. Execute final_methodology.py primeiro.")
+        return None
+
+    simulator, summary = simulate_stored_run(
+        store, n_paths=args.paths, horizon_months=args.horizon, workers=args.workers,
+        distribution=args.distribution, memory_limit_mb=args.memory_mb)
+
+    print(f"\n=== MONTE CARLO: {args.paths:,} trajetórias, {args.horizon} meses ===")
+    table = pd.DataFrame(summary).T
+    columns = ['terminal_wealth_p05', 'terminal_wealth_p50', 'terminal_wealth_p95',
+               'max_drawdown_p50', 'max_drawdown_p95', 'sharpe_p50',
+               'prob_loss', 'prob_wealth_above_cdi', 'prob_drawdown_20pct']
+    print(table[columns].round(4).to_string())
+    return summary
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
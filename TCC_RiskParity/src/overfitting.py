@@ -0,0 +1,252 @@
+"""
+Sobreajuste de Backtest: PBO (CSCV) e Deflated Sharpe Ratio
+As varreduras de configurações escolhem a melhor carteira entre muitas
+tentativas; os testes de run_significance_tests não corrigem esse viés de
+seleção. Este módulo trabalha sobre a matriz T x K de retornos mensais em
+excesso do CDI (uma coluna por estratégia/configuração armazenada):
+
+- PBO (Bailey, Borwein, López de Prado e Zhu, 2017): os T meses são divididos
+  em S blocos; para cada combinação de S/2 blocos (dentro da amostra) e seu
+  complemento (fora da amostra), a melhor configuração dentro da amostra é
+  posicionada no ranking fora da amostra. PBO = fração de combinações em que
+  ela fica abaixo da mediana (logit <= 0).
+- Deflated Sharpe Ratio (Bailey e López de Prado, 2014): probabilidade de o
+  Sharpe superar o máximo esperado entre N tentativas sem habilidade,
+  corrigida por assimetria e curtose.
+
+As combinações são avaliadas em blocos: somas e somas de quadrados por bloco
+temporal (S x K) são combinadas por produto matricial (máscaras C x S), e cada
+combinação é avaliada junto com seu complemento (metade das máscaras). Com
+S = 16 são 6.435 produtos para 12.870 divisões, em lotes limitados por memória.
+
+    python overfitting.py --partitions 16
+"""
+
+import argparse
+import sys
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from profiling import annotate, profiled
+
+EULER_GAMMA = 0.5772156649015329
+
+
+def returns_matrix(store, run_hashes=None, strategies=None):
+    """
+    Matriz T x K de retornos mensais em excesso do CDI das execuções
+    armazenadas (colunas 'Estratégia | hash'); só meses comuns a todas
+    """
+    if run_hashes is None:
+        run_hashes = list(store.list_runs()['run_hash'])
+
+    columns = {}
+    for run_hash in run_hashes:
+        _, returns_history, _ = store.load_run(run_hash)
+        if not returns_history:
+            continue
+        dates = pd.DatetimeIndex(np.concatenate([period_data['dates'] for period_data in returns_history]))
+        months = dates.to_period('M')
+        risk_free = store.load_panel(run_hash, 'risk_free')
+        if risk_free is not None:
+            monthly_cdi = risk_free['CDI'].groupby(risk_free.index.to_period('M')).last().reindex(months).values
+        else:
+            monthly_cdi = (store.load_config(run_hash) or {}).get('risk_free_rate', 0.0) / 12
+        for strategy in returns_history[0]['returns']:
+            if strategies is not None and strategy not in strategies:
+                continue
+            returns = np.concatenate([period_data['returns'][strategy] for period_data in returns_history])
+            columns[f"{strategy} | {run_hash[:12]}"] = pd.Series(returns - monthly_cdi, index=months)
+
+    if not columns:
+        return pd.DataFrame()
+    return pd.DataFrame(columns).dropna()
+
+
+def _sharpe(sums, squares, n):
+    """
+    Sharpe por período a partir de Σr e Σr² (variância amostral, ddof=1);
+    variância nula vira -inf para não ser escolhida no ranking
+    """
+    mean = sums / n
+    variance = (squares - sums * mean) / (n - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = mean / np.sqrt(variance)
+    return np.where(variance > 1e-18, sharpe, -np.inf)
+
+
+@profiled('overfitting.cscv')
+def cscv_pbo(returns, n_partitions=16, memory_limit_mb=256):
+    """
+    Probabilidade de sobreajuste do backtest por CSCV
+
+    returns: matriz T x K (DataFrame ou array). Os meses iniciais que sobram
+    da divisão em n_partitions blocos iguais são descartados.
+    Retorna um dicionário com pbo, logits, Sharpe dentro/fora da amostra da
+    configuração escolhida em cada divisão, probabilidade de Sharpe negativo
+    fora da amostra e inclinação da degradação (regressão fora ~ dentro).
+    """
+    values = np.asarray(returns, dtype=float)
+    n_obs, n_configs = values.shape
+    if n_partitions < 2 or n_partitions % 2:
+        raise ValueError("n_partitions deve ser par e >= 2")
+    block = n_obs // n_partitions
+    if block < 2:
+        raise ValueError(f"{n_obs} observações não bastam para {n_partitions} blocos (mínimo 2 por bloco)")
+    if n_configs < 2:
+        raise ValueError("CSCV requer ao menos 2 configurações")
+
+    blocks = values[n_obs - block * n_partitions:].reshape(n_partitions, block, n_configs)
+    block_sums = blocks.sum(axis=1)
+    block_squares = (blocks ** 2).sum(axis=1)
+    total_sums = block_sums.sum(axis=0)
+    total_squares = block_squares.sum(axis=0)
+    half = n_partitions // 2
+    n_half = block * half
+
+    # Combinações que contêm o bloco 0; o complemento de cada uma é a outra metade
+    combos = [(0,) + rest for rest in combinations(range(1, n_partitions), half - 1)]
+    masks = np.zeros((len(combos), n_partitions))
+    for row, combo in enumerate(combos):
+        masks[row, list(combo)] = 1.0
+
+    # Memória por combinação: ~8 matrizes 1 x K em float64
+    chunk = int(max(1, min(len(combos), memory_limit_mb * 1024 ** 2 // (8 * 8 * n_configs))))
+    logits, is_sharpe, oos_sharpe = [], [], []
+    for start in range(0, len(combos), chunk):
+        mask = masks[start:start + chunk]
+        sums_a = mask @ block_sums
+        squares_a = mask @ block_squares
+        sharpe_a = _sharpe(sums_a, squares_a, n_half)
+        sharpe_b = _sharpe(total_sums - sums_a, total_squares - squares_a, n_half)
+        rows = np.arange(len(mask))
+        for sharpe_in, sharpe_out in ((sharpe_a, sharpe_b), (sharpe_b, sharpe_a)):
+            best = np.argmax(sharpe_in, axis=1)
+            best_out = sharpe_out[rows, best]
+            # Posição relativa (1..K) fora da amostra; empates contam pela metade
+            rank = ((sharpe_out < best_out[:, None]).sum(axis=1) +
+                    0.5 * ((sharpe_out == best_out[:, None]).sum(axis=1) - 1) + 1)
+            omega = rank / (n_configs + 1)
+            logits.append(np.log(omega / (1 - omega)))
+            is_sharpe.append(sharpe_in[rows, best])
+            oos_sharpe.append(best_out)
+
+    logits = np.concatenate(logits)
+    is_sharpe = np.concatenate(is_sharpe) * np.sqrt(12)
+    oos_sharpe = np.concatenate(oos_sharpe) * np.sqrt(12)
+    finite = np.isfinite(is_sharpe) & np.isfinite(oos_sharpe)
+    slope = (np.polyfit(is_sharpe[finite], oos_sharpe[finite], 1)[0]
+             if finite.sum() > 1 and np.ptp(is_sharpe[finite]) > 0 else np.nan)
+    annotate(configs=n_configs, splits=len(logits), chunk_size=chunk)
+
+    return {
+        'pbo': float(np.mean(logits <= 0)),
+        'n_partitions': n_partitions,
+        'n_splits': len(logits),
+        'n_configs': n_configs,
+        'n_observations': block * n_partitions,
+        'logits': logits,
+        'is_sharpe': is_sharpe,
+        'oos_sharpe': oos_sharpe,
+        'prob_oos_loss': float(np.mean(oos_sharpe < 0)),
+        'degradation_slope': slope
+    }
+
+
+def expected_max_sharpe(sharpe_variance, n_trials):
+    """
+    Máximo esperado de n_trials Sharpe ratios sem habilidade (por período)
+    """
+    if n_trials < 2 or not sharpe_variance > 0:
+        return 0.0
+    return np.sqrt(sharpe_variance) * (
+        (1 - EULER_GAMMA) * stats.norm.ppf(1 - 1 / n_trials) +
+        EULER_GAMMA * stats.norm.ppf(1 - 1 / (n_trials * np.e))
+    )
+
+
+@profiled('overfitting.dsr')
+def deflated_sharpe(returns, n_trials=None):
+    """
+    Deflated Sharpe Ratio de cada coluna da matriz T x K
+
+    n_trials: número de configurações testadas (padrão: K). Retorna um
+    DataFrame com Sharpe anualizado, PSR (referência 0) e DSR (referência =
+    máximo esperado entre n_trials), além do máximo esperado anualizado.
+    """
+    frame = pd.DataFrame(returns)
+    values = frame.to_numpy(dtype=float)
+    n_obs = len(values)
+    n_trials = n_trials or values.shape[1]
+
+    std = values.std(axis=0, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, values.mean(axis=0) / std, np.nan)
+    skewness = stats.skew(values, axis=0)
+    kurtosis = stats.kurtosis(values, axis=0, fisher=False)
+    benchmark = expected_max_sharpe(np.nanvar(sharpe, ddof=1) if np.isfinite(sharpe).sum() > 1 else 0.0,
+                                    n_trials)
+
+    def probabilistic(reference):
+        denominator = np.sqrt(np.maximum(1 - skewness * sharpe + (kurtosis - 1) / 4 * sharpe ** 2, 1e-12))
+        return stats.norm.cdf((sharpe - reference) * np.sqrt(n_obs - 1) / denominator)
+
+    table = pd.DataFrame({
+        'sharpe_ratio': sharpe * np.sqrt(12),
+        'skewness': skewness,
+        'kurtosis': kurtosis,
+        'psr': probabilistic(0.0),
+        'dsr': probabilistic(benchmark)
+    }, index=frame.columns)
+    return {'table': table, 'expected_max_sharpe': benchmark * np.sqrt(12), 'n_trials': n_trials}
+
+
+def max_partitions(n_obs, n_partitions=16):
+    """
+    Maior número par de blocos <= n_partitions com ao menos 2 meses por bloco
+    """
+    return max(2, min(n_partitions, n_obs // 2) // 2 * 2)
+
+
+def print_report(pbo, deflated):
+    print(f"\n=== SOBREAJUSTE DO BACKTEST ({pbo['n_configs']} configurações, "
+          f"{pbo['n_observations']} meses) ===")
+    print(f"PBO (CSCV, S={pbo['n_partitions']}, {pbo['n_splits']} divisões): {pbo['pbo']:.1%}")
+    print(f"P(Sharpe fora da amostra < 0): {pbo['prob_oos_loss']:.1%} | "
+          f"Degradação (inclinação fora ~ dentro): {pbo['degradation_slope']:.3f}")
+    print(f"Sharpe máximo esperado sem habilidade ({deflated['n_trials']} tentativas): "
+          f"{deflated['expected_max_sharpe']:.3f}")
+    table = deflated['table'].sort_values('sharpe_ratio', ascending=False)
+    print(table.head(10).round(4).to_string())
+
+
+def main(argv=None):
+    from results_store import ResultsStore
+
+    parser = argparse.ArgumentParser(description="PBO (CSCV) e Deflated Sharpe das execuções armazenadas")
+    parser.add_argument('--runs', nargs='+', help="Hashes das execuções (padrão: todas)")
+    parser.add_argument('--strategies', nargs='+')
+    parser.add_argument('--partitions', type=int, default=16)
+    parser.add_argument('--memory-mb', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    store = ResultsStore()
+    runs = store.list_runs()['run_hash']
+    run_hashes = [run for run in runs if any(run.startswith(prefix) for prefix in args.runs)] \
+        if args.runs else list(runs)
+    matrix = returns_matrix(store, run_hashes, args.strategies)
+    if matrix.shape[1] < 2:
+        print("ERRO: São necessárias ao menos 2 configurações armazenadas")
+        return None
+
+    pbo = cscv_pbo(matrix, max_partitions(len(matrix), args.partitions), args.memory_mb)
+    deflated = deflated_sharpe(matrix)
+    print_report(pbo, deflated)
+    return pbo, deflated
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,248 @@
+"""
+Instrumentação por Etapa (tempo, iterações, memória)
+Cada etapa do pipeline (leitura da planilha, extração, reamostragem, estimação,
+chamadas de solver, métricas, testes e gráficos) é registrada como um evento
+com início, duração e metadados. Os eventos podem ser exportados em JSON
+estruturado ou no formato Chrome trace (chrome://tracing, Perfetto).
+
+Desativado por padrão: com o profiler inativo cada etapa custa apenas uma
+chamada de função. Ativação via código (enable_profiling) ou variáveis de ambiente:
+- TCC_PROFILE=1                  ativa a coleta
+- TCC_PROFILE_CPROFILE=etapa,... cProfile nas etapas listadas ('*' = todas)
+- TCC_PROFILE_TRACEMALLOC=1      pico de memória (tracemalloc) por etapa
+- TCC_PROFILE_DIR=caminho        diretório de saída (padrão: results/profile)
+"""
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    """
+    Coletor de eventos por etapa
+    """
+
+    def __init__(self, enabled=True, cprofile_stages=(), track_memory=False, output_dir=None):
+        self.enabled = enabled
+        self.cprofile_stages = set(cprofile_stages)
+        self.track_memory = track_memory
+        if output_dir is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            output_dir = os.path.join(current_dir, "..", "results", "profile")
+        self.output_dir = output_dir
+
+        self.events = []
+        self._cprofiles = {}
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, **meta):
+        """
+        Mede uma etapa; o dicionário retornado aceita metadados adicionais
+        (ex.: info['iterations'] = 12)
+        """
+        if not self.enabled:
+            yield meta
+            return
+
+        stack = self._stack()
+        info = dict(meta)
+        stack.append(info)
+
+        profiler = None
+        if '*' in self.cprofile_stages or name in self.cprofile_stages:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+
+        start_wall = time.time_ns()
+        start = time.perf_counter_ns()
+        try:
+            yield info
+        finally:
+            duration = time.perf_counter_ns() - start
+            if profiler is not None:
+                profiler.disable()
+                self._cprofiles.setdefault(name, []).append(profiler)
+            stack.pop()
+            if self.track_memory:
+                # Etapas internas reiniciam o pico; o maior pico delas é propagado para a externa
+                peak = max(tracemalloc.get_traced_memory()[1], info.pop('_child_peak', 0))
+                info['peak_memory_kb'] = (peak - memory_start) / 1024
+                if stack:
+                    stack[-1]['_child_peak'] = max(stack[-1].get('_child_peak', 0), peak)
+            self.add_event(name, start_wall // 1000, duration / 1000, depth=len(stack), **info)
+
+    def add_event(self, name, ts_us, dur_us, pid=None, tid=None, depth=0, **meta):
+        """
+        Registra um evento já medido (ex.: vindo de um processo do pool)
+        """
+        if not self.enabled:
+            return
+        self.events.append({
+            'name': name,
+            'ts_us': ts_us,
+            'dur_us': dur_us,
+            'pid': pid if pid is not None else os.getpid(),
+            'tid': tid if tid is not None else threading.get_ident(),
+            'depth': depth,
+            'meta': meta
+        })
+
+    def annotate(self, **meta):
+        """
+        Adiciona metadados à etapa em andamento mais interna
+        """
+        if self.enabled and self._stack():
+            self._stack()[-1].update(meta)
+
+    def summary(self):
+        """
+        Agregado por etapa: chamadas, tempo total/médio/máximo (ms) e iterações
+        """
+        summary = {}
+        for event in self.events:
+            entry = summary.setdefault(event['name'], {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                       'iterations': 0})
+            duration_ms = event['dur_us'] / 1000
+            entry['calls'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['iterations'] += event['meta'].get('iterations', 0)
+        for entry in summary.values():
+            entry['mean_ms'] = entry['total_ms'] / entry['calls']
+        return summary
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"\n{'Etapa':<28} {'Chamadas':>8} {'Total (ms)':>12} {'Média (ms)':>12} {'Iterações':>10}")
+        print("-" * 74)
+        for name, entry in sorted(summary.items(), key=lambda item: -item[1]['total_ms']):
+            print(f"{name:<28} {entry['calls']:>8} {entry['total_ms']:>12.1f} "
+                  f"{entry['mean_ms']:>12.2f} {entry['iterations']:>10}")
+
+    def cprofile_report(self, name, top=20):
+        """
+        Texto com as funções mais custosas de uma etapa perfilada com cProfile
+        """
+        if name not in self._cprofiles:
+            return ""
+        stream = io.StringIO()
+        stats = pstats.Stats(*self._cprofiles[name], stream=stream)
+        stats.sort_stats('cumulative').print_stats(top)
+        return stream.getvalue()
+
+    def export_json(self, path=None):
+        path = path or os.path.join(self.output_dir, "stage_timings.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'events': self.events}, f, indent=2, default=str)
+        return path
+
+    def export_chrome_trace(self, path=None):
+        """
+        Formato Trace Event (eventos completos 'X'), aberto em chrome://tracing ou Perfetto
+        """
+        path = path or os.path.join(self.output_dir, "stage_trace.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        trace_events = [
+            {'name': event['name'], 'ph': 'X', 'ts': event['ts_us'], 'dur': event['dur_us'],
+             'pid': event['pid'], 'tid': event['tid'], 'args': event['meta']}
+            for event in self.events
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f, default=str)
+        return path
+
+    def export_cprofile(self):
+        """
+        Grava um .prof por etapa perfilada (abrir com snakeviz ou pstats)
+        """
+        paths = []
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name, profiles in self._cprofiles.items():
+            path = os.path.join(self.output_dir, f"{name}.prof")
+            pstats.Stats(*profiles).dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def export_all(self):
+        paths = [self.export_json(), self.export_chrome_trace()] + self.export_cprofile()
+        print(f"Perfil de execução salvo em: {self.output_dir}")
+        return paths
+
+
+# Profiler ativo do processo (inativo por padrão)
+_active_profiler = StageProfiler(enabled=False)
+
+
+def get_profiler():
+    return _active_profiler
+
+
+def set_profiler(profiler):
+    global _active_profiler
+    _active_profiler = profiler
+    return profiler
+
+
+def enable_profiling(cprofile_stages=(), track_memory=False, output_dir=None):
+    return set_profiler(StageProfiler(enabled=True, cprofile_stages=cprofile_stages,
+                                      track_memory=track_memory, output_dir=output_dir))
+
+
+def configure_from_env():
+    """
+    Ativa o profiler conforme as variáveis TCC_PROFILE*
+    """
+    if os.environ.get('TCC_PROFILE', '0') in ('', '0', 'false', 'False'):
+        return get_profiler()
+    stages = [s.strip() for s in os.environ.get('TCC_PROFILE_CPROFILE', '').split(',') if s.strip()]
+    return enable_profiling(
+        cprofile_stages=stages,
+        track_memory=os.environ.get('TCC_PROFILE_TRACEMALLOC', '0') not in ('', '0'),
+        output_dir=os.environ.get('TCC_PROFILE_DIR') or None
+    )
+
+
+def stage(name, **meta):
+    """
+    Context manager da etapa no profiler ativo
+    """
+    return _active_profiler.stage(name, **meta)
+
+
+def annotate(**meta):
+    _active_profiler.annotate(**meta)
+
+
+def profiled(name):
+    """
+    Decorador: registra cada chamada da função como uma etapa
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _active_profiler.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,372 @@
+"""
+Armazenamento Persistente dos Resultados de Backtest
+Registra cada execução da metodologia em um banco SQLite local:
+hash da configuração, pesos por rebalanceamento, retornos, turnover e métricas
+
+Uma configuração idêntica já executada é lida do banco (cache hit) em vez de
+ser recalculada, e milhares de execuções podem ser consultadas sem reexecução.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+def config_hash(config):
+    """
+    Hash estável (SHA-256) de um dicionário de configuração
+    """
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultsStore:
+    """
+    Banco SQLite com os resultados de cada execução, indexados pelo hash da configuração
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_hash TEXT PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            config_json TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS period_metrics (
+            run_hash TEXT NOT NULL,
+            period_idx INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            value REAL
+        );
+        CREATE TABLE IF NOT EXISTS weights (
+            run_hash TEXT NOT NULL,
+            period_idx INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            asset TEXT NOT NULL,
+            weight REAL
+        );
+        CREATE TABLE IF NOT EXISTS returns (
+            run_hash TEXT NOT NULL,
+            period_idx INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            obs_idx INTEGER NOT NULL,
+            date TEXT,
+            value REAL
+        );
+        CREATE TABLE IF NOT EXISTS turnover (
+            run_hash TEXT NOT NULL,
+            period_idx INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            turnover REAL
+        );
+        CREATE TABLE IF NOT EXISTS summary_metrics (
+            run_hash TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            label TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            value REAL
+        );
+        CREATE TABLE IF NOT EXISTS panels (
+            run_hash TEXT NOT NULL,
+            name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            asset TEXT NOT NULL,
+            value REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_period_metrics_run ON period_metrics (run_hash);
+        CREATE INDEX IF NOT EXISTS idx_weights_run ON weights (run_hash);
+        CREATE INDEX IF NOT EXISTS idx_returns_run ON returns (run_hash);
+        CREATE INDEX IF NOT EXISTS idx_turnover_run ON turnover (run_hash);
+        CREATE INDEX IF NOT EXISTS idx_summary_run ON summary_metrics (run_hash, scope);
+        CREATE INDEX IF NOT EXISTS idx_panels_run ON panels (run_hash, name);
+    """
+
+    PERIOD_TABLES = ['period_metrics', 'weights', 'returns', 'turnover']
+    RUN_TABLES = PERIOD_TABLES + ['summary_metrics', 'panels', 'runs']
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            db_path = os.path.join(current_dir, "..", "results", "backtest_results.sqlite")
+        self.db_path = db_path
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        # Espera pelo lock de escrita: processos da varredura gravam no mesmo banco
+        self.conn = sqlite3.connect(self.db_path, timeout=60)
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def has_run(self, run_hash):
+        """
+        Verifica se a configuração já foi executada e armazenada
+        """
+        row = self.conn.execute(
+            "SELECT 1 FROM runs WHERE run_hash = ?", (run_hash,)
+        ).fetchone()
+        return row is not None
+
+    def save_run(self, run_hash, config, all_results, portfolio_returns_history, turnover_history):
+        """
+        Grava uma execução completa (substitui registros anteriores do mesmo hash)
+        """
+        rows = self._period_rows(run_hash, all_results, portfolio_returns_history, turnover_history)
+        with self.conn:
+            self._delete_run(run_hash)
+            self.conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?)",
+                (run_hash, datetime.now().isoformat(timespec='seconds'),
+                 json.dumps(config, sort_keys=True, default=str))
+            )
+            self._insert_period_rows(rows)
+
+    def replace_periods(self, run_hash, first_period_idx, all_results, portfolio_returns_history,
+                        turnover_history):
+        """
+        Regrava apenas os períodos a partir de first_period_idx (atualização incremental);
+        os períodos anteriores permanecem intocados no banco
+        """
+        rows = self._period_rows(run_hash, all_results, portfolio_returns_history, turnover_history,
+                                 first_period_idx)
+        with self.conn:
+            for table in self.PERIOD_TABLES:
+                self.conn.execute(f"DELETE FROM {table} WHERE run_hash = ? AND period_idx >= ?",
+                                  (run_hash, first_period_idx))
+            self._insert_period_rows(rows)
+
+    def copy_run(self, source_hash, target_hash, config, summary_scopes=()):
+        """
+        Copia uma execução para um novo hash dentro do SQLite (sem passar pelo Python):
+        períodos, painéis e os escopos de resumo indicados
+        """
+        with self.conn:
+            self._delete_run(target_hash)
+            self.conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?)",
+                (target_hash, datetime.now().isoformat(timespec='seconds'),
+                 json.dumps(config, sort_keys=True, default=str))
+            )
+            for table in self.PERIOD_TABLES + ['panels']:
+                columns = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")][1:]
+                self.conn.execute(
+                    f"INSERT INTO {table} SELECT ?, {', '.join(columns)} FROM {table} WHERE run_hash = ?",
+                    (target_hash, source_hash)
+                )
+            for scope in summary_scopes:
+                self.conn.execute(
+                    "INSERT INTO summary_metrics SELECT ?, scope, label, metric, value FROM summary_metrics "
+                    "WHERE run_hash = ? AND scope = ?", (target_hash, source_hash, scope)
+                )
+
+    def _period_rows(self, run_hash, all_results, portfolio_returns_history, turnover_history,
+                     first_period_idx=0):
+        metric_rows = []
+        weight_rows = []
+        for strategy, period_results in all_results.items():
+            for period_idx, metrics in enumerate(period_results):
+                if period_idx < first_period_idx:
+                    continue
+                period = metrics['period']
+                for metric, value in metrics.items():
+                    if metric in ('period', 'weights'):
+                        continue
+                    metric_rows.append((run_hash, period_idx, period, strategy, metric, float(value)))
+                for asset, weight in metrics['weights'].items():
+                    weight_rows.append((run_hash, period_idx, period, strategy, asset, float(weight)))
+
+        return_rows = []
+        for period_idx, period_data in enumerate(portfolio_returns_history):
+            if period_idx < first_period_idx:
+                continue
+            dates = period_data.get('dates')
+            for strategy, values in period_data['returns'].items():
+                for obs_idx, value in enumerate(values):
+                    date = str(pd.Timestamp(dates[obs_idx]).date()) if dates is not None else None
+                    return_rows.append((run_hash, period_idx, period_data['period'],
+                                        strategy, obs_idx, date, float(value)))
+
+        turnover_rows = []
+        for period_idx, period_data in enumerate(turnover_history):
+            if period_idx < first_period_idx:
+                continue
+            for strategy, turnover in period_data['turnovers'].items():
+                turnover_rows.append((run_hash, period_idx, period_data['period'], strategy, float(turnover)))
+
+        return metric_rows, weight_rows, return_rows, turnover_rows
+
+    def _insert_period_rows(self, rows):
+        metric_rows, weight_rows, return_rows, turnover_rows = rows
+        self.conn.executemany("INSERT INTO period_metrics VALUES (?, ?, ?, ?, ?, ?)", metric_rows)
+        self.conn.executemany("INSERT INTO weights VALUES (?, ?, ?, ?, ?, ?)", weight_rows)
+        self.conn.executemany("INSERT INTO returns VALUES (?, ?, ?, ?, ?, ?, ?)", return_rows)
+        self.conn.executemany("INSERT INTO turnover VALUES (?, ?, ?, ?, ?)", turnover_rows)
+
+    def load_run(self, run_hash):
+        """
+        Reconstrói (all_results, portfolio_returns_history, turnover_history)
+        no mesmo formato produzido por FinalMethodologyAnalyzer
+        """
+        all_results = {}
+        metric_rows = self.conn.execute(
+            "SELECT period_idx, period, strategy, metric, value FROM period_metrics "
+            "WHERE run_hash = ? ORDER BY rowid", (run_hash,)
+        ).fetchall()
+        by_key = {}
+        for period_idx, period, strategy, metric, value in metric_rows:
+            entry = by_key.setdefault((strategy, period_idx), {'period': period, 'weights': {}})
+            entry[metric] = np.nan if value is None else value
+        for period_idx, period, strategy, asset, weight in self.conn.execute(
+                "SELECT period_idx, period, strategy, asset, weight FROM weights "
+                "WHERE run_hash = ? ORDER BY rowid", (run_hash,)):
+            entry = by_key.setdefault((strategy, period_idx), {'period': period, 'weights': {}})
+            entry['weights'][asset] = np.nan if weight is None else weight
+        for (strategy, period_idx), entry in by_key.items():
+            all_results.setdefault(strategy, []).append(entry)
+
+        returns_history = {}
+        for period_idx, period, strategy, date, value in self.conn.execute(
+                "SELECT period_idx, period, strategy, date, value FROM returns "
+                "WHERE run_hash = ? ORDER BY rowid", (run_hash,)):
+            entry = returns_history.setdefault(period_idx, {'period': period, 'returns': {}, 'dates': []})
+            entry['returns'].setdefault(strategy, []).append(value)
+            if len(entry['returns']) == 1 and date is not None:
+                entry['dates'].append(pd.Timestamp(date))
+        portfolio_returns_history = []
+        for period_idx in sorted(returns_history):
+            entry = returns_history[period_idx]
+            entry['returns'] = {s: np.array(v, dtype=float) for s, v in entry['returns'].items()}
+            entry['dates'] = pd.DatetimeIndex(entry['dates']) if entry['dates'] else None
+            portfolio_returns_history.append(entry)
+
+        turnover_by_period = {}
+        for period_idx, period, strategy, turnover in self.conn.execute(
+                "SELECT period_idx, period, strategy, turnover FROM turnover "
+                "WHERE run_hash = ? ORDER BY period_idx, rowid", (run_hash,)):
+            entry = turnover_by_period.setdefault(period_idx, {'period': period, 'turnovers': {}})
+            entry['turnovers'][strategy] = np.nan if turnover is None else turnover
+        turnover_history = [turnover_by_period[idx] for idx in sorted(turnover_by_period)]
+
+        return all_results, portfolio_returns_history, turnover_history
+
+    def save_summary(self, run_hash, scope, results):
+        """
+        Grava métricas agregadas no formato {rótulo: {métrica: valor}}
+        (ex.: scope='consolidated' com os resultados de consolidate_final_results)
+        """
+        rows = []
+        for label, metrics in results.items():
+            for metric, value in metrics.items():
+                try:
+                    rows.append((run_hash, scope, str(label), metric, float(value)))
+                except (TypeError, ValueError):
+                    continue  # Valores não numéricos (ex.: arrays) não são armazenados
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM summary_metrics WHERE run_hash = ? AND scope = ?", (run_hash, scope)
+            )
+            self.conn.executemany("INSERT INTO summary_metrics VALUES (?, ?, ?, ?, ?)", rows)
+
+    def load_summary(self, run_hash, scope):
+        """
+        Lê métricas agregadas gravadas por save_summary
+        """
+        results = {}
+        for label, metric, value in self.conn.execute(
+                "SELECT label, metric, value FROM summary_metrics "
+                "WHERE run_hash = ? AND scope = ? ORDER BY rowid", (run_hash, scope)):
+            results.setdefault(label, {})[metric] = np.nan if value is None else value
+        return results
+
+    def save_panel(self, run_hash, name, panel, append=False):
+        """
+        Grava um painel data x ativo (ex.: preços e retornos usados na execução);
+        append=True acrescenta apenas as linhas novas ao painel existente
+        """
+        long_panel = panel.rename_axis('date').reset_index().melt(
+            id_vars='date', var_name='asset', value_name='value'
+        )
+        rows = [
+            (run_hash, name, str(pd.Timestamp(date).date()), str(asset),
+             None if pd.isna(value) else float(value))
+            for date, asset, value in long_panel.itertuples(index=False)
+        ]
+        with self.conn:
+            if not append:
+                self.conn.execute("DELETE FROM panels WHERE run_hash = ? AND name = ?", (run_hash, name))
+            self.conn.executemany("INSERT INTO panels VALUES (?, ?, ?, ?, ?)", rows)
+
+    def load_panel(self, run_hash, name):
+        """
+        Lê um painel gravado por save_panel (None se inexistente)
+        """
+        long_panel = pd.read_sql_query(
+            "SELECT date, asset, value FROM panels WHERE run_hash = ? AND name = ? ORDER BY rowid",
+            self.conn, params=(run_hash, name)
+        )
+        if long_panel.empty:
+            return None
+        assets = list(dict.fromkeys(long_panel['asset']))
+        panel = long_panel.pivot(index='date', columns='asset', values='value')[assets]
+        panel.index = pd.to_datetime(panel.index)
+        panel.columns.name = None
+        panel.index.name = None
+        return panel.astype(float)
+
+    def load_config(self, run_hash):
+        row = self.conn.execute(
+            "SELECT config_json FROM runs WHERE run_hash = ?", (run_hash,)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def latest_run(self):
+        """
+        Hash da execução mais recente (None se o banco estiver vazio)
+        """
+        row = self.conn.execute(
+            "SELECT run_hash FROM runs ORDER BY created_at DESC, rowid DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def list_runs(self):
+        """
+        Lista todas as execuções armazenadas
+        """
+        runs = pd.read_sql_query(
+            "SELECT run_hash, created_at, config_json FROM runs ORDER BY created_at", self.conn
+        )
+        runs['config'] = runs['config_json'].apply(json.loads)
+        return runs.drop(columns='config_json')
+
+    def query_metrics(self, scope='consolidated', metric=None, strategy=None):
+        """
+        Consulta métricas agregadas de todas as execuções sem reexecutar nada
+        """
+        query = "SELECT run_hash, label AS strategy, metric, value FROM summary_metrics WHERE scope = ?"
+        params = [scope]
+        if metric is not None:
+            query += " AND metric = ?"
+            params.append(metric)
+        if strategy is not None:
+            query += " AND label = ?"
+            params.append(strategy)
+        return pd.read_sql_query(query, self.conn, params=params)
+
+    def delete_run(self, run_hash):
+        with self.conn:
+            self._delete_run(run_hash)
+
+    def _delete_run(self, run_hash):
+        for table in self.RUN_TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE run_hash = ?", (run_hash,))
@@ -0,0 +1,136 @@
+"""
+Risk Budgeting Geral (orçamentos por ativo e por setor)
+Generaliza o ERC: cada ativo recebe uma fração bᵢ do risco total
+(RCᵢ / σp = bᵢ). Orçamentos hierárquicos distribuem o risco primeiro entre
+setores (campo 'sector' de EconomaticaLoader.asset_info) e depois entre os
+ativos de cada setor: bᵢ = B_setor · bᵢ|setor, de modo que a contribuição de
+risco de cada setor é exatamente B_setor.
+
+Solver: Newton amortecido sobre o problema convexo de Spinu (2013),
+min ½ y'Σy - Σ bᵢ ln yᵢ com w = y / Σy; converge em poucas iterações e
+escala para centenas de ativos. As contribuições de risco por ativo e por
+setor de várias carteiras são calculadas em uma única passagem matricial.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+
+UNKNOWN_SECTOR = 'N/A'
+
+
+def solve_risk_budget(cov_matrix, budgets, y0=None, max_iter=100, tolerance=1e-10):
+    """
+    Pesos com contribuições de risco proporcionais a `budgets` (sem vendas a descoberto)
+
+    Retorna (pesos, y, info) — y é a solução não normalizada (útil como
+    ponto inicial de problemas vizinhos) e info traz iterações e convergência.
+    """
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+    budgets = np.asarray(budgets, dtype=float)
+    if np.any(budgets <= 0):
+        raise ValueError("Orçamentos de risco devem ser estritamente positivos")
+    budgets = budgets / budgets.sum()
+
+    y = np.array(y0, dtype=float) if y0 is not None else budgets / np.sqrt(budgets @ cov_matrix @ budgets)
+    converged = False
+    for iteration in range(1, max_iter + 1):
+        gradient = cov_matrix @ y - budgets / y
+        hessian = cov_matrix + np.diag(budgets / y ** 2)
+        step = cho_solve(cho_factor(hessian, lower=True), gradient)
+        decrement = np.sqrt(max(gradient @ step, 0.0))
+        if decrement < tolerance:
+            converged = True
+            break
+        # Passo amortecido fora da região de convergência quadrática
+        y = y - step / (1.0 + decrement) if decrement > 0.25 else y - step
+        y = np.maximum(y, 1e-12)
+
+    return y / y.sum(), y, {'iterations': iteration, 'converged': converged}
+
+
+class RiskBudgeting:
+    """
+    Risk budgeting por ativo ou hierárquico (setor -> ativo) para uma matriz Σ
+    """
+
+    def __init__(self, cov_matrix, asset_info=None):
+        self.cov_matrix = cov_matrix
+        self.assets = list(cov_matrix.index)
+        asset_info = asset_info or {}
+        self.sectors = pd.Series(
+            [asset_info.get(asset, {}).get('sector', UNKNOWN_SECTOR) for asset in self.assets],
+            index=self.assets, name='sector'
+        )
+        # Matriz indicadora ativo x setor (agregação vetorizada das contribuições)
+        self.sector_indicator = pd.get_dummies(self.sectors).astype(float)
+        self.last_info = None
+
+    def sector_budgets(self, sector_budgets=None):
+        """
+        Orçamentos por setor normalizados (padrão: iguais entre setores)
+        """
+        sectors = list(self.sector_indicator.columns)
+        if sector_budgets is None:
+            budgets = pd.Series(1.0, index=sectors)
+        else:
+            budgets = pd.Series(sector_budgets, dtype=float).reindex(sectors)
+            missing = budgets[budgets.isna()].index.tolist()
+            if missing:
+                raise ValueError(f"Setores sem orçamento: {missing}")
+        return budgets / budgets.sum()
+
+    def hierarchical_budgets(self, sector_budgets=None, asset_budgets=None):
+        """
+        bᵢ = B_setor · bᵢ|setor (padrão dentro do setor: partes iguais)
+
+        asset_budgets: pesos relativos dentro de cada setor ({ativo: valor});
+        ativos não informados recebem 1.
+        """
+        sector_budgets = self.sector_budgets(sector_budgets)
+        within = pd.Series(1.0, index=self.assets)
+        if asset_budgets is not None:
+            within.update(pd.Series(asset_budgets, dtype=float))
+        within = within / within.groupby(self.sectors).transform('sum')
+        return within * self.sectors.map(sector_budgets)
+
+    def solve(self, budgets=None, y0=None):
+        """
+        Pesos para um vetor de orçamentos por ativo (None = ERC)
+        """
+        if budgets is None:
+            budgets = pd.Series(1.0, index=self.assets)
+        budgets = pd.Series(budgets, dtype=float).reindex(self.assets)
+        if budgets.isna().any():
+            raise ValueError(f"Ativos sem orçamento: {budgets[budgets.isna()].index.tolist()}")
+        weights, _, self.last_info = solve_risk_budget(self.cov_matrix.values, budgets.values, y0=y0)
+        return pd.Series(weights, index=self.assets)
+
+    def solve_hierarchical(self, sector_budgets=None, asset_budgets=None):
+        return self.solve(self.hierarchical_budgets(sector_budgets, asset_budgets))
+
+    def report(self, weights, budgets=None):
+        """
+        Contribuições de risco (fração do risco total) por ativo e por setor
+
+        weights: Series (uma carteira) ou DataFrame (carteiras x ativos),
+        calculadas em uma única passagem: RC = W ∘ (WΣ) / diag(WΣW').
+        Com budgets, inclui o desvio de cada setor em relação ao orçamento.
+        """
+        frame = weights.to_frame().T if isinstance(weights, pd.Series) else weights
+        frame = frame.reindex(columns=self.assets).fillna(0.0)
+        w = frame.values
+        marginal = w @ self.cov_matrix.values
+        variance = np.einsum('ij,ij->i', marginal, w)
+        risk_contrib = w * marginal / variance[:, None]
+
+        asset_rc = pd.DataFrame(risk_contrib, index=frame.index, columns=self.assets)
+        sector_rc = pd.DataFrame(risk_contrib @ self.sector_indicator.values, index=frame.index,
+                                 columns=self.sector_indicator.columns)
+        report = {'assets': asset_rc, 'sectors': sector_rc, 'volatility': pd.Series(np.sqrt(variance),
+                                                                                     index=frame.index)}
+        if budgets is not None:
+            budgets = pd.Series(budgets, dtype=float).reindex(self.assets)
+            sector_budget = budgets.groupby(self.sectors).sum() / budgets.sum()
+            report['sector_deviation'] = sector_rc - sector_budget.reindex(sector_rc.columns)
+        return report
@@ -0,0 +1,122 @@
+"""
+Taxa Livre de Risco Variável no Tempo (CDI)
+Substitui a média escalar do CDI por uma série mensal lida de um arquivo
+local (ex.: exportação do SGS/BCB). A série é convertida uma única vez para
+taxas simples mensais e alinhada ao índice dos retornos; Sharpe, Sortino,
+testes de significância e custos de transação usam esse vetor alinhado.
+
+Unidades aceitas (coluna de taxa):
+    daily_pct    % ao dia (SGS 12)        -> Π(1 + r/100) - 1 no mês
+    monthly_pct  % ao mês (SGS 4391)      -> r/100
+    annual_pct   % a.a. base 252 (SGS 4389) -> (1 + média/100)^(1/12) - 1
+
+Sem arquivo, a taxa é constante: taxa anual / 12 (convenção original).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+UNITS = ('daily_pct', 'monthly_pct', 'annual_pct')
+
+
+def excess_returns(returns, risk_free_rate):
+    """
+    Retornos mensais em excesso: escalar = taxa anual (dividida por 12),
+    vetor = taxas mensais já alinhadas aos retornos
+    """
+    returns = np.asarray(returns, dtype=float)
+    if np.ndim(risk_free_rate) == 0:
+        return returns - risk_free_rate / 12
+    return returns - np.asarray(risk_free_rate, dtype=float)
+
+
+def to_number(values):
+    """
+    Texto -> número (vírgula decimal aceita); valores inválidos viram NaN
+    """
+    text = values.astype(str).str.strip()
+    if text.str.contains(',').any():
+        # Exportações do BCB usam vírgula decimal (e ponto como milhar)
+        text = text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(text, errors='coerce')
+
+
+def to_dates(values):
+    """
+    Texto -> data (dd/mm/aaaa quando há barras); valores inválidos viram NaT
+    """
+    text = values.astype(str)
+    return pd.to_datetime(values, errors='coerce', dayfirst=bool(text.str.contains('/').any()))
+
+
+class RiskFreeRate:
+    """
+    Taxa livre de risco mensal (série indexada por mês ou constante)
+    """
+
+    def __init__(self, monthly_rates=None, annual_rate=None, source=None):
+        if monthly_rates is None and annual_rate is None:
+            raise ValueError("Informe a série mensal ou a taxa anual constante")
+        self.monthly_rates = monthly_rates.sort_index() if monthly_rates is not None else None
+        self.annual_rate = annual_rate
+        self.source = source
+
+    @classmethod
+    def constant(cls, annual_rate):
+        return cls(annual_rate=annual_rate)
+
+    @classmethod
+    def from_file(cls, path, unit='daily_pct', date_column=None, rate_column=None):
+        """
+        Lê CSV (separador ';' ou ',', vírgula decimal do BCB) ou Excel;
+        padrão: primeira coluna = data, segunda = taxa
+        """
+        if unit not in UNITS:
+            raise ValueError(f"Unidade desconhecida: {unit} (use {', '.join(UNITS)})")
+        if os.path.splitext(path)[1].lower() in ('.xlsx', '.xls'):
+            raw = pd.read_excel(path)
+        else:
+            raw = pd.read_csv(path, sep=None, engine='python', dtype=str)
+        dates = to_dates(raw[date_column] if date_column else raw.iloc[:, 0])
+        rates = to_number(raw[rate_column] if rate_column else raw.iloc[:, 1])
+        series = pd.Series(rates.values, index=pd.DatetimeIndex(dates)).dropna()
+        series = series[series.index.notna()].sort_index()
+        if series.empty:
+            raise ValueError(f"Nenhuma taxa válida em {path}")
+
+        months = series.index.to_period('M')
+        if unit == 'daily_pct':
+            monthly = (1 + series / 100).groupby(months).prod() - 1
+        elif unit == 'monthly_pct':
+            monthly = series.groupby(months).last() / 100
+        else:
+            monthly = (1 + series.groupby(months).mean() / 100) ** (1 / 12) - 1
+        return cls(monthly_rates=monthly, source=path)
+
+    def monthly_for(self, dates):
+        """
+        Taxas mensais alinhadas às datas (array); meses posteriores ao fim da
+        série repetem o último valor publicado
+        """
+        dates = pd.DatetimeIndex(dates)
+        if self.monthly_rates is None:
+            return np.full(len(dates), self.annual_rate / 12)
+
+        months = dates.to_period('M')
+        covered = self.monthly_rates.reindex(
+            pd.period_range(min(months.min(), self.monthly_rates.index.min()), months.max(), freq='M')
+        ).ffill()
+        aligned = covered.reindex(months)
+        if aligned.isna().any():
+            missing = sorted({str(month) for month in months[aligned.isna().values]})
+            raise ValueError(f"Série da taxa livre de risco não cobre: {missing[:5]}")
+        return aligned.values
+
+    def describe(self):
+        if self.monthly_rates is None:
+            return f"constante {self.annual_rate:.3%} a.a."
+        start, end = self.monthly_rates.index[[0, -1]]
+        return (f"série mensal {start} a {end} ({os.path.basename(self.source or '')}), "
+                f"média {self.monthly_rates.mean() * 12:.3%} a.a.")
@@ -0,0 +1,262 @@
+"""
+Markowitz Reamostrado (Michaud) e Robusto
+O Markowitz de máximo Sharpe usa estimativas pontuais de uma janela de 24
+meses e é muito sensível a erros em μ. Duas variantes com os mesmos limites
+de peso:
+
+- Reamostrado: B reamostragens bootstrap (linhas com reposição) da janela de
+  estimação; cada uma gera (μ_b, Σ_b) e sua carteira de máximo Sharpe. A
+  carteira final é a média das B carteiras (Michaud, 1998).
+- Robusto: conjunto de incerteza em caixa para μ, com meia-largura
+  z_conf x desvio-padrão bootstrap de cada média. Com pesos não negativos o
+  pior caso é μ - δ, e a carteira é a de máximo Sharpe nesse pior caso.
+
+As B carteiras são resolvidas juntas: o máximo Sharpe com limites é
+homogeneizado (y = w/κ) em um QP convexo
+
+    min y'Σy  s.a. (μ - rf)'y = 1,  Σ yᵢ = κ,  lb·κ ≤ y ≤ ub·κ,  κ ≥ 0
+
+e os B QPs seguem o ADMM de OSQP em lote (operações numpy sobre arrays
+B x n). A matriz do passo linear de cada QP é fatorada (invertida) uma única
+vez e reaproveitada em todas as iterações. Sorteios sem ativo com retorno
+acima de rf caem no QP de mínima variância. Os blocos de sorteios podem ser
+distribuídos em processos; as sementes são fixadas por bloco, de modo que o
+resultado não depende do número de processos.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from profiling import annotate
+
+
+def batch_qp(P, q, A, lower, upper, rho=0.1, sigma=1e-6, alpha=1.6, max_iter=5000, tol=1e-7,
+             check_every=25):
+    """
+    B QPs  min ½x'Px + q'x  s.a. lower ≤ Ax ≤ upper  (ADMM de OSQP em lote)
+
+    P: (B, n, n), q: (B, n), A: (B, m, n); lower/upper: (B, m) ou (m,).
+    Linhas de igualdade (lower = upper) usam ρ 1000x maior; ρ de cada problema
+    é reajustado pela razão entre os resíduos primal e dual (como no OSQP),
+    refatorando só os problemas ajustados. Problemas convergidos saem do lote.
+    Retorna (x, info) com iterações e convergência por problema.
+    """
+    n_problems, n_vars = q.shape
+    n_rows = A.shape[1]
+    lower = np.broadcast_to(np.asarray(lower, dtype=float), (n_problems, n_rows))
+    upper = np.broadcast_to(np.asarray(upper, dtype=float), (n_problems, n_rows))
+    row_scale = np.where(lower == upper, 1e3, 1.0)
+    At = A.transpose(0, 2, 1)
+    eye = sigma * np.eye(n_vars)
+
+    def factor(idx, rho_values):
+        # K = P + σI + A' diag(ρ) A, invertida uma vez por valor de ρ
+        rho_rows = rho_values[:, None] * row_scale[idx]
+        return np.linalg.inv(P[idx] + eye + At[idx] @ (rho_rows[:, :, None] * A[idx])), rho_rows
+
+    x = np.zeros((n_problems, n_vars))
+    z = np.clip(np.zeros((n_problems, n_rows)), lower, upper)
+    y = np.zeros((n_problems, n_rows))
+    rho_values = np.full(n_problems, float(rho))
+    converged = np.zeros(n_problems, dtype=bool)
+    iterations = np.zeros(n_problems, dtype=int)
+
+    active = np.arange(n_problems)
+    K_inv, rho_rows = factor(active, rho_values)
+    xa, za, ya = x.copy(), z.copy(), y.copy()
+    Pa, qa, Aa, Ata = P, q, A, At
+    la, ua = lower, upper
+
+    for iteration in range(1, max_iter + 1):
+        rhs = sigma * xa - qa + (Ata @ (rho_rows * za - ya)[:, :, None])[:, :, 0]
+        x_tilde = (K_inv @ rhs[:, :, None])[:, :, 0]
+        z_relaxed = alpha * (Aa @ x_tilde[:, :, None])[:, :, 0] + (1 - alpha) * za
+        xa = alpha * x_tilde + (1 - alpha) * xa
+        z_new = np.clip(z_relaxed + ya / rho_rows, la, ua)
+        ya = ya + rho_rows * (z_relaxed - z_new)
+        za = z_new
+
+        if iteration % check_every and iteration != max_iter:
+            continue
+        Ax = (Aa @ xa[:, :, None])[:, :, 0]
+        Px = (Pa @ xa[:, :, None])[:, :, 0]
+        primal = np.abs(Ax - za).max(axis=1)
+        dual = np.abs(Px + qa + (Ata @ ya[:, :, None])[:, :, 0]).max(axis=1)
+        scale_primal = 1 + np.maximum(np.abs(Ax).max(axis=1), np.abs(za).max(axis=1))
+        scale_dual = 1 + np.maximum(np.abs(Px).max(axis=1), np.abs(qa).max(axis=1))
+        done = (primal <= tol * scale_primal) & (dual <= tol * scale_dual)
+
+        x[active], z[active], y[active] = xa, za, ya
+        iterations[active] = iteration
+        converged[active[done]] = True
+        keep = ~done
+        if not keep.any():
+            break
+
+        # ρ adaptativo: razão entre resíduos primal e dual normalizados
+        ratio = np.sqrt((primal / scale_primal) / np.maximum(dual / scale_dual, 1e-30))
+        retune = keep & ((ratio > 5) | (ratio < 0.2))
+        rho_values[active[retune]] = np.clip(rho_values[active[retune]] * ratio[retune], 1e-6, 1e6)
+
+        if keep.all() and not retune.any():
+            continue
+        active = active[keep]
+        xa, za, ya = x[active], z[active], y[active]
+        Pa, qa, Aa, Ata = P[active], q[active], A[active], At[active]
+        la, ua = lower[active], upper[active]
+        K_inv, rho_rows = factor(active, rho_values[active])
+
+    return x, {'iterations': int(iterations.max()), 'converged': converged}
+
+
+def max_linear_return(excess, lower, upper):
+    """
+    Máximo de e'w com Σw = 1 e lower ≤ w ≤ upper (alocação gulosa, em lote)
+    """
+    order = np.argsort(-excess, axis=1)
+    sorted_excess = np.take_along_axis(excess, order, axis=1)
+    capacity = upper - lower
+    remaining = 1 - lower * excess.shape[1]
+    filled = np.clip(remaining - capacity * np.arange(excess.shape[1]), 0, capacity)
+    return lower * excess.sum(axis=1) + sorted_excess @ filled
+
+
+def max_sharpe_batch(expected_returns, cov_matrices, risk_free_rate, weight_bounds=(0.0, 1.0), **solver_options):
+    """
+    Carteiras de máximo Sharpe com limites para B pares (μ_b, Σ_b)
+
+    expected_returns: (B, n); cov_matrices: (B, n, n), anualizados.
+    Retorna (pesos (B, n), info).
+    """
+    mu = np.atleast_2d(np.asarray(expected_returns, dtype=float))
+    cov = np.asarray(cov_matrices, dtype=float).reshape(-1, mu.shape[1], mu.shape[1])
+    n_problems, n_assets = mu.shape
+    lower, upper = weight_bounds
+    if lower < 0:
+        raise ValueError("Limite inferior negativo não suportado (pesos devem ser >= 0)")
+    if lower * n_assets > 1 or upper * n_assets < 1:
+        raise ValueError(f"Limites {weight_bounds} inviáveis para {n_assets} ativos")
+
+    excess = mu - risk_free_rate
+    weights = np.empty_like(mu)
+    iterations = 0
+    converged = np.ones(n_problems, dtype=bool)
+    tangent = max_linear_return(excess, lower, upper) > 1e-12
+
+    if tangent.any():
+        # Homogeneização: x = (y, κ), w = y / κ
+        count = int(tangent.sum())
+        eye = np.eye(n_assets)
+        P = np.zeros((count, n_assets + 1, n_assets + 1))
+        P[:, :n_assets, :n_assets] = 2 * cov[tangent]
+        A = np.zeros((count, 2 * n_assets + 3, n_assets + 1))
+        A[:, 0, :n_assets] = excess[tangent]
+        A[:, 1, :n_assets], A[:, 1, n_assets] = 1.0, -1.0
+        A[:, 2:n_assets + 2, :n_assets], A[:, 2:n_assets + 2, n_assets] = eye, -lower
+        A[:, n_assets + 2:2 * n_assets + 2, :n_assets] = eye
+        A[:, n_assets + 2:2 * n_assets + 2, n_assets] = -upper
+        A[:, -1, n_assets] = 1.0
+        row_lower = np.concatenate([[1.0, 0.0], np.zeros(n_assets), np.full(n_assets, -np.inf), [0.0]])
+        row_upper = np.concatenate([[1.0, 0.0], np.full(n_assets, np.inf), np.zeros(n_assets), [np.inf]])
+        x, info = batch_qp(P, np.zeros((count, n_assets + 1)), A, row_lower, row_upper, **solver_options)
+        weights[tangent] = x[:, :n_assets] / x[:, [n_assets]]
+        iterations = info['iterations']
+        converged[tangent] = info['converged']
+
+    if (~tangent).any():
+        # Nenhuma carteira viável supera rf: mínima variância
+        count = int((~tangent).sum())
+        A = np.concatenate([np.ones((1, n_assets)), np.eye(n_assets)])[None].repeat(count, axis=0)
+        row_lower = np.concatenate([[1.0], np.full(n_assets, lower)])
+        row_upper = np.concatenate([[1.0], np.full(n_assets, upper)])
+        x, info = batch_qp(2 * cov[~tangent], np.zeros((count, n_assets)), A, row_lower, row_upper,
+                           **solver_options)
+        weights[~tangent] = x
+        iterations = max(iterations, info['iterations'])
+        converged[~tangent] = info['converged']
+
+    weights = np.clip(weights, lower, upper)
+    weights /= weights.sum(axis=1, keepdims=True)
+    return weights, {'iterations': iterations, 'converged': int(converged.sum()),
+                     'tangent': int(tangent.sum()), 'problems': n_problems}
+
+
+def bootstrap_moments(returns, seed, n_draws, periods_per_year=12):
+    """
+    (μ_b, Σ_b) anualizados de n_draws reamostragens das linhas de returns (T x n)
+    """
+    values = np.asarray(returns, dtype=float)
+    n_obs = len(values)
+    rng = np.random.default_rng(seed)
+    samples = values[rng.integers(0, n_obs, size=(n_draws, n_obs))]
+    means = samples.mean(axis=1)
+    centered = samples - means[:, None, :]
+    covariances = np.einsum('bti,btj->bij', centered, centered) / (n_obs - 1)
+    return means * periods_per_year, covariances * periods_per_year
+
+
+def _resample_chunk(task):
+    """
+    Um bloco de sorteios: soma das carteiras de máximo Sharpe (executável em outro processo)
+    """
+    seed, n_draws, returns, risk_free_rate, weight_bounds = task
+    means, covariances = bootstrap_moments(returns, seed, n_draws)
+    weights, info = max_sharpe_batch(means, covariances, risk_free_rate, weight_bounds)
+    return weights.sum(axis=0), info
+
+
+def _draw_chunks(n_draws, n_assets, n_obs, memory_limit_mb, max_chunk=100):
+    """
+    Tamanho dos blocos de sorteios: amostras (T x n), Σ_b e matrizes do QP por
+    sorteio; no máximo max_chunk sorteios por bloco (divisão independente do
+    número de processos)
+    """
+    bytes_per_draw = 8 * (2 * n_obs * n_assets + 8 * (2 * n_assets + 3) * (n_assets + 1))
+    chunk = max(1, min(n_draws, max_chunk, int(memory_limit_mb * 1024 ** 2 // bytes_per_draw)))
+    return [min(chunk, n_draws - start) for start in range(0, n_draws, chunk)]
+
+
+def resampled_max_sharpe(returns, risk_free_rate, weight_bounds=(0.0, 1.0), n_draws=500, seed=42,
+                         workers=1, memory_limit_mb=64):
+    """
+    Markowitz reamostrado: média das carteiras de máximo Sharpe de n_draws
+    reamostragens bootstrap da janela (DataFrame T x ativos de retornos mensais)
+    """
+    values = np.asarray(returns, dtype=float)
+    sizes = _draw_chunks(n_draws, values.shape[1], len(values), memory_limit_mb)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(chunk_seed, size, values, risk_free_rate, tuple(weight_bounds))
+             for chunk_seed, size in zip(seeds, sizes)]
+
+    if workers is None or workers <= 1 or len(tasks) == 1:
+        results = list(map(_resample_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_resample_chunk, tasks))
+
+    total = sum(weight_sum for weight_sum, _ in results)
+    annotate(draws=n_draws, chunks=len(tasks),
+             converged=sum(info['converged'] for _, info in results),
+             iterations=max(info['iterations'] for _, info in results))
+    return pd.Series(total / n_draws, index=getattr(returns, 'columns', None))
+
+
+def robust_max_sharpe(returns, risk_free_rate, weight_bounds=(0.0, 1.0), confidence=0.95, n_draws=500,
+                      seed=42, periods_per_year=12):
+    """
+    Markowitz robusto: máximo Sharpe com μ no pior caso da caixa
+    μ̂ ± z_conf·dp_bootstrap(μ̂) (pesos não negativos -> μ̂ - δ)
+    """
+    values = np.asarray(returns, dtype=float)
+    rng = np.random.default_rng(seed)
+    boot_means = values[rng.integers(0, len(values), size=(n_draws, len(values)))].mean(axis=1)
+    delta = stats.norm.ppf(confidence) * boot_means.std(axis=0, ddof=1) * periods_per_year
+
+    expected_returns = values.mean(axis=0) * periods_per_year
+    cov_matrix = np.cov(values, rowvar=False, ddof=1) * periods_per_year
+    weights, info = max_sharpe_batch(expected_returns - delta, cov_matrix, risk_free_rate, weight_bounds)
+    annotate(iterations=info['iterations'], tangent=info['tangent'])
+    return pd.Series(weights[0], index=getattr(returns, 'columns', None))
@@ -0,0 +1,206 @@
+"""
+Memoização Endereçada por Conteúdo das Soluções de Cada Estratégia
+A chave é o hash (SHA-256) das matrizes de entrada (covariância, médias,
+volatilidades), dos nomes dos ativos e das configurações do solver.
+
+Dois níveis de cache:
+- Memória: LRU com número máximo de entradas
+- Disco: arquivos .npy com remoção dos menos usados ao exceder o tamanho máximo
+"""
+
+import functools
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class SolverCache:
+    """
+    Cache de pesos por (estratégia, parâmetros estimados, configurações do solver)
+    """
+
+    def __init__(self, cache_dir=None, max_memory_items=256, max_disk_bytes=256 * 1024 ** 2,
+                 use_disk=True):
+        if not use_disk:
+            cache_dir = None  # Apenas o nível em memória
+        elif cache_dir is None:
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            cache_dir = os.path.join(current_dir, "..", "results", "solver_cache")
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def make_key(self, strategy_name, arrays, settings=None):
+        """
+        Hash do conteúdo: nome da estratégia + matrizes (valores e rótulos) + configurações
+        """
+        digest = hashlib.sha256()
+        digest.update(strategy_name.encode('utf-8'))
+        for name in sorted(arrays):
+            values = arrays[name]
+            labels = list(values.index) if hasattr(values, 'index') else []
+            data = np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+            digest.update(name.encode('utf-8'))
+            digest.update(str(data.shape).encode('utf-8'))
+            digest.update(json.dumps([str(label) for label in labels]).encode('utf-8'))
+            digest.update(data.tobytes())
+        digest.update(json.dumps(settings or {}, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key, validate=None):
+        """
+        Busca na memória e depois no disco (promovendo para a memória)
+
+        validate(pesos) -> bool: entradas rejeitadas (ex.: de outro formato)
+        são descartadas dos dois níveis e contadas como falha
+        """
+        weights = None
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            weights, tier = self._memory[key], 'memory'
+        elif self.cache_dir is not None:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    weights, tier = np.load(path), 'disk'
+                except (OSError, ValueError):
+                    os.remove(path)  # Arquivo corrompido: tratar como miss
+
+        if weights is not None and validate is not None and not validate(weights):
+            self._discard(key)
+            weights = None
+        if weights is None:
+            self.misses += 1
+            return None
+
+        if tier == 'memory':
+            self.memory_hits += 1
+        else:
+            os.utime(self._disk_path(key))  # Marca como usado recentemente
+            self.disk_hits += 1
+            self._remember(key, weights)
+        return weights
+
+    def put(self, key, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        self._remember(key, weights)
+
+        if self.cache_dir is not None:
+            path = self._disk_path(key)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, weights)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+
+    def stats(self):
+        """
+        Contadores de acertos/falhas do cache
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups > 0 else 0.0,
+            'memory_items': len(self._memory),
+            'disk_bytes': self._disk_usage()[0]
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"Cache de soluções: {stats['memory_hits']} acertos (memória), "
+              f"{stats['disk_hits']} acertos (disco), {stats['misses']} falhas "
+              f"| taxa de acerto {stats['hit_rate']:.1%}")
+
+    def clear(self):
+        self._memory.clear()
+        if self.cache_dir is not None:
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith('.npy'):
+                    os.remove(entry.path)
+
+    def _discard(self, key):
+        self._memory.pop(key, None)
+        if self.cache_dir is not None and os.path.exists(self._disk_path(key)):
+            os.remove(self._disk_path(key))
+
+    def _remember(self, key, weights):
+        self._memory[key] = weights
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _disk_usage(self):
+        if self.cache_dir is None:
+            return 0, []
+        entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.npy')]
+        total = sum(entry.stat().st_size for entry in entries)
+        return total, entries
+
+    def _evict_disk(self):
+        """
+        Remove os arquivos usados há mais tempo até respeitar max_disk_bytes
+        """
+        total, entries = self._disk_usage()
+        if total <= self.max_disk_bytes:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if total <= self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+
+def memoize_strategy(strategy_name, inputs=('expected_returns', 'cov_matrix'), settings=None):
+    """
+    Decorador para métodos de estratégia no formato method(self, parameters)
+
+    Usa o SolverCache em self.solver_cache (se houver). A chave combina as
+    entradas listadas em `inputs` e o dicionário retornado por settings(self).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, parameters):
+            cache = getattr(self, 'solver_cache', None)
+            if cache is None:
+                return method(self, parameters)
+
+            arrays = {name: parameters[name] for name in inputs}
+            solver_settings = settings(self) if settings is not None else {}
+            key = cache.make_key(strategy_name, arrays, solver_settings)
+
+            asset_index = parameters[inputs[0]].index
+            # Entradas de outro formato ou com pesos não finitos são descartadas e
+            # recalculadas (put regrava o disco); soluções não finitas não são gravadas
+            def valid(weights):
+                return len(weights) == len(asset_index) and bool(np.isfinite(weights).all())
+
+            cached = cache.get(key, validate=valid)
+            if cached is not None:
+                return pd.Series(cached, index=asset_index)
+
+            weights = method(self, parameters)
+            values = weights.reindex(asset_index).values
+            if valid(values):
+                cache.put(key, values)
+            return weights
+        return wrapper
+    return decorator
@@ -0,0 +1,248 @@
+"""
+Testes de Estresse: Reprodução de Crises Históricas e Choques de Fatores
+Aplica uma biblioteca de cenários às carteiras atuais (pesos do último
+rebalanceamento ou quaisquer vetores de pesos):
+
+- Históricos: janelas datadas (mês inicial e final, inclusive); o choque de
+  cada ativo é o retorno acumulado na janela. Ativos sem cotação na janela
+  (listados depois, lacunas) recebem β·(retorno do mercado na janela), com β
+  estimado no histórico disponível, e são marcados como aproximados.
+- Fatores: choques hipotéticos em 'market' (transmitido por β), em
+  'sector:<setor>' e em 'asset:<ativo>', somados em log-retorno.
+
+Com os choques em uma matriz S x n, o P&L das K carteiras em todos os
+cenários é um único produto W·Xᵀ (K x S); a atribuição por ativo
+(wᵢ·xᵢ), por setor (matriz indicadora) e por fator (mercado x específico)
+sai das mesmas matrizes, e é comparada às contribuições de risco ex-ante
+(RCᵢ = wᵢ(Σw)ᵢ / w'Σw) quando Σ é informada.
+
+Cenários adicionais podem ser definidos na seção 'stress' da configuração
+da CLI, no mesmo formato de HISTORICAL_SCENARIOS / FACTOR_SCENARIOS.
+"""
+
+import numpy as np
+import pandas as pd
+
+from profiling import annotate, profiled
+from risk_budgeting import UNKNOWN_SECTOR
+
+# Janelas mensais (inclusive) das crises reproduzidas
+HISTORICAL_SCENARIOS = {
+    'Crise financeira global (2008)': {
+        'start': '2008-06', 'end': '2008-10',
+        'description': 'Quebra do Lehman Brothers; Ibovespa do pico de maio ao fundo de outubro'},
+    'Recessão brasileira (2015)': {
+        'start': '2015-05', 'end': '2016-01',
+        'description': 'Recessão, crise política e perda do grau de investimento'},
+    'Joesley Day (mai/2017)': {
+        'start': '2017-05', 'end': '2017-05',
+        'description': 'Divulgação das gravações da JBS; circuit breaker em 18/05/2017'},
+    'Greve dos caminhoneiros (mai/2018)': {
+        'start': '2018-05', 'end': '2018-05',
+        'description': 'Paralisação nacional do transporte rodoviário de cargas'},
+    'COVID-19 (fev-mar/2020)': {
+        'start': '2020-02', 'end': '2020-03',
+        'description': 'Pandemia; seis circuit breakers em março de 2020'},
+}
+
+# Choques hipotéticos (retornos simples) por fator
+FACTOR_SCENARIOS = {
+    'Mercado -20%': {
+        'shocks': {'market': -0.20},
+        'description': 'Queda ampla do mercado transmitida pelos betas'},
+    'Commodities -30%': {
+        'shocks': {'market': -0.05, 'sector:Petróleo e Gás': -0.30, 'sector:Mineração': -0.30},
+        'description': 'Queda de petróleo e minério com mercado estável'},
+    'Crédito doméstico': {
+        'shocks': {'market': -0.10, 'sector:Finanças e Seguros': -0.15, 'sector:Comércio': -0.15},
+        'description': 'Alta de juros e inadimplência: bancos e varejo'},
+}
+
+
+def scenario_library(extra=None):
+    """
+    Biblioteca padrão (históricos + fatores) acrescida de cenários da configuração
+    """
+    library = {**HISTORICAL_SCENARIOS, **FACTOR_SCENARIOS}
+    for name, scenario in (extra or {}).items():
+        if 'shocks' not in scenario and not {'start', 'end'} <= set(scenario):
+            raise ValueError(f"Cenário '{name}': informe start/end (histórico) ou shocks (fatores)")
+        library[name] = scenario
+    return library
+
+
+def estimate_betas(asset_returns, market_returns):
+    """
+    β de cada ativo contra o mercado (pares de meses disponíveis)
+    """
+    returns = asset_returns.to_numpy(dtype=float)
+    market = np.asarray(market_returns, dtype=float)[:, None]
+    valid = np.isfinite(returns) & np.isfinite(market)
+    counts = valid.sum(axis=0)
+    market_filled = np.where(valid, market, 0.0)
+    returns_filled = np.where(valid, returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        market_mean = market_filled.sum(axis=0) / counts
+        returns_mean = returns_filled.sum(axis=0) / counts
+        covariance = ((returns_filled - returns_mean) * (market_filled - market_mean) * valid).sum(axis=0)
+        variance = ((market_filled - market_mean) ** 2 * valid).sum(axis=0)
+        betas = np.where((counts > 2) & (variance > 0), covariance / variance, 1.0)
+    return pd.Series(betas, index=asset_returns.columns)
+
+
+class StressTester:
+    """
+    Choques de uma biblioteca de cenários aplicados a K carteiras de uma vez
+    """
+
+    def __init__(self, asset_returns, market_returns=None, asset_info=None, scenarios=None):
+        """
+        asset_returns: retornos logarítmicos mensais (NaN onde não há cotação);
+        market_returns: retornos logarítmicos do índice (None = média dos ativos)
+        """
+        self.returns = asset_returns.sort_index()
+        self.months = self.returns.index.to_period('M')
+        if market_returns is None:
+            self.market = self.returns.mean(axis=1)
+            self.market_name = 'média dos ativos'
+        else:
+            market = pd.Series(market_returns)
+            self.market = market.groupby(market.index.to_period('M')).last().reindex(self.months)
+            self.market.index = self.returns.index
+            self.market_name = market.name or 'índice'
+        self.assets = list(self.returns.columns)
+        self.betas = estimate_betas(self.returns, self.market.values)
+        asset_info = asset_info or {}
+        self.sectors = pd.Series([asset_info.get(asset, {}).get('sector', UNKNOWN_SECTOR) for asset in self.assets],
+                                 index=self.assets, name='sector')
+        self.sector_indicator = pd.get_dummies(self.sectors).astype(float)
+        self.scenarios = scenarios if scenarios is not None else scenario_library()
+
+    def _historical_shock(self, scenario):
+        """
+        Log-retornos acumulados na janela; (choques, mercado, aproximados) ou None sem dados
+        """
+        start, end = pd.Period(scenario['start'], 'M'), pd.Period(scenario['end'], 'M')
+        in_window = (self.months >= start) & (self.months <= end)
+        n_months = (end - start).n + 1
+        market_window = self.market[in_window]
+        if market_window.notna().sum() < n_months:
+            return None
+        window = self.returns[in_window]
+        complete = window.notna().sum(axis=0).values == n_months
+        market_shock = float(market_window.sum())
+        shocks = np.where(complete, window.sum(axis=0).values, self.betas.values * market_shock)
+        return shocks, market_shock, ~complete
+
+    def _factor_shock(self, scenario):
+        """
+        Log-retornos do choque de fatores; (choques, mercado, aproximados)
+        """
+        market_shock = np.log1p(scenario['shocks'].get('market', 0.0))
+        shocks = self.betas.values * market_shock
+        for factor, shock in scenario['shocks'].items():
+            kind, _, name = factor.partition(':')
+            if kind == 'sector':
+                shocks = shocks + np.log1p(shock) * (self.sectors.values == name)
+            elif kind == 'asset':
+                shocks = shocks + np.log1p(shock) * (np.array(self.assets) == name)
+            elif factor != 'market':
+                raise ValueError(f"Fator desconhecido: {factor} (use market, sector:<setor> ou asset:<ativo>)")
+        return shocks, market_shock, np.zeros(len(self.assets), dtype=bool)
+
+    def scenario_shocks(self):
+        """
+        Matriz S x n de choques (log-retornos), choques de mercado e ativos
+        aproximados por β; cenários sem dados do mercado ficam de fora
+        """
+        rows, market, proxied, skipped = {}, {}, {}, []
+        for name, scenario in self.scenarios.items():
+            shock = self._factor_shock(scenario) if 'shocks' in scenario else self._historical_shock(scenario)
+            if shock is None:
+                skipped.append(name)
+                continue
+            rows[name], market[name], proxied[name] = shock
+        return {
+            'shocks': pd.DataFrame.from_dict(rows, orient='index', columns=self.assets),
+            'market': pd.Series(market, dtype=float),
+            'proxied': pd.DataFrame.from_dict(proxied, orient='index', columns=self.assets),
+            'skipped': skipped
+        }
+
+    @profiled('stress_test')
+    def run(self, weights, cov_matrix=None):
+        """
+        P&L e atribuição de todas as carteiras em todos os cenários
+
+        weights: DataFrame K x n (carteiras x ativos) ou Series; cov_matrix:
+        Σ para as contribuições de risco ex-ante (opcional). Contribuições em
+        retorno simples: ativos somam o P&L da carteira; mercado + específico
+        também.
+        """
+        frame = weights.to_frame().T if isinstance(weights, pd.Series) else weights
+        frame = frame.reindex(columns=self.assets).fillna(0.0)
+        library = self.scenario_shocks()
+        shocks = library['shocks']
+        portfolios, scenarios = list(frame.index), list(shocks.index)
+        w = frame.to_numpy(dtype=float)
+        simple = np.expm1(shocks.to_numpy(dtype=float))
+        market_part = np.expm1(self.betas.values * library['market'].reindex(scenarios).values[:, None])
+
+        pnl = w @ simple.T  # K x S: um produto para todas as carteiras e cenários
+        contributions = np.einsum('kn,sn->ksn', w, simple)
+        market_pnl = w @ market_part.T
+        annotate(portfolios=len(portfolios), scenarios=len(scenarios), assets=len(self.assets))
+
+        index = pd.MultiIndex.from_product([portfolios, scenarios], names=['portfolio', 'scenario'])
+        asset_contrib = pd.DataFrame(contributions.reshape(-1, len(self.assets)), index=index, columns=self.assets)
+        result = {
+            'pnl': pd.DataFrame(pnl, index=portfolios, columns=scenarios),
+            'assets': asset_contrib,
+            'sectors': pd.DataFrame(asset_contrib.values @ self.sector_indicator.values, index=index,
+                                    columns=self.sector_indicator.columns),
+            'factors': pd.DataFrame({'market': market_pnl.ravel(), 'specific': (pnl - market_pnl).ravel()},
+                                    index=index),
+            'shocks': np.expm1(shocks),
+            'proxied': library['proxied'],
+            'skipped': library['skipped'],
+            'market_name': self.market_name
+        }
+
+        if cov_matrix is not None:
+            sigma = cov_matrix.reindex(index=self.assets, columns=self.assets).to_numpy(dtype=float)
+            marginal = w @ sigma
+            risk = w * marginal / np.einsum('kn,kn->k', w, marginal)[:, None]
+            result['risk_contributions'] = pd.DataFrame(risk, index=portfolios, columns=self.assets)
+            result['sector_risk_contributions'] = pd.DataFrame(risk @ self.sector_indicator.values,
+                                                               index=portfolios,
+                                                               columns=self.sector_indicator.columns)
+        return result
+
+
+def print_report(result):
+    """
+    P&L por cenário e, no pior cenário de cada carteira, a participação de
+    cada setor na perda comparada à contribuição de risco ex-ante
+    """
+    pnl = result['pnl']
+    print(f"\n=== TESTES DE ESTRESSE ({pnl.shape[0]} carteiras x {pnl.shape[1]} cenários, "
+          f"mercado: {result['market_name']}) ===")
+    for name in result['skipped']:
+        print(f"  Sem dados: {name}")
+    print(pnl.T.map(lambda value: f"{value:.1%}").to_string())
+
+    proxied = result['proxied']
+    for name in proxied.index[proxied.any(axis=1)]:
+        print(f"  {name}: aproximados por β x mercado: {', '.join(proxied.columns[proxied.loc[name]])}")
+
+    for portfolio in pnl.index:
+        worst = pnl.loc[portfolio].idxmin()
+        loss = pnl.loc[portfolio, worst]
+        sectors = result['sectors'].loc[(portfolio, worst)]
+        table = pd.DataFrame({'Participação na perda': sectors / loss if loss != 0 else np.nan})
+        if 'sector_risk_contributions' in result:
+            table['RC ex-ante'] = result['sector_risk_contributions'].loc[portfolio]
+        factors = result['factors'].loc[(portfolio, worst)]
+        print(f"\n{portfolio} - pior cenário: {worst} ({loss:.1%}; mercado {factors['market']:.1%}, "
+              f"específico {factors['specific']:.1%})")
+        print(table.sort_values('Participação na perda', ascending=False).map(lambda v: f"{v:.1%}").to_string())
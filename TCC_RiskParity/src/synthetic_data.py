@@ -0,0 +1,382 @@
+"""
+Gerador de Dados de Mercado Sintéticos
+Painéis de retornos correlacionados com estrutura realista, para testar
+escalabilidade e robustez dos solvers sem a exportação licenciada da Economatica:
+- estrutura de fatores (mercado + fatores de estilo + fator setorial)
+- caudas pesadas (choques t de Student) e volatilidade condicional GARCH(1,1)
+- troca de regimes (cadeia de Markov calmo/crise)
+- padrões de dados faltantes (abertura de capital tardia, cancelamento de
+  registro, lacunas isoladas e suspensões de negociação)
+
+A geração é vetorizada entre ativos e feita em blocos de tempo: apenas o
+bloco corrente e o estado (variância GARCH, regime, último preço) ficam em
+memória. A gravação no layout das abas da Economatica (o mesmo lido por
+EconomaticaLoader.extract_asset_data) passa por um arquivo mapeado em disco,
+permitindo painéis de 1.000 ativos x 20 anos diários.
+
+    python synthetic_data.py --assets 1000 --years 20 --frequency daily
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from results_store import config_hash
+
+PERIODS_PER_YEAR = {'monthly': 12, 'daily': 252}
+
+# Volatilidades anuais dos fatores
+MARKET_VOL = 0.18
+STYLE_VOL = 0.06
+SECTOR_VOL = 0.10
+
+# Regime de crise: multiplicadores de volatilidade e retorno anual do mercado
+CRISIS_FACTOR_VOL = 2.0
+CRISIS_IDIO_VOL = 1.3
+CRISIS_MARKET_DRIFT = -0.40
+
+# Padrões de dados faltantes usados com missing=True
+DEFAULT_MISSING = {
+    'late_listing': 0.20,   # fração de ativos que abrem capital depois do início
+    'delisting': 0.05,      # fração de ativos com registro cancelado antes do fim
+    'gap_rate': 0.002,      # probabilidade de lacuna isolada por observação
+    'halt_rate': 0.0005,    # probabilidade de início de suspensão por observação
+    'halt_length': 10       # duração média das suspensões (em observações)
+}
+
+
+def default_output_dir():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "..", "data", "synthetic")
+
+
+class SyntheticMarketGenerator:
+    """
+    Gera preços, retornos e volumes sintéticos em blocos de tempo
+    """
+
+    def __init__(self, n_assets=10, years=6, frequency='daily', end_date='2019-12-31',
+                 n_factors=3, n_sectors=8, distribution='student_t', tail_df=5,
+                 garch=(0.08, 0.90), regimes=True, crisis_years=0.5, calm_years=4.0,
+                 missing=None, seed=0):
+        if frequency not in PERIODS_PER_YEAR:
+            raise ValueError(f"Frequência inválida: {frequency}")
+        if distribution not in ('normal', 'student_t'):
+            raise ValueError(f"Distribuição inválida: {distribution}")
+        if garch is not None and sum(garch) >= 1:
+            raise ValueError("GARCH não estacionário: alpha + beta deve ser < 1")
+
+        self.n_assets = n_assets
+        self.years = years
+        self.frequency = frequency
+        self.end_date = end_date
+        self.n_factors = n_factors
+        self.n_sectors = n_sectors
+        self.distribution = distribution
+        self.tail_df = tail_df
+        self.garch = tuple(garch) if garch is not None else None
+        self.regimes = regimes
+        self.crisis_years = crisis_years
+        self.calm_years = calm_years
+        self.missing = dict(DEFAULT_MISSING) if missing is True else (dict(missing) if missing else None)
+        self.seed = seed
+
+        self.periods_per_year = PERIODS_PER_YEAR[frequency]
+        if frequency == 'daily':
+            self.dates = pd.bdate_range(end=end_date, periods=years * self.periods_per_year)
+        else:
+            self.dates = pd.date_range(end=end_date, periods=years * 12, freq=pd.offsets.MonthEnd())
+        self.tickers = [f"SYN{i:04d}" for i in range(n_assets)]
+
+        self._draw_structure()
+
+    def settings(self):
+        """
+        Parâmetros que determinam os dados gerados (para nomes de arquivo e caches)
+        """
+        return {
+            'n_assets': self.n_assets, 'years': self.years, 'frequency': self.frequency,
+            'end_date': self.end_date, 'n_factors': self.n_factors, 'n_sectors': self.n_sectors,
+            'distribution': self.distribution, 'tail_df': self.tail_df, 'garch': self.garch,
+            'regimes': self.regimes, 'crisis_years': self.crisis_years,
+            'calm_years': self.calm_years, 'missing': self.missing, 'seed': self.seed
+        }
+
+    def fingerprint(self):
+        return config_hash(self.settings())[:12]
+
+    def _draw_structure(self):
+        """
+        Parâmetros por ativo (cargas, drift, volatilidade, setor, listagem)
+        """
+        rng = np.random.default_rng([self.seed, 0])
+        n, k = self.n_assets, self.n_factors
+        ppy = self.periods_per_year
+
+        self.drift = rng.uniform(0.02, 0.15, n) / ppy
+        # Cargas: mercado positivo, estilos em torno de zero
+        self.loadings = np.column_stack([rng.uniform(0.6, 1.4, n)] +
+                                        [rng.normal(0.0, 0.4, n) for _ in range(k - 1)])
+        self.sector = rng.integers(0, self.n_sectors, n)
+        self.sector_loading = rng.uniform(0.5, 1.0, n)
+        self.idio_vol = rng.uniform(0.15, 0.40, n) / np.sqrt(ppy)
+        self.factor_vol = np.array([MARKET_VOL] + [STYLE_VOL] * (k - 1)) / np.sqrt(ppy)
+        self.sector_vol = np.full(self.n_sectors, SECTOR_VOL / np.sqrt(ppy))
+        self.initial_price = rng.uniform(5.0, 80.0, n)
+        self.base_volume = rng.lognormal(13.0, 1.0, n)
+
+        # Janela de negociação de cada ativo: [listing, delisting)
+        n_periods = len(self.dates)
+        self.listing = np.zeros(n, dtype=int)
+        self.delisting = np.full(n, n_periods, dtype=int)
+        if self.missing:
+            late = rng.random(n) < self.missing.get('late_listing', 0.0)
+            self.listing[late] = rng.integers(1, max(2, int(n_periods * 0.8)), late.sum())
+            delisted = rng.random(n) < self.missing.get('delisting', 0.0)
+            remaining = n_periods - self.listing[delisted]
+            self.delisting[delisted] = self.listing[delisted] + \
+                (remaining * rng.uniform(0.5, 0.95, delisted.sum())).astype(int)
+
+        self.asset_info = {
+            ticker: {'name': f'Ativo Sintético {i}', 'sector': f'Setor {self.sector[i] + 1}'}
+            for i, ticker in enumerate(self.tickers)
+        }
+
+    def _standard_shocks(self, rng, shape):
+        """
+        Choques com variância unitária (normais ou t de Student padronizados)
+        """
+        if self.distribution == 'normal':
+            return rng.standard_normal(shape)
+        df = self.tail_df
+        return rng.standard_t(df, shape) * np.sqrt((df - 2) / df)
+
+    def iter_chunks(self, chunk_size=252):
+        """
+        Gera o painel em blocos consecutivos de `chunk_size` períodos
+
+        Cada bloco é um dicionário com DataFrames 'returns' (log-retornos
+        verdadeiros), 'prices' (observados; NaN fora de negociação),
+        'volumes' (0 em suspensões/lacunas) e a Series 'regime' (0 = calmo,
+        1 = crise). O estado é carregado entre blocos; a mesma semente e o
+        mesmo chunk_size reproduzem exatamente o mesmo painel.
+        """
+        rng = np.random.default_rng([self.seed, 1])
+        n, k, s = self.n_assets, self.n_factors, self.n_sectors
+        n_series = k + s + n
+        ppy = self.periods_per_year
+
+        # Estado carregado entre blocos
+        variance = np.ones(n_series)
+        last_shock = np.zeros(n_series)
+        regime = 0
+        log_price = np.log(self.initial_price)
+        halt_remaining = np.zeros(n, dtype=int)
+
+        to_crisis = 1.0 / (self.calm_years * ppy)
+        to_calm = 1.0 / (self.crisis_years * ppy)
+        missing = self.missing or {}
+
+        for start in range(0, len(self.dates), chunk_size):
+            dates = self.dates[start:start + chunk_size]
+            t_chunk = len(dates)
+
+            # Regimes (cadeia de Markov com dois estados)
+            regime_path = np.empty(t_chunk, dtype=int)
+            if self.regimes:
+                switches = rng.random(t_chunk)
+                for t in range(t_chunk):
+                    if regime == 0 and switches[t] < to_crisis:
+                        regime = 1
+                    elif regime == 1 and switches[t] < to_calm:
+                        regime = 0
+                    regime_path[t] = regime
+            else:
+                regime_path[:] = 0
+
+            # Choques padronizados com GARCH(1,1) de variância incondicional 1
+            shocks = self._standard_shocks(rng, (t_chunk, n_series))
+            if self.garch is not None:
+                alpha, beta = self.garch
+                omega = 1.0 - alpha - beta
+                for t in range(t_chunk):
+                    variance = omega + alpha * last_shock ** 2 + beta * variance
+                    shocks[t] *= np.sqrt(variance)
+                    last_shock = shocks[t]
+
+            crisis = regime_path == 1
+            factor_scale = np.where(crisis, CRISIS_FACTOR_VOL, 1.0)[:, None]
+            idio_scale = np.where(crisis, CRISIS_IDIO_VOL, 1.0)[:, None]
+
+            factors = shocks[:, :k] * self.factor_vol * factor_scale
+            factors[:, 0] += np.where(crisis, CRISIS_MARKET_DRIFT / ppy, 0.0)
+            sector_factors = shocks[:, k:k + s] * self.sector_vol * factor_scale
+            idiosyncratic = shocks[:, k + s:] * self.idio_vol * idio_scale
+
+            returns = (self.drift + factors @ self.loadings.T
+                       + sector_factors[:, self.sector] * self.sector_loading + idiosyncratic)
+            log_prices = log_price + np.cumsum(returns, axis=0)
+            log_price = log_prices[-1]
+
+            # Máscara de negociação: listagem, lacunas isoladas e suspensões
+            periods = np.arange(start, start + t_chunk)[:, None]
+            listed = (periods >= self.listing) & (periods < self.delisting)
+            traded = listed.copy()
+            if missing.get('gap_rate'):
+                traded &= rng.random((t_chunk, n)) >= missing['gap_rate']
+            if missing.get('halt_rate'):
+                halted = np.zeros((t_chunk, n), dtype=bool)
+                # Suspensões iniciadas em blocos anteriores
+                carry = np.minimum(halt_remaining, t_chunk)
+                halted[np.arange(t_chunk)[:, None] < carry] = True
+                halt_remaining = halt_remaining - carry
+                for t, asset in zip(*np.nonzero(rng.random((t_chunk, n)) < missing['halt_rate'])):
+                    length = rng.geometric(1.0 / missing.get('halt_length', 10))
+                    halted[t:t + length, asset] = True
+                    halt_remaining[asset] = max(halt_remaining[asset], t + length - t_chunk)
+                traded &= ~halted
+
+            prices = np.where(traded, np.exp(log_prices), np.nan)
+            activity = rng.lognormal(0.0, 0.5, (t_chunk, n)) * (1.0 + 20.0 * np.abs(returns))
+            volumes = np.where(traded, self.base_volume * activity, 0.0)
+            volumes[~listed] = np.nan
+
+            yield {
+                'returns': pd.DataFrame(returns, index=dates, columns=self.tickers),
+                'prices': pd.DataFrame(prices, index=dates, columns=self.tickers),
+                'volumes': pd.DataFrame(volumes, index=dates, columns=self.tickers),
+                'regime': pd.Series(regime_path, index=dates, name='regime')
+            }
+
+    def generate(self, chunk_size=252):
+        """
+        Painel completo em memória (concatenação dos blocos)
+        """
+        chunks = list(self.iter_chunks(chunk_size))
+        return {key: pd.concat([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+
+def _economatica_rows(asset, dates, prices, volumes):
+    """
+    Linhas de uma aba no layout da Economatica (cabeçalho + Data/Fechamento/Volume)
+    """
+    yield ['Economatica', None, None]
+    yield [asset, None, None]
+    yield ['Data', 'Fechamento', 'Volume']
+    for date, price, volume in zip(dates, prices, volumes):
+        # A Economatica exporta '-' nos dias sem negociação
+        yield [date, float(price) if price == price else '-',
+               float(volume) if volume == volume else '-']
+
+
+def _write_workbook(path, assets, dates, column_reader):
+    """
+    Grava uma aba por ativo com openpyxl em modo write-only (streaming)
+    """
+    from openpyxl import Workbook
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    dates = dates.to_pydatetime()
+    workbook = Workbook(write_only=True)
+    for j, asset in enumerate(assets):
+        sheet = workbook.create_sheet(title=asset)
+        prices, volumes = column_reader(j)
+        for row in _economatica_rows(asset, dates, prices, volumes):
+            sheet.append(row)
+
+    tmp_path = path + '.tmp.xlsx'
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_economatica_workbook(source, path, volumes=None, chunk_size=252):
+    """
+    Grava preços no layout das abas da Economatica (uma aba por ativo)
+
+    source: SyntheticMarketGenerator (gerado em blocos e acumulado em um
+            arquivo mapeado em disco) ou DataFrame de preços já em memória.
+    """
+    if isinstance(source, pd.DataFrame):
+        if volumes is None:
+            volumes = pd.DataFrame(1000.0, index=source.index, columns=source.columns)
+        return _write_workbook(path, list(source.columns), source.index,
+                               lambda j: (source.iloc[:, j].values, volumes.iloc[:, j].values))
+
+    generator = source
+    shape = (len(generator.dates), generator.n_assets)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Colunas por ativo: layout Fortran para leitura sequencial por aba
+        price_map = np.lib.format.open_memmap(os.path.join(tmp_dir, 'prices.npy'), mode='w+',
+                                              dtype=np.float64, shape=shape, fortran_order=True)
+        volume_map = np.lib.format.open_memmap(os.path.join(tmp_dir, 'volumes.npy'), mode='w+',
+                                               dtype=np.float64, shape=shape, fortran_order=True)
+        row = 0
+        for chunk in generator.iter_chunks(chunk_size):
+            size = len(chunk['prices'])
+            price_map[row:row + size] = chunk['prices'].values
+            volume_map[row:row + size] = chunk['volumes'].values
+            row += size
+        price_map.flush()
+        volume_map.flush()
+
+        path = _write_workbook(path, generator.tickers, generator.dates,
+                               lambda j: (price_map[:, j], volume_map[:, j]))
+        del price_map, volume_map
+    return path
+
+
+def write_prices_csv(generator, path, chunk_size=252):
+    """
+    Grava os preços observados em CSV (formato largo), bloco a bloco
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for i, chunk in enumerate(generator.iter_chunks(chunk_size)):
+            chunk['prices'].to_csv(f, header=(i == 0), index_label='Date')
+    os.replace(tmp_path, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera dados de mercado sintéticos")
+    parser.add_argument('--assets', type=int, default=10)
+    parser.add_argument('--years', type=int, default=6)
+    parser.add_argument('--frequency', choices=sorted(PERIODS_PER_YEAR), default='daily')
+    parser.add_argument('--factors', type=int, default=3)
+    parser.add_argument('--sectors', type=int, default=8)
+    parser.add_argument('--distribution', choices=['normal', 'student_t'], default='student_t')
+    parser.add_argument('--no-garch', action='store_true')
+    parser.add_argument('--no-regimes', action='store_true')
+    parser.add_argument('--missing', action='store_true', help="Inclui padrões de dados faltantes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--output', help="Arquivo de saída (padrão: data/synthetic/...)")
+    args = parser.parse_args(argv)
+
+    generator = SyntheticMarketGenerator(
+        n_assets=args.assets, years=args.years, frequency=args.frequency,
+        n_factors=args.factors, n_sectors=args.sectors, distribution=args.distribution,
+        garch=None if args.no_garch else (0.08, 0.90), regimes=not args.no_regimes,
+        missing=args.missing or None, seed=args.seed
+    )
+    output = args.output or os.path.join(
+        default_output_dir(),
+        f"synthetic_{args.assets}a_{args.frequency}_{args.years}y_{generator.fingerprint()}.{args.format}")
+
+    print(f"Gerando {args.assets} ativos x {len(generator.dates)} períodos ({args.frequency})...")
+    if args.format == 'xlsx':
+        write_economatica_workbook(generator, output)
+    else:
+        write_prices_csv(generator, output)
+    print(f"Dados sintéticos salvos em: {output}")
+    return output
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,180 @@
+"""
+Overlay de Volatilidade-Alvo (Alavancagem/Caixa)
+As estratégias ficam sempre 100% investidas, com o risco que resultar da
+alocação. O overlay escala a exposição de cada estratégia entre a carteira
+de risco e uma perna de caixa (CDI) para manter o risco ex-ante constante:
+
+    kₜ = min(σ* / σ̂ₜ, alavancagem máxima)
+    rₜ = kₜ·r_carteira + (1 - kₜ)·CDIₜ - max(kₜ - 1, 0)·spread/12
+
+σ̂ₜ = √(12·wₜ'Σ̂ₜwₜ) usa os pesos vigentes e uma previsão de Σ feita só com
+meses anteriores a t:
+- 'ewma': RiskMetrics, Σ̂ₜ = λΣ̂ₜ₋₁ + (1 - λ)rₜ₋₁rₜ₋₁' (média zero, pesos
+  normalizados no início da série); filtro recursivo único (scipy lfilter)
+  sobre os produtos rₜrₜ' de todos os pares de ativos
+- 'rolling': covariância amostral dos últimos `window` meses (janela
+  crescente no início do histórico), a partir das somas acumuladas de
+  walk_forward.PrefixMoments
+
+Σ̂ é recalculada a cada `frequency` meses e mantida entre recálculos (os
+pesos de cada rebalanceamento entram imediatamente). Todas as estratégias e
+datas são avaliadas em lote; o relatório compara a volatilidade realizada
+com o alvo.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from profiling import annotate, profiled
+from walk_forward import PrefixMoments
+
+METHODS = ('ewma', 'rolling')
+
+
+def ewma_covariances(returns, decay=0.94):
+    """
+    Previsões EWMA (T+1, n, n): linha t usa as observações anteriores a t
+    (linha 0 = NaN)
+    """
+    values = np.asarray(returns, dtype=float)
+    n_obs, n_assets = values.shape
+    products = (values[:, :, None] * values[:, None, :]).reshape(n_obs, -1)
+    smoothed = lfilter([1 - decay], [1, -decay], products, axis=0)
+    # Normalização: soma dos pesos (1 - λ^t) nas primeiras observações
+    smoothed /= (1 - decay ** np.arange(1, n_obs + 1))[:, None]
+    forecasts = np.full((n_obs + 1, n_assets * n_assets), np.nan)
+    forecasts[1:] = smoothed
+    return forecasts.reshape(n_obs + 1, n_assets, n_assets)
+
+
+def rolling_covariances(returns, window=24, min_periods=12):
+    """
+    Covariâncias amostrais dos `window` meses anteriores a cada t (T+1, n, n);
+    janela crescente enquanto houver menos de `window` meses, NaN abaixo de min_periods
+    """
+    values = np.asarray(returns, dtype=float)
+    n_obs, n_assets = values.shape
+    forecasts = np.full((n_obs + 1, n_assets, n_assets), np.nan)
+    ends = np.arange(max(min(min_periods, window), 2), n_obs + 1)
+    if len(ends) > 0:
+        _, covariances = PrefixMoments(values).window_moments(np.maximum(ends - window, 0), ends)
+        forecasts[ends] = covariances
+    return forecasts
+
+
+class VolatilityTargeting:
+    """
+    Overlay de volatilidade-alvo aplicado a todas as estratégias de uma vez
+    """
+
+    def __init__(self, target, method='ewma', decay=0.94, window=24, frequency=1,
+                 max_leverage=1.5, borrowing_spread=0.0):
+        if method not in METHODS:
+            raise ValueError(f"Método desconhecido: {method} (use {', '.join(METHODS)})")
+        if target <= 0 or max_leverage <= 0 or frequency < 1:
+            raise ValueError("target, max_leverage e frequency devem ser positivos")
+        self.target = target
+        self.method = method
+        self.decay = decay
+        self.window = int(window)
+        self.frequency = int(frequency)
+        self.max_leverage = max_leverage
+        self.borrowing_spread = borrowing_spread
+
+    def covariance_forecasts(self, asset_returns):
+        if self.method == 'ewma':
+            return ewma_covariances(asset_returns, self.decay)
+        return rolling_covariances(asset_returns, self.window)
+
+    def forecast_volatility(self, asset_returns, weights, positions):
+        """
+        Volatilidade anual prevista (T x K) para cada mês do teste e estratégia
+
+        asset_returns: histórico completo de retornos dos ativos (N x n);
+        weights: pesos vigentes (T x K x n); positions: linha de cada mês do
+        teste em asset_returns (a previsão usa as linhas anteriores).
+        """
+        positions = np.asarray(positions)
+        covariances = self.covariance_forecasts(asset_returns)
+        # Σ̂ recalculada a cada `frequency` meses do teste e mantida entre recálculos
+        refresh = np.arange(len(positions)) % self.frequency == 0
+        last_refresh = np.maximum.accumulate(np.where(refresh, np.arange(len(positions)), 0))
+        sigma = covariances[positions[last_refresh]]
+        variance = np.einsum('tkn,tnm,tkm->tk', weights, sigma, weights)
+        return np.sqrt(np.maximum(variance, 0.0) * 12)
+
+    @profiled('vol_targeting')
+    def apply(self, asset_returns, weights, positions, risk_free, periods=None, strategies=None):
+        """
+        Retornos com overlay, alavancagem e relatório realizado x alvo
+
+        risk_free: CDI mensal de cada mês do teste (T); periods: rótulo do
+        período de cada mês (opcional, volatilidade realizada por período).
+        """
+        asset_values = np.asarray(asset_returns, dtype=float)
+        positions = np.asarray(positions)
+        if np.any(positions < 0):
+            raise ValueError("Meses do teste ausentes no histórico de retornos dos ativos")
+        weights = np.asarray(weights, dtype=float)
+        risk_free = np.asarray(risk_free, dtype=float)[:, None]
+        strategies = list(strategies) if strategies is not None else list(range(weights.shape[1]))
+
+        forecast = self.forecast_volatility(asset_values, weights, positions)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            leverage = np.minimum(self.target / forecast, self.max_leverage)
+        leverage = np.where(np.isfinite(leverage), leverage, 1.0)  # Sem previsão: exposição integral
+
+        unscaled = np.einsum('tn,tkn->tk', asset_values[positions], weights)
+        overlay = (leverage * unscaled + (1 - leverage) * risk_free
+                   - np.maximum(leverage - 1, 0.0) * self.borrowing_spread / 12)
+        annotate(months=len(positions), strategies=len(strategies), method=self.method)
+
+        realized = overlay.std(axis=0, ddof=1) * np.sqrt(12)
+        excess = overlay - risk_free
+        report = pd.DataFrame({
+            'target': self.target,
+            'forecast_volatility': np.nanmean(forecast, axis=0),
+            'realized_volatility': realized,
+            'unscaled_volatility': unscaled.std(axis=0, ddof=1) * np.sqrt(12),
+            'target_error': realized - self.target,
+            'relative_error': realized / self.target - 1,
+            'mean_leverage': leverage.mean(axis=0),
+            'min_leverage': leverage.min(axis=0),
+            'max_leverage': leverage.max(axis=0),
+            'annual_return': overlay.mean(axis=0) * 12,
+            'sharpe_ratio': excess.mean(axis=0) / excess.std(axis=0, ddof=1) * np.sqrt(12)
+        }, index=strategies)
+
+        result = {
+            'report': report,
+            'returns': overlay,
+            'leverage': leverage,
+            'forecast_volatility': forecast
+        }
+        if periods is not None:
+            periods = np.asarray(periods)
+            starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+            counts = np.diff(np.r_[starts, len(periods)])[:, None]
+            sums = np.add.reduceat(overlay, starts, axis=0)
+            squares = np.add.reduceat(overlay ** 2, starts, axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                variance = (squares - sums ** 2 / counts) / (counts - 1)
+            result['realized_by_period'] = pd.DataFrame(np.sqrt(np.maximum(variance, 0.0) * 12),
+                                                        index=periods[starts], columns=strategies)
+        return result
+
+
+def print_report(report, method):
+    """
+    Volatilidade realizada x alvo de cada estratégia
+    """
+    target = report['target'].iloc[0]
+    print(f"\n=== OVERLAY DE VOLATILIDADE-ALVO ({target:.1%} a.a., previsão {method}) ===")
+    print(f"{'Estratégia':<20} {'Prevista':<9} {'Realizada':<10} {'Sem overlay':<12} {'Erro':<8} "
+          f"{'Alav. média':<12} {'Sharpe'}")
+    print("-" * 85)
+    for strategy, row in report.iterrows():
+        print(f"{strategy:<20} {row['forecast_volatility']:>7.2%}  {row['realized_volatility']:>8.2%}  "
+              f"{row['unscaled_volatility']:>10.2%}  {row['target_error']:>+6.2%}  "
+              f"{row['mean_leverage']:>10.2f}  {row['sharpe_ratio']:>6.2f}")
@@ -0,0 +1,126 @@
+"""
+Seleção Walk-Forward da Janela de Estimação
+Em vez da janela fixa de 24 meses, em cada rebalanceamento escolhe-se o
+comprimento da janela (e, opcionalmente, a intensidade de shrinkage de Σ)
+que melhor previu o bloco de validação imediatamente anterior:
+
+    validação: os V meses antes do rebalanceamento
+    candidato (L, δ): (μ, Σ_δ) estimados nos L meses anteriores à validação
+    escore: log-verossimilhança gaussiana média dos meses de validação
+    escolhido: (L*, δ*) de maior escore, reestimado nos L* meses mais recentes
+
+Todos os candidatos saem de somas acumuladas (prefixos) dos retornos e dos
+produtos cruzados rₜrₜ': a média e a covariância de qualquer janela, e a
+dispersão da validação em torno de cada μ, custam O(n²) independentemente de
+L e V. O escore exige apenas log|Σ| e tr(Σ⁻¹S) em lote, de modo que avaliar
+10-20 janelas custa quase o mesmo que avaliar uma.
+
+Shrinkage: Σ_δ = (1 - δ)·S + δ·(tr S / n)·I (alvo de variância constante).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def shrink_covariance(cov_matrix, shrinkage):
+    """
+    Combinação convexa de Σ com o alvo (tr Σ / n)·I; aceita matrizes em lote (..., n, n)
+    """
+    if not shrinkage:
+        return cov_matrix
+    values = np.asarray(cov_matrix, dtype=float)
+    n_assets = values.shape[-1]
+    target = np.trace(values, axis1=-2, axis2=-1)[..., None, None] / n_assets * np.eye(n_assets)
+    shrunk = (1 - shrinkage) * values + shrinkage * target
+    if isinstance(cov_matrix, pd.DataFrame):
+        return pd.DataFrame(shrunk, index=cov_matrix.index, columns=cov_matrix.columns)
+    return shrunk
+
+
+class PrefixMoments:
+    """
+    Somas acumuladas de rₜ e rₜrₜ' (linha k = soma das k primeiras observações)
+    """
+
+    def __init__(self, returns):
+        values = np.asarray(returns, dtype=float)
+        n_obs, n_assets = values.shape
+        self.sums = np.zeros((n_obs + 1, n_assets))
+        self.sums[1:] = np.cumsum(values, axis=0)
+        self.cross = np.zeros((n_obs + 1, n_assets, n_assets))
+        self.cross[1:] = np.cumsum(values[:, :, None] * values[:, None, :], axis=0)
+
+    def window_sums(self, starts, ends):
+        """
+        Σr e Σrr' das linhas [start, end) (arrays de índices -> resultados em lote)
+        """
+        return self.sums[ends] - self.sums[starts], self.cross[ends] - self.cross[starts]
+
+    def window_moments(self, starts, ends):
+        """
+        Médias (K, n) e covariâncias amostrais (K, n, n) das janelas [start, end)
+        """
+        starts, ends = np.atleast_1d(starts), np.atleast_1d(ends)
+        counts = (ends - starts).astype(float)
+        sums, cross = self.window_sums(starts, ends)
+        means = sums / counts[:, None]
+        covariances = (cross - counts[:, None, None] * means[:, :, None] * means[:, None, :]) \
+            / (counts[:, None, None] - 1)
+        return means, covariances
+
+
+class WalkForwardSelector:
+    """
+    Escolha de (janela, shrinkage) por validação no bloco anterior a cada rebalanceamento
+    """
+
+    def __init__(self, returns, windows, shrinkages=(0.0,), validation_months=6):
+        self.prefix = PrefixMoments(returns)
+        self.n_assets = np.asarray(returns).shape[1]
+        self.windows = sorted({int(window) for window in windows})
+        self.shrinkages = sorted({float(shrinkage) for shrinkage in shrinkages})
+        self.validation_months = int(validation_months)
+
+    def scores(self, position):
+        """
+        Escore de cada candidato para um rebalanceamento cuja primeira linha de
+        teste é `position`; DataFrame janela x shrinkage (NaN = sem histórico)
+        """
+        validation_start = position - self.validation_months
+        table = pd.DataFrame(np.nan, index=pd.Index(self.windows, name='window_months'),
+                             columns=pd.Index(self.shrinkages, name='shrinkage'))
+        windows = np.array([window for window in self.windows if validation_start - window >= 0])
+        if validation_start < 0 or len(windows) == 0:
+            return table
+
+        means, covariances = self.prefix.window_moments(validation_start - windows,
+                                                        np.full(len(windows), validation_start))
+        valid_sums, valid_cross = self.prefix.window_sums(validation_start, position)
+        # Dispersão da validação em torno de cada μ: Σ(r - μ)(r - μ)'
+        scatter = (valid_cross - valid_sums[None, :, None] * means[:, None, :]
+                   - means[:, :, None] * valid_sums[None, None, :]
+                   + self.validation_months * means[:, :, None] * means[:, None, :])
+
+        for shrinkage in self.shrinkages:
+            shrunk = shrink_covariance(covariances, shrinkage)
+            sign, logdet = np.linalg.slogdet(shrunk)
+            usable = (sign > 0) & (windows > (self.n_assets if shrinkage == 0 else 1))
+            quadratic = np.full(len(windows), np.nan)
+            if usable.any():
+                quadratic[usable] = np.trace(np.linalg.solve(shrunk[usable], scatter[usable]),
+                                             axis1=-2, axis2=-1)
+            score = -0.5 * (self.n_assets * np.log(2 * np.pi) + logdet + quadratic / self.validation_months)
+            table.loc[windows, shrinkage] = np.where(usable, score, np.nan)
+        return table
+
+    def select(self, position):
+        """
+        Melhor candidato ({'window_months', 'shrinkage', 'score'}) ou None sem histórico
+        """
+        table = self.scores(position)
+        stacked = table.stack().dropna()
+        if stacked.empty:
+            return None
+        window, shrinkage = stacked.idxmax()
+        return {'window_months': int(window), 'shrinkage': float(shrinkage), 'score': float(stacked.max()),
+                'candidates': int(len(stacked))}